@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+补建数据库索引的迁移脚本
+为已有的 charging_system.db 创建模型中新增的数据表、列和索引
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+from app.core.database import engine, Base, create_missing_columns, create_missing_indexes
+import app.models  # noqa: F401  注册所有模型
+
+
+def main():
+    inspector = inspect(engine)
+    existing = {
+        index["name"]
+        for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+
+    # 新增的数据表连同索引一起创建，已有的数据表补建列和索引
+    Base.metadata.create_all(bind=engine)
+    for name in create_missing_columns(engine):
+        print(f"✅ 添加字段 {name}")
+    create_missing_indexes(engine)
+
+    created = [
+        index.name
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if index.name not in existing
+    ]
+    if created:
+        for name in created:
+            print(f"✅ 创建索引 {name}")
+    else:
+        print("✅ 所有索引已存在，无需添加")
+
+
+if __name__ == "__main__":
+    print("🔄 开始补建数据库索引...")
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        sys.exit(1)
+    print("🎉 数据库迁移完成!")
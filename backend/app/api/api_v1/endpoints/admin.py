@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.core.database import get_db
-from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingRecord, ChargingPileStatus, QueueStatus
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingRecord, ChargingMode, ChargingPileStatus, QueueStatus
 from app.services.charging_service import ChargingScheduleService
 from app.services.config_service import config_service
-from .auth import get_current_user
+from app.services.billing_service import reprice_charging_records
+from app.services.statistics_service import rebuild_pile_stats
+from app.services.report_service import get_pile_report, day_range, week_range, month_range
+from app.services.queue_loader import active_piles_query, load_active_queues
+from app.services.snapshot_service import build_station_snapshot, pile_queue_rows, queue_summary, scene_queue_row
+from app.services.station_version import current_station_version
+from app.services.state_stream import station_state_stream
+from app.services.principal_cache import Principal, principal_cache
+from app.services.pile_planner import PileTarget, apply_pile_plan, load_pile_plan
+from .auth import get_current_user, get_stream_user
 
 router = APIRouter()
 
@@ -116,7 +128,7 @@ class QueueWithVehicleResponse(BaseModel):
     class Config:
         from_attributes = True
 
-def get_admin_user(current_user: User = Depends(get_current_user)):
+def get_admin_user(current_user: Principal = Depends(get_current_user)):
     """获取管理员用户"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="需要管理员权限")
@@ -125,7 +137,7 @@ def get_admin_user(current_user: User = Depends(get_current_user)):
 @router.post("/piles/{pile_id}/start", summary="启动充电桩")
 def start_charging_pile(
     pile_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """启动充电桩"""
@@ -142,7 +154,7 @@ def start_charging_pile(
 @router.post("/piles/{pile_id}/stop", summary="关闭充电桩")
 def stop_charging_pile(
     pile_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """关闭充电桩"""
@@ -156,19 +168,58 @@ def stop_charging_pile(
     
     return {"message": f"充电桩 {pile.pile_number} 已关闭"}
 
+@router.get("/snapshot", summary="获取充电站状态快照")
+def get_station_snapshot(
+    request: Request,
+    response: Response,
+    admin_user: Principal = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    一次返回充电桩、各桩队列、活跃队列和总体统计，取代管理端分别轮询多个接口
+    
+    状态每次变化版本号加一，ETag 即版本号；请求带 If-None-Match 且状态未变化时返回 304，不再构建快照
+    """
+    version = current_station_version(db)
+    etag = f'"station-{version}"'
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return build_station_snapshot(db, version)
+
+@router.get("/stream", summary="订阅充电站状态推送（SSE）")
+async def stream_station_state(ticket: str):
+    """
+    以 Server-Sent Events 推送全部充电桩和活跃队列的变化
+    
+    ticket 由 /auth/stream-ticket 签发。连接建立后先推送一次 snapshot，之后只推送 diff
+    """
+    user_id, is_admin = await run_in_threadpool(get_stream_user, ticket)
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="需要管理员权限")
+    
+    return StreamingResponse(
+        station_state_stream.events(None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/piles", response_model=List[ChargingPileResponse], summary="查看所有充电桩状态")
 def get_all_charging_piles(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """查看所有充电桩状态"""
-    piles = db.query(ChargingPile).all()
-    return piles
+    """查看所有充电桩状态（不含按配置缩容停用的充电桩）"""
+    return active_piles_query(db).all()
 
 @router.get("/piles/{pile_id}/queue", response_model=List[QueueInfoResponse], summary="查看充电桩队列信息")
 def get_pile_queue(
     pile_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """查看充电桩等候服务的车辆信息"""
@@ -178,60 +229,98 @@ def get_pile_queue(
     
     return queue_info
 
-@router.get("/reports/daily", summary="获取日报表")
+@router.get("/reports/daily", response_model=List[ReportResponse], summary="获取日报表")
 def get_daily_report(
     date: str,  # YYYY-MM-DD格式
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取日报表"""
     try:
         target_date = datetime.strptime(date, "%Y-%m-%d").date()
-        
-        # 查询当日充电记录
-        records = db.query(ChargingRecord).filter(
-            ChargingRecord.created_at >= target_date,
-            ChargingRecord.created_at < target_date.replace(day=target_date.day + 1)
-        ).all()
-        
-        # 按充电桩分组统计
-        pile_stats = {}
-        for record in records:
-            pile_number = record.charging_pile.pile_number
-            if pile_number not in pile_stats:
-                pile_stats[pile_number] = {
-                    "charging_count": 0,
-                    "charging_duration": 0.0,
-                    "charging_amount": 0.0,
-                    "electricity_fee": 0.0,
-                    "service_fee": 0.0,
-                    "total_fee": 0.0
-                }
-            
-            pile_stats[pile_number]["charging_count"] += 1
-            pile_stats[pile_number]["charging_duration"] += record.charging_duration
-            pile_stats[pile_number]["charging_amount"] += record.charging_amount
-            pile_stats[pile_number]["electricity_fee"] += record.electricity_fee
-            pile_stats[pile_number]["service_fee"] += record.service_fee
-            pile_stats[pile_number]["total_fee"] += record.total_fee
-        
-        # 转换为响应格式
-        report_data = []
-        for pile_number, stats in pile_stats.items():
-            report_data.append({
-                "time_period": date,
-                "pile_number": pile_number,
-                **stats
-            })
-        
-        return report_data
-        
     except ValueError:
         raise HTTPException(status_code=400, detail="日期格式错误，请使用YYYY-MM-DD格式")
+    
+    start, end = day_range(target_date)
+    return get_pile_report(db, start, end, date)
+
+@router.get("/reports/weekly", response_model=List[ReportResponse], summary="获取周报表")
+def get_weekly_report(
+    date: str,  # YYYY-MM-DD格式，统计该日期所在的自然周（周一开始）
+    admin_user: Principal = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """获取周报表"""
+    try:
+        target_date = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式错误，请使用YYYY-MM-DD格式")
+    
+    start, end = week_range(target_date)
+    time_period = f"{start:%Y-%m-%d}~{end - timedelta(days=1):%Y-%m-%d}"
+    return get_pile_report(db, start, end, time_period)
+
+@router.get("/reports/monthly", response_model=List[ReportResponse], summary="获取月报表")
+def get_monthly_report(
+    month: str,  # YYYY-MM格式
+    admin_user: Principal = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """获取月报表"""
+    try:
+        target_month = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="月份格式错误，请使用YYYY-MM格式")
+    
+    start, end = month_range(target_month.year, target_month.month)
+    return get_pile_report(db, start, end, month)
+
+@router.get("/reports/range", response_model=List[ReportResponse], summary="获取任意日期范围报表")
+def get_range_report(
+    start_date: str,  # YYYY-MM-DD格式，含
+    end_date: str,  # YYYY-MM-DD格式，含
+    admin_user: Principal = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """获取任意日期范围报表"""
+    try:
+        first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式错误，请使用YYYY-MM-DD格式")
+    
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="结束日期不能早于开始日期")
+    
+    start, _ = day_range(first_day)
+    _, end = day_range(last_day)
+    return get_pile_report(db, start, end, f"{start_date}~{end_date}")
+
+@router.post("/records/reprice", summary="按当前电价重新计费")
+def reprice_records(
+    start_date: Optional[str] = None,  # YYYY-MM-DD格式，含
+    end_date: Optional[str] = None,  # YYYY-MM-DD格式，不含
+    admin_user: Principal = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """电价调整后，按当前分时电价重新计算指定日期范围内的充电详单费用"""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式错误，请使用YYYY-MM-DD格式")
+    
+    billing = config_service.get_runtime_params(db).billing
+    repriced_count = reprice_charging_records(db, billing, start, end)
+    
+    # 费用变化后重建对应日期的日统计（跨零点的会话计入结束日期，范围向后多取一天）
+    rebuild_pile_stats(db, start.date() if start else None, (end + timedelta(days=1)).date() if end else None)
+    
+    return {"message": "重新计费完成", "repriced_count": repriced_count}
 
 @router.post("/piles/init", summary="初始化充电桩")
 def init_charging_piles(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """初始化充电桩数据"""
@@ -271,7 +360,7 @@ def init_charging_piles(
 
 @router.get("/vehicles", response_model=List[VehicleInfoResponse], summary="查看所有用户车辆")
 def get_all_vehicles(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """查看所有用户的车辆信息"""
@@ -294,7 +383,7 @@ def get_all_vehicles(
 
 @router.get("/queue/summary", summary="获取队列总结信息")
 def get_queue_summary(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取队列总结信息"""
@@ -304,31 +393,10 @@ def get_queue_summary(
             ChargingQueue.status.in_([QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING])
         ).all()
         
-        # 分类统计
-        waiting_count = 0
-        charging_count = 0
-        
-        for queue in active_queues:
-            status = queue.status.value if hasattr(queue.status, 'value') else str(queue.status)
-            if status in ['waiting', 'queuing']:
-                waiting_count += 1
-            elif status == 'charging':
-                charging_count += 1
-        
-        # 总排队人数（等待+充电）
-        total_queues = waiting_count + charging_count
-        
-        # 计算平均等待时间（简单估算）
-        avg_wait_time = waiting_count * 15 if waiting_count > 0 else 0  # 每人平均15分钟
+        summary = queue_summary(active_queues)
+        print(f"队列统计 - 总计: {summary['total_queues']}, 等待: {summary['waiting_count']}, 充电: {summary['charging_count']}")
         
-        print(f"队列统计 - 总计: {total_queues}, 等待: {waiting_count}, 充电: {charging_count}")
-        
-        return {
-            "total_queues": total_queues,
-            "waiting_count": waiting_count,
-            "charging_count": charging_count,
-            "avg_wait_time": avg_wait_time
-        }
+        return summary
     except Exception as e:
         print(f"获取队列统计信息失败: {e}")
         return {
@@ -341,7 +409,7 @@ def get_queue_summary(
 @router.post("/piles/{pile_id}/fault", summary="设置充电桩故障")
 def set_pile_fault(
     pile_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """设置充电桩故障状态"""
@@ -354,76 +422,18 @@ def set_pile_fault(
 
 @router.get("/queue/piles", response_model=List[PileQueueResponse], summary="获取各充电桩队列状态")
 def get_pile_queues(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取各充电桩的队列状态"""
-    piles = db.query(ChargingPile).all()
+    piles = active_piles_query(db).all()
+    queues = load_active_queues(db)
     
-    result = []
-    for pile in piles:
-        # 获取该充电桩的活跃队列（等待、排队、充电中）
-        queues = db.query(ChargingQueue).filter(
-            ChargingQueue.charging_pile_id == pile.id,
-            ChargingQueue.status.in_([QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING])
-        ).order_by(ChargingQueue.queue_time).all()
-        
-        # 获取当前正在充电的用户
-        current_user = None
-        charging_queue = db.query(ChargingQueue).filter(
-            ChargingQueue.charging_pile_id == pile.id,
-            ChargingQueue.status == QueueStatus.CHARGING
-        ).first()
-        if charging_queue and charging_queue.user:
-            current_user = charging_queue.user.username
-        
-        # 构建队列详情
-        queue_details = []
-        for i, queue in enumerate(queues):
-            # 安全地获取用户和车辆信息
-            username = queue.user.username if queue.user else "未知用户"
-            vehicle_info = "未知车辆"
-            if queue.vehicle:
-                vehicle_info = f"{queue.vehicle.license_plate} ({queue.vehicle.model or '未知型号'})"
-            
-            queue_details.append({
-                "queue_id": queue.id,  # 添加queue_id用于管理操作
-                "position": i + 1,
-                "username": username,
-                "vehicle_info": vehicle_info,
-                "request_time": queue.queue_time,
-                "status": queue.status.value
-            })
-        
-        # 计算等待队列长度（排除正在充电的）
-        waiting_queues = [q for q in queues if q.status in [QueueStatus.WAITING, QueueStatus.QUEUING]]
-        actual_queue_length = len(waiting_queues)
-        estimated_wait_time = actual_queue_length * 30  # 每人30分钟
-        
-        # 确定充电桩的实际状态（基于使用情况）
-        actual_pile_status = pile.status.value
-        if charging_queue:
-            # 如果有车正在充电，状态显示为"充电中"
-            actual_pile_status = "charging"
-        elif pile.status == ChargingPileStatus.NORMAL and pile.is_active:
-            # 正常且激活的充电桩，如果没有人充电则显示为"空闲"
-            actual_pile_status = "idle"
-        
-        result.append(PileQueueResponse(
-            pile_id=pile.id,
-            pile_name=f"{pile.charging_mode.value}充电桩-{pile.pile_number}",
-            pile_status=actual_pile_status,
-            queue_length=actual_queue_length,  # 使用修正后的队列长度
-            current_user=current_user,
-            estimated_wait_time=estimated_wait_time,
-            queue_details=queue_details
-        ))
-    
-    return result
+    return [PileQueueResponse(**row) for row in pile_queue_rows(piles, queues)]
 
 @router.get("/queue/logs", response_model=List[QueueLogResponse], summary="获取队列变化日志")
 def get_queue_logs(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取队列变化日志"""
@@ -484,7 +494,7 @@ def get_queue_logs(
 
 @router.get("/scene/vehicles", response_model=List[VehicleWithOwnerResponse], summary="获取所有车辆（包含车主信息）")
 def get_vehicles_with_owners(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取所有车辆及其车主信息，用于充电场景动画"""
@@ -551,7 +561,7 @@ def get_vehicles_with_owners(
 
 @router.post("/piles/sync-config", summary="同步充电桩配置")
 def sync_pile_config(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """同步充电桩配置，从数据库配置更新充电桩功率"""
@@ -602,12 +612,12 @@ def sync_pile_config(
 
 @router.get("/scene/charging-piles", response_model=List[ChargingPileWithSpotsResponse], summary="获取充电桩信息（用于场景动画）")
 def get_charging_piles_for_scene(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取充电桩信息，用于充电场景动画"""
     try:
-        piles = db.query(ChargingPile).all()
+        piles = active_piles_query(db).all()
         
         result = []
         for pile in piles:
@@ -645,83 +655,18 @@ def get_charging_piles_for_scene(
 
 @router.get("/scene/charging-queue", response_model=List[QueueWithVehicleResponse], summary="获取排队信息（包含车辆详情）")
 def get_charging_queue_with_vehicles(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """获取排队信息及车辆详情，用于充电场景动画"""
     try:
-        # 使用joinedload预加载关联数据
-        from sqlalchemy.orm import joinedload
-        queues = db.query(ChargingQueue).options(
-            joinedload(ChargingQueue.vehicle).joinedload(Vehicle.owner),
-            joinedload(ChargingQueue.pile)
-        ).all()
+        # 只取等候、排队和充电中的队列，批量预加载关联数据
+        queues = load_active_queues(db)
         
         result = []
         for queue in queues:
             try:
-                vehicle_info = None
-                if queue.vehicle:
-                    owner_info = None
-                    if queue.vehicle.owner:
-                        owner_info = {
-                            "username": queue.vehicle.owner.username,
-                            "email": queue.vehicle.owner.email,
-                            "phone": getattr(queue.vehicle.owner, 'phone', None)
-                        }
-                    
-                    # 安全地获取队列状态
-                    queue_status = queue.status
-                    if hasattr(queue_status, 'value'):
-                        status_str = queue_status.value
-                    else:
-                        status_str = str(queue_status)
-                    
-                    vehicle_info = {
-                        "id": queue.vehicle.id,
-                        "license_plate": queue.vehicle.license_plate,
-                        "battery_capacity": queue.vehicle.battery_capacity or 0.0,
-                        "model": queue.vehicle.model or "未知型号",
-                        "status": status_str,
-                        "owner": owner_info
-                    }
-                
-                # 安全地获取充电桩信息
-                pile_id = None
-                if queue.pile:
-                    pile_id = queue.pile.pile_number
-                elif queue.charging_pile_id:
-                    # 如果pile关联为空，但有charging_pile_id，尝试查询
-                    pile = db.query(ChargingPile).filter(ChargingPile.id == queue.charging_pile_id).first()
-                    if pile:
-                        pile_id = pile.pile_number
-                
-                # 安全地获取队列状态
-                queue_status = queue.status
-                if hasattr(queue_status, 'value'):
-                    status_str = queue_status.value
-                else:
-                    status_str = str(queue_status)
-                
-                # 安全地获取充电模式
-                charging_mode = queue.charging_mode
-                if hasattr(charging_mode, 'value'):
-                    mode_str = charging_mode.value
-                else:
-                    mode_str = str(charging_mode)
-                
-                queue_data = {
-                    "id": queue.id,
-                    "queue_number": queue.queue_number,
-                    "status": status_str,
-                    "charging_mode": mode_str,
-                    "charging_pile_id": queue.charging_pile_id,
-                    "pile_id": pile_id,
-                    "vehicle": vehicle_info,
-                    "estimated_completion": queue.estimated_completion_time,
-                    "queue_time": queue.queue_time
-                }
-                result.append(queue_data)
+                result.append(scene_queue_row(queue))
             except Exception as e:
                 print(f"处理队列 {queue.id} 时出错: {e}")
                 continue
@@ -733,10 +678,14 @@ def get_charging_queue_with_vehicles(
 
 @router.post("/piles/auto-configure", summary="根据系统配置自动配置充电桩")
 def auto_configure_piles(
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """根据系统配置自动配置充电桩数量和功率"""
+    """根据系统配置自动配置充电桩数量和功率
+
+    一次计算全部修改并在一个事务中提交：多出的充电桩停用，被停用充电桩排队区的车辆退回等候区，
+    不足时重新启用或新建充电桩，随后重新调度。有车辆正在充电的充电桩不会被停用。
+    """
     try:
         # 获取最新配置
         pile_config = config_service.get_charging_pile_config(db)
@@ -745,102 +694,24 @@ def auto_configure_piles(
         fast_power = pile_config["fast_charging_power"]
         trickle_power = pile_config["trickle_charging_power"]
         
-        # 获取现有充电桩
-        existing_piles = db.query(ChargingPile).all()
-        existing_fast = [p for p in existing_piles if p.charging_mode.value == "fast"]
-        existing_trickle = [p for p in existing_piles if p.charging_mode.value == "trickle"]
-        
-        from app.models import ChargingMode, ChargingPileStatus
-        
-        actions = []
-        
-        # 处理快充桩
-        if len(existing_fast) < fast_count:
-            # 需要添加快充桩
-            for i in range(len(existing_fast), fast_count):
-                pile_number = f"F{i+1:02d}"
-                # 确保编号不重复
-                while db.query(ChargingPile).filter(ChargingPile.pile_number == pile_number).first():
-                    i += 1
-                    pile_number = f"F{i+1:02d}"
-                
-                new_pile = ChargingPile(
-                    pile_number=pile_number,
-                    charging_mode=ChargingMode.FAST,
-                    power=fast_power,
-                    status=ChargingPileStatus.NORMAL,
-                    is_active=True
-                )
-                db.add(new_pile)
-                actions.append(f"添加快充桩 {pile_number} (功率: {fast_power}kW)")
-                
-        elif len(existing_fast) > fast_count:
-            # 需要删除快充桩（删除最新的几个）
-            to_remove = existing_fast[fast_count:]
-            for pile in to_remove:
-                # 检查是否有排队或充电中的任务
-                active_queues = db.query(ChargingQueue).filter(
-                    ChargingQueue.charging_pile_id == pile.id,
-                    ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
-                ).count()
-                
-                if active_queues > 0:
-                    actions.append(f"无法删除快充桩 {pile.pile_number}：有活跃任务")
-                else:
-                    db.delete(pile)
-                    actions.append(f"删除快充桩 {pile.pile_number}")
-        
-        # 处理慢充桩
-        if len(existing_trickle) < trickle_count:
-            # 需要添加慢充桩
-            for i in range(len(existing_trickle), trickle_count):
-                pile_number = f"T{i+1:02d}"
-                # 确保编号不重复
-                while db.query(ChargingPile).filter(ChargingPile.pile_number == pile_number).first():
-                    i += 1
-                    pile_number = f"T{i+1:02d}"
-                
-                new_pile = ChargingPile(
-                    pile_number=pile_number,
-                    charging_mode=ChargingMode.TRICKLE,
-                    power=trickle_power,
-                    status=ChargingPileStatus.NORMAL,
-                    is_active=True
-                )
-                db.add(new_pile)
-                actions.append(f"添加慢充桩 {pile_number} (功率: {trickle_power}kW)")
-                
-        elif len(existing_trickle) > trickle_count:
-            # 需要删除慢充桩
-            to_remove = existing_trickle[trickle_count:]
-            for pile in to_remove:
-                # 检查是否有排队或充电中的任务
-                active_queues = db.query(ChargingQueue).filter(
-                    ChargingQueue.charging_pile_id == pile.id,
-                    ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
-                ).count()
-                
-                if active_queues > 0:
-                    actions.append(f"无法删除慢充桩 {pile.pile_number}：有活跃任务")
-                else:
-                    db.delete(pile)
-                    actions.append(f"删除慢充桩 {pile.pile_number}")
-        
-        # 更新现有充电桩的功率
-        for pile in existing_piles:
-            if pile.charging_mode.value == "fast" and pile.power != fast_power:
-                pile.power = fast_power
-                actions.append(f"更新快充桩 {pile.pile_number} 功率：{pile.power} -> {fast_power}kW")
-            elif pile.charging_mode.value == "trickle" and pile.power != trickle_power:
-                pile.power = trickle_power
-                actions.append(f"更新慢充桩 {pile.pile_number} 功率：{pile.power} -> {trickle_power}kW")
+        targets = {
+            ChargingMode.FAST: PileTarget(fast_count, fast_power),
+            ChargingMode.TRICKLE: PileTarget(trickle_count, trickle_power),
+        }
+        piles, plan = load_pile_plan(db, targets)
+        actions = plan.actions()
+        apply_pile_plan(db, plan)
         
-        db.commit()
+        # 最终状态（启用中的充电桩），在提交前统计，避免提交后逐个刷新对象
+        final_modes = [p.charging_mode for p in piles if p.is_active] + [mode for _, mode, _ in plan.create]
+        final_fast_count = final_modes.count(ChargingMode.FAST)
+        final_trickle_count = final_modes.count(ChargingMode.TRICKLE)
         
-        # 获取最终状态
-        final_piles = db.query(ChargingPile).all()
-        final_fast_count = len([p for p in final_piles if p.charging_mode.value == "fast"])
-        final_trickle_count = len([p for p in final_piles if p.charging_mode.value == "trickle"])
+        if plan.changed:
+            db.commit()
+            
+            # 退回等候区的车辆和新增的排队位立即参与调度
+            ChargingScheduleService(db).schedule_charging()
         
         return {
             "message": "充电桩自动配置完成",
@@ -853,7 +724,7 @@ def auto_configure_piles(
             "final_status": {
                 "fast_piles": final_fast_count,
                 "trickle_piles": final_trickle_count,
-                "total_piles": len(final_piles)
+                "total_piles": final_fast_count + final_trickle_count
             },
             "actions": actions
         }
@@ -863,8 +734,8 @@ def auto_configure_piles(
         raise HTTPException(status_code=500, detail=f"自动配置失败: {str(e)}")
 
 @router.get("/users", response_model=List[dict])
-async def get_all_users(
-    admin_user: User = Depends(get_admin_user),
+def get_all_users(
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -872,10 +743,14 @@ async def get_all_users(
     """
     users = db.query(User).all()
     
+    # 一次查询统计所有用户的车辆数量
+    vehicle_counts = dict(
+        db.query(Vehicle.owner_id, func.count(Vehicle.id)).group_by(Vehicle.owner_id).all()
+    )
+    
     result = []
     for user in users:
-        # 获取用户的车辆数量
-        vehicle_count = db.query(Vehicle).filter(Vehicle.user_id == user.id).count()
+        vehicle_count = vehicle_counts.get(user.id, 0)
         
         result.append({
             "id": user.id,
@@ -891,9 +766,9 @@ async def get_all_users(
     return result
 
 @router.get("/users/{user_id}/detail", response_model=dict)
-async def get_user_detail(
+def get_user_detail(
     user_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -904,7 +779,7 @@ async def get_user_detail(
         raise HTTPException(status_code=404, detail="用户不存在")
     
     # 获取用户的车辆
-    vehicles = db.query(Vehicle).filter(Vehicle.user_id == user_id).all()
+    vehicles = db.query(Vehicle).filter(Vehicle.owner_id == user_id).all()
     
     # 获取用户的充电记录统计
     charging_records = db.query(ChargingRecord).filter(ChargingRecord.user_id == user_id).all()
@@ -957,10 +832,10 @@ async def get_user_detail(
     }
 
 @router.put("/users/{user_id}/status", response_model=dict)
-async def update_user_status(
+def update_user_status(
     user_id: int,
     status_data: dict,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -975,13 +850,16 @@ async def update_user_status(
         user.is_active = status_data.get('is_active', True)
         db.commit()
         db.refresh(user)
+        
+        # 本进程内已签发令牌的缓存立即失效；其他进程的缓存在 TTL 过期后失效
+        principal_cache.invalidate_user(user_id)
     
     return {"message": "用户状态更新成功", "user_id": user_id}
 
 @router.delete("/queue/{queue_id}/cancel", summary="取消排队")
-async def cancel_queue(
+def cancel_queue(
     queue_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1017,9 +895,9 @@ async def cancel_queue(
     }
 
 @router.post("/queue/{queue_id}/stop-charging", summary="停止充电")
-async def stop_charging(
+def stop_charging(
     queue_id: int,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1071,22 +949,18 @@ async def stop_charging(
         raise HTTPException(status_code=500, detail=f"停止充电失败: {str(e)}")
 
 @router.get("/queue/active", summary="获取所有活跃队列")
-async def get_active_queues(
-    admin_user: User = Depends(get_admin_user),
+def get_active_queues(
+    admin_user: Principal = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
     """
     获取所有排队中和充电中的记录（用于管理操作）
     """
-    queues = db.query(ChargingQueue).filter(
-        ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
-    ).all()
+    queues = load_active_queues(db, [QueueStatus.QUEUING, QueueStatus.CHARGING])
     
     result = []
     for queue in queues:
-        vehicle = db.query(Vehicle).filter(Vehicle.id == queue.vehicle_id).first()
-        user = db.query(User).filter(User.id == queue.user_id).first()
-        charging_pile = db.query(ChargingPile).filter(ChargingPile.id == queue.charging_pile_id).first()
+        vehicle, user, charging_pile = queue.vehicle, queue.user, queue.pile
         
         result.append({
             "id": queue.id,
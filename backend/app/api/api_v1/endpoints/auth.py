@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_db, SessionLocal
 from app.models import User
 from app.core.config import settings
+from app.services.principal_cache import Principal, principal_cache
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
 
 router = APIRouter()
 
@@ -15,6 +20,18 @@ router = APIRouter()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
+# 推送连接票据的有效期(秒)。EventSource 无法设置请求头，票据放在查询参数中会出现在访问日志里，
+# 因此只签发短期、仅能用于建立推送连接的票据，而不是访问令牌
+STREAM_TICKET_EXPIRE_SECONDS = 60
+STREAM_TICKET_SCOPE = "stream"
+
+# bcrypt 计算密集：在固定大小的线程池中执行，登录高峰时不会占满CPU；排队过多时直接拒绝。
+# 登录和注册是异步接口，等待哈希结果时不占用请求线程池（AnyIO 默认 40 个线程），其他接口不受登录高峰影响
+password_executor = ThreadPoolExecutor(max_workers=settings.SECURITY_PASSWORD_HASH_WORKERS,
+                                       thread_name_prefix="password-hash")
+_password_slots = threading.BoundedSemaphore(settings.SECURITY_PASSWORD_HASH_WORKERS
+                                             + settings.SECURITY_PASSWORD_HASH_QUEUE)
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -29,6 +46,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
 class UserResponse(BaseModel):
     id: int
     username: str
@@ -47,6 +68,15 @@ def get_password_hash(password):
     """获取密码哈希"""
     return pwd_context.hash(password)
 
+async def run_password_hash(func, *args):
+    """在密码哈希线程池中执行 verify_password / get_password_hash，等待中的请求过多时返回429"""
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="登录请求过多，请稍后再试")
+    try:
+        return await asyncio.wrap_future(password_executor.submit(func, *args))
+    finally:
+        _password_slots.release()
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -58,8 +88,12 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """获取当前用户"""
+def get_user_by_token(token: str, db: Session) -> Principal:
+    """根据访问令牌获取用户（命中缓存时不查询数据库）"""
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -68,29 +102,56 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        # 推送票据不能当作访问令牌使用
+        if username is None or payload.get("scope") is not None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
     user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    if user is None or user.is_active is False:
         raise credentials_exception
-    return user
+    
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
 
-@router.post("/register", response_model=UserResponse, summary="用户注册")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    """用户注册"""
-    # 检查用户名是否已存在
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """获取当前用户（只读的用户信息，需要修改用户时请按ID重新查询）"""
+    return get_user_by_token(token, db)
+
+def get_stream_user(ticket: str):
+    """推送连接的鉴权（EventSource 无法设置请求头，票据通过查询参数传递）
+
+    只接受 /auth/stream-ticket 签发的票据。使用独立的短会话，避免长连接在整个推送期间占用数据库会话。
+    """
+    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="推送票据无效或已过期")
+    try:
+        payload = jwt.decode(ticket, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("scope") != STREAM_TICKET_SCOPE or payload.get("sub") is None:
+        raise credentials_exception
+    
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == payload["sub"]).first()
+        if user is None or user.is_active is False:
+            raise credentials_exception
+        return user.id, user.is_admin
+    finally:
+        db.close()
+
+def check_new_user(user: UserCreate, db: Session):
+    """检查用户名和邮箱是否已存在"""
     if db.query(User).filter(User.username == user.username).first():
         raise HTTPException(status_code=400, detail="用户名已存在")
     
-    # 检查邮箱是否已存在
     if db.query(User).filter(User.email == user.email).first():
         raise HTTPException(status_code=400, detail="邮箱已存在")
-    
-    # 创建新用户
-    hashed_password = get_password_hash(user.password)
+
+def save_new_user(user: UserCreate, hashed_password: str, db: Session) -> User:
+    """保存新用户"""
     db_user = User(
         username=user.username,
         email=user.email,
@@ -101,15 +162,27 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    
     return db_user
 
+def get_user_by_username(username: str, db: Session):
+    """按用户名查询用户"""
+    return db.query(User).filter(User.username == username).first()
+
+@router.post("/register", response_model=UserResponse, summary="用户注册")
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    """用户注册（数据库操作在请求线程池中执行，计算密码哈希时不占用请求线程）"""
+    await run_in_threadpool(check_new_user, user, db)
+    
+    # 创建新用户
+    hashed_password = await run_password_hash(get_password_hash, user.password)
+    return await run_in_threadpool(save_new_user, user, hashed_password, db)
+
 @router.post("/login", response_model=Token, summary="用户登录")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    """用户登录"""
-    user = db.query(User).filter(User.username == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """用户登录（查询用户在请求线程池中执行，校验密码时不占用请求线程）"""
+    user = await run_in_threadpool(get_user_by_username, form_data.username, db)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await run_password_hash(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -123,7 +196,16 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/stream-ticket", response_model=StreamTicket, summary="签发推送连接票据")
+def create_stream_ticket(current_user: Principal = Depends(get_current_user)):
+    """签发短期票据，用于建立 SSE 推送连接（票据过期后需重新签发）"""
+    ticket = create_access_token(
+        data={"sub": current_user.username, "scope": STREAM_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS)
+    )
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_EXPIRE_SECONDS}
+
 @router.get("/me", response_model=UserResponse, summary="获取当前用户信息")
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_user)):
     """获取当前用户信息"""
     return current_user 
\ No newline at end of file
@@ -4,8 +4,9 @@ from typing import List
 from pydantic import BaseModel
 from datetime import datetime
 from app.core.database import get_db
-from app.models import User, ChargingQueue, ChargingRecord, ChargingMode, QueueStatus
+from app.models import ChargingQueue, ChargingRecord, ChargingMode, QueueStatus
 from app.services.charging_service import ChargingScheduleService
+from app.services.principal_cache import Principal
 from .auth import get_current_user
 
 router = APIRouter()
@@ -50,7 +51,7 @@ class ModifyRequest(BaseModel):
 @router.post("/request", response_model=dict, summary="提交充电请求")
 def submit_charging_request(
     request: ChargingRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """提交充电请求"""
@@ -76,7 +77,7 @@ def submit_charging_request(
 
 @router.get("/queue", response_model=List[QueueResponse], summary="查看排队状态")
 def get_user_queue(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """查看用户的排队状态"""
@@ -90,7 +91,7 @@ def get_user_queue(
 @router.get("/queue/{queue_id}", response_model=QueueResponse, summary="查看特定排队信息")
 def get_queue_info(
     queue_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """查看特定排队信息"""
@@ -107,7 +108,7 @@ def get_queue_info(
 @router.get("/waiting-count/{charging_mode}", summary="查看排队等待数量")
 def get_waiting_count(
     charging_mode: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """查看指定充电模式的等待数量"""
@@ -124,7 +125,7 @@ def get_waiting_count(
 def modify_charging_request(
     queue_id: int,
     request: ModifyRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """修改充电请求"""
@@ -158,7 +159,7 @@ def modify_charging_request(
 @router.delete("/cancel/{queue_id}", summary="取消充电")
 def cancel_charging(
     queue_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """取消充电"""
@@ -182,7 +183,7 @@ def cancel_charging(
 
 @router.get("/records", response_model=List[ChargingRecordResponse], summary="查看充电详单")
 def get_charging_records(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """查看用户的充电详单"""
@@ -195,7 +196,7 @@ def get_charging_records(
 @router.get("/records/{record_id}", response_model=ChargingRecordResponse, summary="查看特定充电详单")
 def get_charging_record(
     record_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """查看特定充电详单"""
@@ -1,5 +1,5 @@
 import json
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
@@ -7,8 +7,8 @@ from pydantic import BaseModel, Field
 
 from app.core.database import get_db
 from app.models.config import SystemConfig
-from app.models.user import User
 from .auth import get_current_user
+from app.services.principal_cache import Principal
 from app.services.config_service import config_service
 
 router = APIRouter()
@@ -61,7 +61,28 @@ CONFIG_CATEGORIES = {
 }
 
 
-def get_current_admin_user(current_user: User = Depends(get_current_user)):
+def _validate_boolean(value: str):
+    if value.lower() not in ("true", "false", "1", "0"):
+        raise ValueError("布尔值必须是 true/false 或 1/0")
+
+
+# 各配置类型的值校验函数，值非法时抛出 ValueError（json.JSONDecodeError 是其子类）；string 类型不校验
+CONFIG_VALIDATORS: Dict[str, Callable[[str], Any]] = {
+    "integer": int,
+    "float": float,
+    "boolean": _validate_boolean,
+    "json": json.loads,
+}
+
+
+def validate_config_value(config_type: str, config_value: str):
+    """按配置类型校验配置值，非法时抛出 ValueError"""
+    validator = CONFIG_VALIDATORS.get(config_type)
+    if validator is not None:
+        validator(config_value)
+
+
+def get_current_admin_user(current_user: Principal = Depends(get_current_user)):
     """获取当前管理员用户"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="需要管理员权限")
@@ -75,10 +96,10 @@ async def get_config_categories():
 
 
 @router.get("/", response_model=List[ConfigResponse])
-async def get_all_configs(
+def get_all_configs(
     category: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """获取所有配置项"""
     query = db.query(SystemConfig)
@@ -90,10 +111,10 @@ async def get_all_configs(
 
 
 @router.get("/{config_key}", response_model=ConfigResponse)
-async def get_config(
+def get_config(
     config_key: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """获取单个配置项"""
     config = db.query(SystemConfig).filter(SystemConfig.config_key == config_key).first()
@@ -106,11 +127,11 @@ async def get_config(
 
 
 @router.put("/{config_key}", response_model=ConfigResponse)
-async def update_config(
+def update_config(
     config_key: str,
     config_update: ConfigUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """更新配置项"""
     config = db.query(SystemConfig).filter(SystemConfig.config_key == config_key).first()
@@ -122,20 +143,8 @@ async def update_config(
     
     # 验证配置值格式
     try:
-        if config.config_type in ["integer", "float"]:
-            # 验证数值类型
-            if config.config_type == "integer":
-                int(config_update.config_value)
-            else:
-                float(config_update.config_value)
-        elif config.config_type == "boolean":
-            # 验证布尔类型
-            if config_update.config_value.lower() not in ["true", "false", "1", "0"]:
-                raise ValueError("布尔值必须是 true/false 或 1/0")
-        elif config.config_type == "json":
-            # 验证JSON格式
-            json.loads(config_update.config_value)
-    except (ValueError, json.JSONDecodeError) as e:
+        validate_config_value(config.config_type, config_update.config_value)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"配置值格式错误: {str(e)}"
@@ -157,10 +166,10 @@ async def update_config(
 
 
 @router.post("/", response_model=ConfigResponse)
-async def create_config(
+def create_config(
     config_item: ConfigItem,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """创建新配置项"""
     # 检查配置键是否已存在
@@ -173,17 +182,8 @@ async def create_config(
     
     # 验证配置值格式
     try:
-        if config_item.config_type in ["integer", "float"]:
-            if config_item.config_type == "integer":
-                int(config_item.config_value)
-            else:
-                float(config_item.config_value)
-        elif config_item.config_type == "boolean":
-            if config_item.config_value.lower() not in ["true", "false", "1", "0"]:
-                raise ValueError("布尔值必须是 true/false 或 1/0")
-        elif config_item.config_type == "json":
-            json.loads(config_item.config_value)
-    except (ValueError, json.JSONDecodeError) as e:
+        validate_config_value(config_item.config_type, config_item.config_value)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"配置值格式错误: {str(e)}"
@@ -201,10 +201,10 @@ async def create_config(
 
 
 @router.delete("/{config_key}")
-async def delete_config(
+def delete_config(
     config_key: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """删除配置项"""
     config = db.query(SystemConfig).filter(SystemConfig.config_key == config_key).first()
@@ -224,59 +224,84 @@ async def delete_config(
 
 
 @router.post("/batch-update")
-async def batch_update_configs(
+def batch_update_configs(
     updates: List[Dict[str, Any]],
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    """批量更新配置项"""
-    results = []
+    """批量更新配置项
+    
+    一次查询加载所有配置项，按类型校验全部配置值；任何一项有误则不做任何修改并返回400
+    （与单项更新一致），全部通过时在一个事务中提交（配置版本号只递增一次）。
+    """
     errors = []
     
+    keys = {update_data.get("config_key") for update_data in updates}
+    keys.discard(None)
+    configs = {
+        config.config_key: config
+        for config in db.query(SystemConfig).filter(SystemConfig.config_key.in_(keys)).all()
+    } if keys else {}
+    
+    # 先校验全部配置项，不修改任何对象
+    changes = []
     for update_data in updates:
+        config_key = update_data.get("config_key")
+        config_value = update_data.get("config_value")
+        
+        if not config_key or config_value is None:
+            errors.append(f"配置项缺少必要字段: {update_data}")
+            continue
+        
+        config = configs.get(config_key)
+        if not config:
+            errors.append(f"配置项 {config_key} 不存在")
+            continue
+        
+        # 非字符串的值（数字、布尔、对象）按JSON编码
+        if not isinstance(config_value, str):
+            config_value = json.dumps(config_value, ensure_ascii=False)
         try:
-            config_key = update_data.get("config_key")
-            config_value = update_data.get("config_value")
-            
-            if not config_key or config_value is None:
-                errors.append(f"配置项缺少必要字段: {update_data}")
-                continue
-                
-            config = db.query(SystemConfig).filter(SystemConfig.config_key == config_key).first()
-            if not config:
-                errors.append(f"配置项 {config_key} 不存在")
-                continue
-            
-            # 验证和更新配置值
-            config.config_value = str(config_value)
-            if "description" in update_data:
-                config.description = update_data["description"]
-            if "is_active" in update_data:
-                config.is_active = update_data["is_active"]
-                
-            results.append(config_key)
-            
-        except Exception as e:
-            errors.append(f"更新 {config_key} 失败: {str(e)}")
+            validate_config_value(config.config_type, config_value)
+        except ValueError as e:
+            errors.append(f"配置项 {config_key} 的值格式错误: {str(e)}")
+            continue
+        
+        changes.append((config, config_value, update_data))
+    
+    if errors:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="；".join(errors)
+        )
     
-    if results:
-        db.commit()
+    results = []
+    for config, config_value, update_data in changes:
+        config.config_value = config_value
+        if "description" in update_data:
+            config.description = update_data["description"]
+        if "is_active" in update_data:
+            config.is_active = update_data["is_active"]
+        results.append(config.config_key)
+    
+    db.commit()
     
     # 清空缓存
     config_service.invalidate_cache()
     
     return {
         "success_count": len(results),
-        "error_count": len(errors),
+        "error_count": 0,
         "updated_configs": results,
         "errors": errors
     }
 
 
 @router.get("/export/yaml")
-async def export_config_yaml(
+def export_config_yaml(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """导出配置为YAML格式"""
     import yaml
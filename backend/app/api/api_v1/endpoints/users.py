@@ -1,11 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from app.core.database import get_db
-from app.models import User, Vehicle, ChargingQueue, QueueStatus, ChargingPile, ChargingRecord
-from .auth import get_current_user
+from app.models import Vehicle, ChargingQueue, QueueStatus, ChargingPile, ChargingRecord
+from app.services.state_stream import station_state_stream
+from app.services.queue_index import QueuePositionIndex, queue_position_index, query_position
+from app.services.principal_cache import Principal
+from .auth import get_current_user, get_stream_user
 
 router = APIRouter()
 
@@ -40,7 +46,7 @@ class QueueStatusResponse(BaseModel):
 @router.post("/vehicles", response_model=VehicleResponse, summary="添加车辆")
 def create_vehicle(
     vehicle: VehicleCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """添加车辆"""
@@ -63,7 +69,7 @@ def create_vehicle(
 
 @router.get("/vehicles", response_model=List[VehicleResponse], summary="获取用户车辆列表")
 def get_user_vehicles(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取用户的车辆列表"""
@@ -73,7 +79,7 @@ def get_user_vehicles(
 @router.get("/vehicles/{vehicle_id}", response_model=VehicleResponse, summary="获取特定车辆信息")
 def get_vehicle(
     vehicle_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取特定车辆信息"""
@@ -91,7 +97,7 @@ def get_vehicle(
 def update_vehicle(
     vehicle_id: int,
     vehicle: VehicleCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """更新车辆信息"""
@@ -124,7 +130,7 @@ def update_vehicle(
 @router.delete("/vehicles/{vehicle_id}", summary="删除车辆")
 def delete_vehicle(
     vehicle_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """删除车辆"""
@@ -143,12 +149,15 @@ def delete_vehicle(
 
 @router.get("/queue/status", response_model=List[QueueStatusResponse], summary="获取用户排队状态")
 def get_user_queue_status(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取用户当前的排队状态"""
-    # 查找用户的活跃队列（等待中、排队中、正在充电）
-    active_queues = db.query(ChargingQueue).filter(
+    # 排队位置来自调度器维护的内存索引，最多每秒检查一次状态版本号，变化时才重建
+    queue_position_index.refresh_if_stale(db)
+    
+    # 查找用户的活跃队列（等待中、排队中、正在充电），一并加载充电桩
+    active_queues = db.query(ChargingQueue).options(selectinload(ChargingQueue.pile)).filter(
         ChargingQueue.user_id == current_user.id,
         ChargingQueue.status.in_([QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING])
     ).all()
@@ -156,38 +165,14 @@ def get_user_queue_status(
     result = []
     for queue in active_queues:
         # 获取充电桩信息
-        pile = db.query(ChargingPile).filter(ChargingPile.id == queue.charging_pile_id).first()
+        pile = queue.pile
         pile_name = f"{pile.charging_mode.value}充电桩-{pile.pile_number}" if pile else f"充电桩-{queue.charging_pile_id}"
         
-        # 计算排队位置和总人数
-        if queue.charging_pile_id:
-            # 已分配充电桩的情况
-            queuing_before = db.query(ChargingQueue).filter(
-                ChargingQueue.charging_pile_id == queue.charging_pile_id,
-                ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING]),
-                ChargingQueue.queue_time < queue.queue_time
-            ).count()
-            
-            total_in_queue = db.query(ChargingQueue).filter(
-                ChargingQueue.charging_pile_id == queue.charging_pile_id,
-                ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
-            ).count()
-            
-            position = queuing_before + 1
-        else:
-            # 等候区的情况
-            waiting_before = db.query(ChargingQueue).filter(
-                ChargingQueue.charging_mode == queue.charging_mode,
-                ChargingQueue.status == QueueStatus.WAITING,
-                ChargingQueue.queue_time < queue.queue_time
-            ).count()
-            
-            total_in_queue = db.query(ChargingQueue).filter(
-                ChargingQueue.charging_mode == queue.charging_mode,
-                ChargingQueue.status == QueueStatus.WAITING
-            ).count()
-            
-            position = waiting_before + 1
+        # 排队位置和总人数（索引中还没有该队列，或索引重建前已移入其他队列时逐条统计）
+        located = queue_position_index.position(queue.id, QueuePositionIndex.group_of(queue))
+        if located is None:
+            located = query_position(db, queue)
+        position, total_in_queue = located
         
         # 计算预计等待时间（简单估算：每人平均30分钟）
         if queue.status == QueueStatus.WAITING:
@@ -216,9 +201,23 @@ def get_user_queue_status(
     
     return result
 
+@router.get("/queue/stream", summary="订阅排队状态推送（SSE）")
+async def stream_user_queue_status(ticket: str):
+    """
+    以 Server-Sent Events 推送当前用户车辆的排队状态变化
+    
+    ticket 由 /auth/stream-ticket 签发。连接建立后先推送一次 snapshot，之后只推送 diff（新增或变化的队列和已离开的队列ID）
+    """
+    user_id, _ = await run_in_threadpool(get_stream_user, ticket)
+    return StreamingResponse(
+        station_state_stream.events(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/charging/config", summary="获取充电配置信息（用户端）")
 def get_charging_config_for_users(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取充电相关配置信息，用户端使用"""
@@ -247,7 +246,7 @@ def get_charging_config_for_users(
 
 @router.get("/vehicles-monitoring", summary="车辆监控")
 def get_vehicles_monitoring(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取当前用户所有车辆的实时状态信息，用于用户端监控"""
@@ -260,11 +259,21 @@ def get_vehicles_monitoring(
             Vehicle.owner_id == current_user.id
         ).all()
         
-        # 获取所有活跃队列信息
+        vehicle_ids = [vehicle.id for vehicle in vehicles]
+        
+        # 只获取当前用户车辆的活跃队列信息
         queues = db.query(ChargingQueue).filter(
+            ChargingQueue.vehicle_id.in_(vehicle_ids),
             ChargingQueue.status.in_([QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING])
         ).all()
         
+        # 一次分组查询获取各车辆最后一次充电时间
+        last_charging_times = dict(db.query(
+            ChargingRecord.vehicle_id, func.max(ChargingRecord.end_time)
+        ).filter(
+            ChargingRecord.vehicle_id.in_(vehicle_ids)
+        ).group_by(ChargingRecord.vehicle_id).all())
+        
         # 创建车辆状态映射
         vehicle_status_map = {}
         vehicle_queue_map = {}
@@ -311,14 +320,8 @@ def get_vehicles_monitoring(
                         "charging_pile_id": queue.charging_pile_id
                     }
                 
-                # 获取最后一次充电记录
-                last_charging_record = db.query(ChargingRecord).filter(
-                    ChargingRecord.vehicle_id == vehicle.id
-                ).order_by(ChargingRecord.end_time.desc()).first()
-                
-                last_charging_time = None
-                if last_charging_record:
-                    last_charging_time = last_charging_record.end_time
+                # 获取最后一次充电时间
+                last_charging_time = last_charging_times.get(vehicle.id)
                 
                 vehicle_data = {
                     "id": vehicle.id,
@@ -347,7 +350,7 @@ def get_vehicles_monitoring(
 @router.get("/vehicles/{vehicle_id}/detail", summary="获取车辆详细信息")
 def get_vehicle_detail(
     vehicle_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取指定车辆的详细信息"""
@@ -443,7 +446,7 @@ def get_vehicle_detail(
 @router.post("/vehicles/{vehicle_id}/end-charging", summary="结束充电")
 def end_vehicle_charging(
     vehicle_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """结束指定车辆的充电"""
@@ -87,6 +87,10 @@ class Settings(BaseSettings):
             
             # 系统配置
             "SYSTEM_SCHEDULING_STRATEGY": "shortest_time",
+            "SYSTEM_PERIODIC_SCHEDULE_INTERVAL": 300,
+            "SYSTEM_STATE_STREAM_POLL_INTERVAL": 1.0,
+            "SYSTEM_SCHEDULER_LEASE_TTL": 15,
+            "SYSTEM_SCHEDULER_POLL_INTERVAL": 1.0,
             "SYSTEM_FAULT_DETECTION_INTERVAL": 30,
             "SYSTEM_AUTO_RESTART_ON_FAULT": True,
             "SYSTEM_MAX_FAULT_RESTART_ATTEMPTS": 3,
@@ -95,6 +99,9 @@ class Settings(BaseSettings):
             "SECURITY_SESSION_TIMEOUT_MINUTES": 30,
             "SECURITY_MAX_LOGIN_ATTEMPTS": 5,
             "SECURITY_PASSWORD_MIN_LENGTH": 6,
+            "SECURITY_PASSWORD_HASH_WORKERS": 4,
+            "SECURITY_PASSWORD_HASH_QUEUE": 64,
+            "SECURITY_AUTH_CACHE_TTL": 30,
             
             # 服务器配置
             "SERVER_BACKEND_HOST": "0.0.0.0",
@@ -105,11 +112,35 @@ class Settings(BaseSettings):
             
             # 数据库配置
             "DATABASE_URL": "sqlite:///./charging_system.db",
+            "DATABASE_POOL_SIZE": 10,
+            "DATABASE_MAX_OVERFLOW": 20,
+            "DATABASE_POOL_TIMEOUT": 30,
+            "DATABASE_POOL_RECYCLE": 1800,
+            "DATABASE_SQLITE_JOURNAL_MODE": "WAL",
+            "DATABASE_SQLITE_SYNCHRONOUS": "NORMAL",
+            "DATABASE_SQLITE_BUSY_TIMEOUT": 5000,
+            "DATABASE_SQLITE_MMAP_SIZE": 268435456,
+            "DATABASE_SQLITE_CACHE_SIZE": -65536,
+            "DATABASE_SQLITE_TEMP_STORE": "MEMORY",
         }
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./charging_system.db"
     
+    # 连接池（服务端数据库）
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT: int = 30  # 秒
+    DATABASE_POOL_RECYCLE: int = 1800  # 秒
+    
+    # SQLite 连接参数
+    DATABASE_SQLITE_JOURNAL_MODE: str = "WAL"
+    DATABASE_SQLITE_SYNCHRONOUS: str = "NORMAL"
+    DATABASE_SQLITE_BUSY_TIMEOUT: int = 5000  # 毫秒
+    DATABASE_SQLITE_MMAP_SIZE: int = 268435456  # 字节
+    DATABASE_SQLITE_CACHE_SIZE: int = -65536  # 负数单位为KiB
+    DATABASE_SQLITE_TEMP_STORE: str = "MEMORY"
+    
     # 安全配置
     SECRET_KEY: str = "charging-station-secret-key-2024"
     ALGORITHM: str = "HS256"
@@ -139,6 +170,10 @@ class Settings(BaseSettings):
     
     # 系统配置
     SYSTEM_SCHEDULING_STRATEGY: str = "shortest_time"
+    SYSTEM_PERIODIC_SCHEDULE_INTERVAL: int = 300  # 兜底周期调度间隔(秒)
+    SYSTEM_STATE_STREAM_POLL_INTERVAL: float = 1.0  # 状态推送检查版本号的间隔(秒)
+    SYSTEM_SCHEDULER_LEASE_TTL: int = 15  # 调度租约有效期(秒)
+    SYSTEM_SCHEDULER_POLL_INTERVAL: float = 1.0  # 调度进程检查其他进程修改的间隔(秒)
     SYSTEM_FAULT_DETECTION_INTERVAL: int = 30
     SYSTEM_AUTO_RESTART_ON_FAULT: bool = True
     SYSTEM_MAX_FAULT_RESTART_ATTEMPTS: int = 3
@@ -147,6 +182,9 @@ class Settings(BaseSettings):
     SECURITY_SESSION_TIMEOUT_MINUTES: int = 30
     SECURITY_MAX_LOGIN_ATTEMPTS: int = 5
     SECURITY_PASSWORD_MIN_LENGTH: int = 6
+    SECURITY_PASSWORD_HASH_WORKERS: int = 4  # 密码哈希校验线程数
+    SECURITY_PASSWORD_HASH_QUEUE: int = 64  # 排队等待校验的登录请求上限
+    SECURITY_AUTH_CACHE_TTL: int = 30  # 令牌→用户缓存有效期(秒)
     
     # 服务器配置
     SERVER_BACKEND_HOST: str = "0.0.0.0"
@@ -1,21 +1,98 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from typing import Dict, List
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+def sqlite_pragmas(config=settings) -> Dict[str, object]:
+    """配置文件中的 SQLite 连接参数（按执行顺序）"""
+    return {
+        "journal_mode": config.DATABASE_SQLITE_JOURNAL_MODE,
+        "synchronous": config.DATABASE_SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.DATABASE_SQLITE_BUSY_TIMEOUT,
+        "mmap_size": config.DATABASE_SQLITE_MMAP_SIZE,
+        "cache_size": config.DATABASE_SQLITE_CACHE_SIZE,
+        "temp_store": config.DATABASE_SQLITE_TEMP_STORE,
+    }
+
+def configure_sqlite(bind: Engine, pragmas: Dict[str, object]):
+    """为 SQLite 引擎注册连接钩子，每个新连接建立时执行一次 PRAGMA
+
+    journal_mode=WAL 写入数据库文件后对所有连接持久生效，其余参数只对当前连接有效。
+    """
+    @event.listens_for(bind, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def engine_options(url: str, config=settings) -> Dict[str, object]:
+    """按数据库类型生成 create_engine 参数：SQLite 允许跨线程使用连接，服务端数据库使用配置的连接池"""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": config.DATABASE_POOL_SIZE,
+        "max_overflow": config.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": config.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": config.DATABASE_POOL_RECYCLE,
+        # 取出连接时先探测，数据库重启后自动丢弃失效连接
+        "pool_pre_ping": True,
+    }
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+
+if engine.dialect.name == "sqlite":
+    configure_sqlite(engine, sqlite_pragmas())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def create_missing_columns(bind=engine) -> List[str]:
+    """为已存在的数据表补建模型中新增的可空列（create_all 不会修改已有表），返回补建的列名"""
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+def create_missing_indexes(bind=engine):
+    """为已存在的数据表补建模型中新增的索引（create_all 不会修改已有表）"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def session_scope():
+    """后台任务使用的短生命周期会话：正常结束时提交，出错时回滚，最后关闭"""
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
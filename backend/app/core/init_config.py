@@ -77,6 +77,22 @@ def init_database_config(db: Session, config_data: dict):
                 "type": "string",
                 "description": "调度策略"
             },
+            "periodic_schedule_interval": {
+                "type": "integer",
+                "description": "兜底周期调度间隔(秒)"
+            },
+            "state_stream_poll_interval": {
+                "type": "float",
+                "description": "状态推送检查版本号的间隔(秒)"
+            },
+            "scheduler_lease_ttl": {
+                "type": "integer",
+                "description": "调度租约有效期(秒)"
+            },
+            "scheduler_poll_interval": {
+                "type": "float",
+                "description": "调度进程检查其他进程修改的间隔(秒)"
+            },
             "fault_detection_interval": {
                 "type": "integer",
                 "description": "故障检测间隔(秒)"
@@ -128,6 +144,18 @@ def init_database_config(db: Session, config_data: dict):
             "password_min_length": {
                 "type": "integer",
                 "description": "密码最小长度"
+            },
+            "password_hash_workers": {
+                "type": "integer",
+                "description": "密码哈希校验线程数"
+            },
+            "password_hash_queue": {
+                "type": "integer",
+                "description": "排队等待校验的登录请求上限"
+            },
+            "auth_cache_ttl": {
+                "type": "integer",
+                "description": "令牌→用户缓存有效期(秒)"
             }
         },
         
@@ -168,6 +196,26 @@ def init_database_config(db: Session, config_data: dict):
             "backup_interval_hours": {
                 "type": "integer",
                 "description": "备份间隔(小时)"
+            },
+            "pool_size": {
+                "type": "integer",
+                "description": "连接池常驻连接数"
+            },
+            "max_overflow": {
+                "type": "integer",
+                "description": "连接池额外连接数"
+            },
+            "pool_timeout": {
+                "type": "integer",
+                "description": "等待空闲连接的最长时间(秒)"
+            },
+            "pool_recycle": {
+                "type": "integer",
+                "description": "连接重建时长(秒)"
+            },
+            "sqlite": {
+                "type": "json",
+                "description": "SQLite 连接参数"
             }
         }
     }
@@ -1,10 +1,16 @@
 from .user import User, Vehicle
 from .charging import ChargingPile, ChargingQueue, ChargingRecord, ChargingMode, ChargingPileStatus, QueueStatus
 from .config import SystemConfig
+from .statistics import PileDailyStats
+from .sequence import SequenceCounter
+from .lease import SchedulerLease
 
 __all__ = [
     "User", "Vehicle", 
     "ChargingPile", "ChargingQueue", "ChargingRecord",
     "ChargingMode", "ChargingPileStatus", "QueueStatus",
-    "SystemConfig"
+    "SystemConfig",
+    "PileDailyStats",
+    "SequenceCounter",
+    "SchedulerLease"
 ] 
\ No newline at end of file
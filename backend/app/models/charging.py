@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, Enum, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -15,6 +15,7 @@ class ChargingPileStatus(enum.Enum):
     CHARGING = "charging"  # 使用中
     FAULT = "fault"  # 故障
     OFFLINE = "offline"  # 离线
+    RETIRED = "retired"  # 按配置缩容停用，扩容时可重新启用
 
 class QueueStatus(enum.Enum):
     """排队状态枚举"""
@@ -49,6 +50,14 @@ class ChargingPile(Base):
 class ChargingQueue(Base):
     """充电队列模型"""
     __tablename__ = "charging_queues"
+    __table_args__ = (
+        # 充电桩队列：按桩查询排队/充电中的车辆，按排队时间取下一辆
+        Index("ix_charging_queues_pile_status", "charging_pile_id", "status", "queue_time"),
+        # 调度：按模式查询等候区/活跃队列，按排队时间先来先服务
+        Index("ix_charging_queues_mode_status", "charging_mode", "status", "queue_time"),
+        # 车辆当前是否有活跃的充电请求
+        Index("ix_charging_queues_vehicle_status", "vehicle_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     queue_number = Column(String(20), unique=True, index=True, nullable=False)  # 排队号码(F1, T1等)
@@ -75,6 +84,10 @@ class ChargingQueue(Base):
 class ChargingRecord(Base):
     """充电记录模型"""
     __tablename__ = "charging_records"
+    __table_args__ = (
+        # 车辆最近一次充电时间（按车辆分组取 max(end_time)）
+        Index("ix_charging_records_vehicle_end", "vehicle_id", "end_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     record_number = Column(String(50), unique=True, index=True, nullable=False)  # 详单编号
@@ -97,7 +110,15 @@ class ChargingRecord(Base):
     unit_price = Column(Float, nullable=False)  # 单位电价
     time_period = Column(String(20), nullable=False)  # 时段(峰/平/谷)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 计费时按当时的电价时段拆分的充电量和充电费（日统计按此累加；旧详单为空）
+    peak_amount = Column(Float)  # 峰时充电量
+    normal_amount = Column(Float)  # 平时充电量
+    valley_amount = Column(Float)  # 谷时充电量
+    peak_electricity_fee = Column(Float)  # 峰时充电费
+    normal_electricity_fee = Column(Float)  # 平时充电费
+    valley_electricity_fee = Column(Float)  # 谷时充电费
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # 按创建时间范围查询（详单编号当日首次取号）
     
     # 关联关系
     user = relationship("User", back_populates="charging_records")
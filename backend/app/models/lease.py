@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from app.core.database import Base
+
+
+class SchedulerLease(Base):
+    """调度租约：多个工作进程中只有持有未过期租约的进程执行调度"""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(50), primary_key=True)  # 租约名称
+    holder = Column(String(100), nullable=False)  # 持有者（主机名:进程号:随机后缀）
+    expires_at = Column(DateTime, nullable=False)  # 过期时间，持有者需在此之前续约
+    heartbeat_at = Column(DateTime, nullable=False)  # 最近一次续约时间
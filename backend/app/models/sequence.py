@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from app.core.database import Base
+
+
+class SequenceCounter(Base):
+    """命名序列计数器（排队号码、详单编号等），取号只更新一行，不扫描业务表"""
+    __tablename__ = "sequence_counters"
+
+    name = Column(String(50), primary_key=True)  # 序列名称
+    value = Column(Integer, nullable=False, default=0)  # 最近分配的值
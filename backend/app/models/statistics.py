@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, UniqueConstraint
+from app.core.database import Base
+
+
+class PileDailyStats(Base):
+    """充电桩日统计汇总（按充电桩、日期、峰平谷时段），充电详单写入时增量维护"""
+    __tablename__ = "pile_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("stat_date", "charging_pile_id", "time_period", name="uq_pile_daily_stats"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    stat_date = Column(Date, nullable=False)  # 统计日期（按充电结束时间）
+    charging_pile_id = Column(Integer, ForeignKey("charging_piles.id"), nullable=False)
+    time_period = Column(String(20), nullable=False)  # 时段(峰时/平时/谷时)
+
+    charging_count = Column(Integer, default=0, nullable=False)  # 充电次数（计入充电量最多的时段）
+    charging_duration = Column(Float, default=0.0, nullable=False)  # 充电时长(小时)
+    charging_amount = Column(Float, default=0.0, nullable=False)  # 充电量(度)
+    electricity_fee = Column(Float, default=0.0, nullable=False)  # 充电费用
+    service_fee = Column(Float, default=0.0, nullable=False)  # 服务费用
+    total_fee = Column(Float, default=0.0, nullable=False)  # 总费用
@@ -0,0 +1,171 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.models import ChargingRecord
+import numpy as np
+
+MINUTES_PER_DAY = 1440
+EPOCH = datetime(1970, 1, 1)
+ONE_MINUTE = timedelta(minutes=1)
+
+# 时段编号，与 PERIOD_NAMES 一一对应
+PEAK, NORMAL, VALLEY = 0, 1, 2
+PERIOD_NAMES = ("峰时", "平时", "谷时")
+
+# 充电详单上保存的各时段拆分（与时段编号一一对应），日统计直接累加，不随之后的电价时段调整而变化
+PERIOD_AMOUNT_FIELDS = ("peak_amount", "normal_amount", "valley_amount")
+PERIOD_FEE_FIELDS = ("peak_electricity_fee", "normal_electricity_fee", "valley_electricity_fee")
+
+
+class BillingResult(NamedTuple):
+    """批量计费结果（每个字段都是与输入等长的数组）"""
+    electricity_fee: np.ndarray
+    service_fee: np.ndarray
+    total_fee: np.ndarray
+    unit_price: np.ndarray
+    period_amounts: np.ndarray  # (n, 3) 各时段充电量：峰、平、谷
+    period_fees: np.ndarray  # (n, 3) 各时段充电费
+    time_period: List[str]  # 充电量最多的时段名称
+
+    def record_fields(self, i: int) -> Dict[str, Any]:
+        """第 i 个会话写入充电详单的计费字段（含各时段拆分）"""
+        fields = {
+            "electricity_fee": float(self.electricity_fee[i]),
+            "service_fee": float(self.service_fee[i]),
+            "total_fee": float(self.total_fee[i]),
+            "unit_price": float(self.unit_price[i]),
+            "time_period": self.time_period[i],
+        }
+        fields.update(zip(PERIOD_AMOUNT_FIELDS, self.period_amounts[i].tolist()))
+        fields.update(zip(PERIOD_FEE_FIELDS, self.period_fees[i].tolist()))
+        return fields
+
+
+class BillingEngine:
+    """分时计费引擎
+
+    由计费配置预先生成一天1440分钟的时段/电价表及其前缀和，
+    假设充电功率恒定，按充电区间与各时段的重叠时长精确分摊电量，可跨越任意多个时段和自然日。
+    """
+
+    def __init__(self, peak_price: float, normal_price: float, valley_price: float, service_fee_price: float,
+                 peak_ranges: Iterable[Sequence[float]], normal_ranges: Iterable[Sequence[float]]):
+        minute_periods = np.full(MINUTES_PER_DAY, VALLEY, dtype=np.int8)
+        # 峰时优先于平时，其余时间为谷时
+        for start_hour, end_hour in normal_ranges:
+            minute_periods[self._range_mask(start_hour, end_hour)] = NORMAL
+        for start_hour, end_hour in peak_ranges:
+            minute_periods[self._range_mask(start_hour, end_hour)] = PEAK
+
+        self.period_prices = np.array([peak_price, normal_price, valley_price], dtype=np.float64)
+        self.service_fee_price = float(service_fee_price)
+        self.minute_periods = minute_periods
+        self.minute_prices = self.period_prices[minute_periods]
+
+        # 每分钟所属时段的独热编码，以及从零点起各时段累计分钟数
+        self._minute_onehot = np.eye(3)[minute_periods]
+        self._cumulative = np.vstack([np.zeros(3), np.cumsum(self._minute_onehot, axis=0)])
+
+    @classmethod
+    def from_settings(cls, settings) -> "BillingEngine":
+        """从YAML配置创建"""
+        return cls(
+            settings.PEAK_TIME_PRICE, settings.NORMAL_TIME_PRICE, settings.VALLEY_TIME_PRICE,
+            settings.SERVICE_FEE_PRICE, settings.PEAK_TIME_RANGES, settings.NORMAL_TIME_RANGES
+        )
+
+    @staticmethod
+    def _range_mask(start_hour: float, end_hour: float) -> np.ndarray:
+        """时段 [start_hour, end_hour) 覆盖的分钟，支持跨零点（如 [23, 7]）"""
+        minutes = np.arange(MINUTES_PER_DAY)
+        start, end = int(round(start_hour * 60)), int(round(end_hour * 60))
+        if start <= end:
+            return (minutes >= start) & (minutes < end)
+        return (minutes >= start) | (minutes < end)
+
+    @staticmethod
+    def _to_minutes(times: Sequence[datetime]) -> np.ndarray:
+        """墙上时间转换为自1970-01-01 00:00起的分钟数"""
+        return np.fromiter(((t.replace(tzinfo=None) - EPOCH) / ONE_MINUTE for t in times),
+                           dtype=np.float64, count=len(times))
+
+    def _occupancy(self, minutes: np.ndarray) -> np.ndarray:
+        """从时间原点到给定时刻，各时段累计的分钟数，形状 (n, 3)"""
+        days = np.floor(minutes / MINUTES_PER_DAY)
+        minute_of_day = minutes - days * MINUTES_PER_DAY
+        index = np.minimum(minute_of_day.astype(np.int64), MINUTES_PER_DAY - 1)
+        fraction = (minute_of_day - index)[:, None]
+        return (days[:, None] * self._cumulative[MINUTES_PER_DAY]
+                + self._cumulative[index] + fraction * self._minute_onehot[index])
+
+    def period_shares(self, start_times: Sequence[datetime], end_times: Sequence[datetime]) -> np.ndarray:
+        """各会话在峰/平/谷时段的时长占比，形状 (n, 3)，每行之和为1"""
+        start_minutes = self._to_minutes(start_times)
+        end_minutes = self._to_minutes(end_times)
+
+        durations = end_minutes - start_minutes
+        overlap = self._occupancy(end_minutes) - self._occupancy(start_minutes)
+
+        # 零时长会话整体归入开始时刻的时段
+        start_index = (start_minutes % MINUTES_PER_DAY).astype(np.int64)
+        instant = durations <= 0
+        safe_durations = np.where(instant, 1.0, durations)
+        return np.where(instant[:, None], self._minute_onehot[start_index], overlap / safe_durations[:, None])
+
+    def calculate_batch(self, amounts: Sequence[float], start_times: Sequence[datetime],
+                        end_times: Sequence[datetime]) -> BillingResult:
+        """批量计费：一次NumPy运算完成所有会话的分时电量分摊"""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        shares = self.period_shares(start_times, end_times)
+
+        period_amounts = amounts[:, None] * shares
+        period_fees = period_amounts * self.period_prices
+        electricity_fee = period_fees.sum(axis=1)
+        service_fee = amounts * self.service_fee_price
+        total_fee = electricity_fee + service_fee
+
+        # 零电量会话的平均电价取其所在时段电价
+        period_prices = shares @ self.period_prices
+        unit_price = np.divide(electricity_fee, amounts, out=period_prices, where=amounts > 0)
+        dominant = np.argmax(shares, axis=1)
+        time_period = [PERIOD_NAMES[p] for p in dominant]
+
+        return BillingResult(electricity_fee, service_fee, total_fee, unit_price, period_amounts, period_fees, time_period)
+
+    def calculate_fees(self, amount: float, start_time: datetime, end_time: datetime) -> Tuple[float, float, float, float, str]:
+        """单次会话计费，返回 (充电费, 服务费, 总费用, 平均电价, 主要时段)"""
+        result = self.calculate_batch([amount], [start_time], [end_time])
+        return (
+            float(result.electricity_fee[0]),
+            float(result.service_fee[0]),
+            float(result.total_fee[0]),
+            float(result.unit_price[0]),
+            result.time_period[0],
+        )
+
+
+def reprice_charging_records(db: Session, engine: BillingEngine, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> int:
+    """按当前电价重新计算充电详单费用和各时段拆分（用于电价调整后的重新计费）"""
+    query = db.query(
+        ChargingRecord.id, ChargingRecord.charging_amount, ChargingRecord.start_time, ChargingRecord.end_time
+    )
+    if start_date:
+        query = query.filter(ChargingRecord.start_time >= start_date)
+    if end_date:
+        query = query.filter(ChargingRecord.start_time < end_date)
+
+    rows = query.all()
+    if not rows:
+        return 0
+
+    ids, amounts, start_times, end_times = zip(*rows)
+    result = engine.calculate_batch(amounts, start_times, end_times)
+
+    db.bulk_update_mappings(ChargingRecord, [
+        {"id": record_id, **result.record_fields(i)}
+        for i, record_id in enumerate(ids)
+    ])
+    db.commit()
+
+    return len(ids)
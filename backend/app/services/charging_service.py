@@ -1,31 +1,52 @@
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime, timedelta
+from sqlalchemy import Integer, cast, func
 from sqlalchemy.orm import Session
 from app.models import ChargingPile, ChargingQueue, ChargingRecord, ChargingMode, QueueStatus, ChargingPileStatus
-from app.core.config import settings
+from app.services.station_state import PileState, StationState, load_pile_state
+from app.services import event_bus
+from app.services.event_bus import StationEventBus, station_event_bus
+from app.services.completion_timer import ChargeCompletionTimer, charge_completion_timer
+from app.services.config_service import config_service
+from app.services.runtime_params import RuntimeParams
+from app.services.statistics_service import record_pile_stats
+from app.services.sequence_service import next_sequence_value
 import asyncio
 
 class ChargingScheduleService:
     """充电调度服务"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, params: Optional[RuntimeParams] = None,
+                 clock: Callable[[], datetime] = datetime.now,
+                 completion_timer: Optional[ChargeCompletionTimer] = None,
+                 bus: Optional[StationEventBus] = None):
         self.db = db
+        self._params = params
+        # 当前时间来源，仿真时替换为虚拟时钟
+        self.clock = clock
+        # 充电完成定时器和事件总线默认使用全局实例，仿真时使用独立的实例
+        self.completion_timer = charge_completion_timer if completion_timer is None else completion_timer
+        self.bus = station_event_bus if bus is None else bus
+    
+    @property
+    def params(self) -> RuntimeParams:
+        """运行参数快照，首次使用时从配置服务获取，服务实例存续期间不变"""
+        if self._params is None:
+            self._params = config_service.get_runtime_params(self.db)
+        return self._params
     
     def generate_queue_number(self, charging_mode: ChargingMode) -> str:
-        """生成排队号码"""
+        """生成排队号码（按模式独立编号，随提交请求的事务一起提交）"""
         prefix = "F" if charging_mode == ChargingMode.FAST else "T"
         
-        # 获取当前该模式的最大号码
-        last_queue = self.db.query(ChargingQueue).filter(
-            ChargingQueue.queue_number.like(f"{prefix}%")
-        ).order_by(ChargingQueue.queue_number.desc()).first()
-        
-        if last_queue:
-            last_number = int(last_queue.queue_number[1:])  # 去掉前缀字母
-            new_number = last_number + 1
-        else:
-            new_number = 1
+        def current_max() -> int:
+            # 序列首次使用时，从已有排队号码中按数值取最大号（F10 > F9）
+            last_number = self.db.query(
+                func.max(cast(func.substr(ChargingQueue.queue_number, 2), Integer))
+            ).filter(ChargingQueue.queue_number.like(f"{prefix}%")).scalar()
+            return last_number or 0
         
+        new_number = next_sequence_value(self.db, f"queue_number:{prefix}", current_max)
         return f"{prefix}{new_number}"
     
     def submit_charging_request(self, user_id: int, vehicle_id: int, 
@@ -52,7 +73,7 @@ class ChargingScheduleService:
             ChargingQueue.status == QueueStatus.WAITING
         ).count()
         
-        if waiting_count >= settings.WAITING_AREA_SIZE:
+        if waiting_count >= self.params.waiting_area_size:
             raise Exception("等候区已满，请稍后再试")
         
         # 生成排队号码
@@ -65,113 +86,94 @@ class ChargingScheduleService:
             vehicle_id=vehicle_id,
             charging_mode=charging_mode,
             requested_amount=requested_amount,
-            status=QueueStatus.WAITING
+            status=QueueStatus.WAITING,
+            queue_time=self.clock()
         )
         
         self.db.add(queue_record)
         self.db.commit()
         
-        # 触发调度
-        self.schedule_charging()
+        # 触发调度（新请求只影响同一充电模式），事件只用于通知，调度器不再重复调度
+        self.schedule_charging([charging_mode])
+        
+        self.bus.publish(event_bus.REQUEST_SUBMITTED, charging_mode, queue_id=queue_record.id,
+                         scheduled=True)
         
         return queue_number
     
-    def schedule_charging(self):
-        """三阶段FCFS调度算法：等候区→排队区→充电位"""
+    def schedule_charging(self, modes: Optional[List[ChargingMode]] = None):
+        """三阶段FCFS调度算法：等候区→排队区→充电位
+
+        一次调度只加载一次充电站状态，两个阶段都在内存中完成，最后在一个事务中提交。
+        """
         print("🔄 开始三阶段充电调度...")
         
-        # 阶段1: 等候区 → 排队区调度（快慢充分开）
-        self._schedule_waiting_to_queuing(ChargingMode.FAST)
-        self._schedule_waiting_to_queuing(ChargingMode.TRICKLE)
+        modes = modes or [ChargingMode.FAST, ChargingMode.TRICKLE]
+        state = StationState.load(self.db, modes)
+        self.dispatch(state, modes, self.clock())
+        state.recheck_chosen_piles(self.db)
         
-        # 阶段2: 排队区 → 充电位调度（快慢充分开）
-        self._schedule_queuing_to_charging(ChargingMode.FAST)
-        self._schedule_queuing_to_charging(ChargingMode.TRICKLE)
+        if state.changed:
+            self.db.commit()
+        self._schedule_completions(state)
         
         print("✅ 三阶段调度完成")
+        return state
     
-    def _schedule_waiting_to_queuing(self, charging_mode: ChargingMode):
+    def _schedule_completions(self, state: StationState):
+        """为新开始充电的会话登记自动完成时间（在提交之后调用）"""
+        for queue_id, due in state.started:
+            self.completion_timer.schedule(queue_id, due)
+    
+    def dispatch(self, state: StationState, modes: List[ChargingMode], now: datetime):
+        """在内存状态上运行两个调度阶段（不访问数据库，仿真直接在常驻内存的状态上调用）"""
+        # 阶段1: 等候区 → 排队区调度（快慢充分开）
+        for mode in modes:
+            self._schedule_waiting_to_queuing(state, mode, now)
+        
+        # 阶段2: 排队区 → 充电位调度（快慢充分开）
+        for mode in modes:
+            self._schedule_queuing_to_charging(state, mode, now)
+    
+    def _schedule_waiting_to_queuing(self, state: StationState, charging_mode: ChargingMode, now: datetime):
         """阶段1: 将等候区车辆调度到排队区"""
         print(f"📋 调度{charging_mode.value}充电等候区车辆...")
         
-        # 获取该模式的所有充电桩
-        all_piles = self.db.query(ChargingPile).filter(
-            ChargingPile.charging_mode == charging_mode,
-            ChargingPile.is_active == True
-        ).all()
-        
-        # 获取该模式等候区的车辆（按FCFS排序）
-        waiting_vehicles = self.db.query(ChargingQueue).filter(
-            ChargingQueue.charging_mode == charging_mode,
-            ChargingQueue.status == QueueStatus.WAITING
-        ).order_by(ChargingQueue.queue_time).all()
+        # 充电桩已按ID排序（保证FCFS公平性）
+        pile_states = state.piles[charging_mode]
+        waiting_vehicles = state.waiting[charging_mode]
+        queue_len = self.params.charging_queue_len
         
         print(f"  等候区车辆数: {len(waiting_vehicles)}")
         
-        # 为每个等候车辆寻找有空闲排队位的充电桩
+        # 本阶段排队位只减不增，第一个有空闲排队位的充电桩下标单调不减
+        pile_index = 0
+        assigned_count = 0
         for vehicle in waiting_vehicles:
-            assigned = False
-            
-            # 按充电桩ID顺序遍历（保证FCFS公平性）
-            for pile in sorted(all_piles, key=lambda p: p.id):
-                # 计算该充电桩当前排队人数（不包括正在充电的）
-                current_queue_count = self.db.query(ChargingQueue).filter(
-                    ChargingQueue.charging_pile_id == pile.id,
-                    ChargingQueue.status == QueueStatus.QUEUING
-                ).count()
-                
-                # 如果充电桩有空闲排队位（最多3个排队位）
-                if current_queue_count < settings.CHARGING_QUEUE_LEN:
-                    self._assign_to_queue(vehicle, pile)
-                    assigned = True
-                    print(f"  ✅ 车辆 {vehicle.queue_number} 分配到充电桩 {pile.pile_number} 排队区")
-                    break
+            while pile_index < len(pile_states) and len(pile_states[pile_index].queuing) >= queue_len:
+                pile_index += 1
             
             # 如果没有可用的排队位，等候车辆继续等待
-            if not assigned:
+            if pile_index == len(pile_states):
                 print(f"  ⏳ 车辆 {vehicle.queue_number} 继续等候（无空闲排队位）")
                 break
+            
+            pile_state = pile_states[pile_index]
+            state.assign_to_queue(vehicle, pile_state, now)
+            assigned_count += 1
+            print(f"  ✅ 车辆 {vehicle.queue_number} 分配到充电桩 {pile_state.pile.pile_number} 排队区")
+        
+        del waiting_vehicles[:assigned_count]
                 
-    def _schedule_queuing_to_charging(self, charging_mode: ChargingMode):
+    def _schedule_queuing_to_charging(self, state: StationState, charging_mode: ChargingMode, now: datetime):
         """阶段2: 将排队区车辆调度到充电位"""
         print(f"⚡ 调度{charging_mode.value}充电排队区车辆...")
         
-        # 获取该模式的所有充电桩
-        all_piles = self.db.query(ChargingPile).filter(
-            ChargingPile.charging_mode == charging_mode,
-            ChargingPile.is_active == True
-        ).all()
-        
-        for pile in all_piles:
-            # 检查充电桩是否有正在充电的车辆
-            charging_vehicle = self.db.query(ChargingQueue).filter(
-                ChargingQueue.charging_pile_id == pile.id,
-                ChargingQueue.status == QueueStatus.CHARGING
-            ).first()
-            
-            if not charging_vehicle:
-                # 充电位空闲，找到第一个排队的车辆开始充电
-                next_vehicle = self.db.query(ChargingQueue).filter(
-                    ChargingQueue.charging_pile_id == pile.id,
-                    ChargingQueue.status == QueueStatus.QUEUING
-                ).order_by(ChargingQueue.queue_time).first()
-                
-                if next_vehicle:
-                    self.start_charging(next_vehicle.id)
-                    print(f"  ⚡ 车辆 {next_vehicle.queue_number} 在充电桩 {pile.pile_number} 开始充电")
-    
-    def _assign_to_queue(self, queue_record: ChargingQueue, pile: ChargingPile):
-        """将车辆分配到充电桩排队区"""
-        queue_record.charging_pile_id = pile.id
-        queue_record.status = QueueStatus.QUEUING
-        
-        # 计算预计完成时间
-        waiting_time = self.calculate_waiting_time(pile)
-        charging_time = queue_record.requested_amount / pile.power
-        
-        queue_record.estimated_completion_time = datetime.now() + timedelta(hours=waiting_time + charging_time)
-        
-        self.db.commit()
+        for pile_state in state.piles[charging_mode]:
+            # 充电位空闲，排队区第一个车辆开始充电
+            if pile_state.charging is None and pile_state.queuing:
+                next_vehicle = state.start_charging(pile_state, now)
+                print(f"  ⚡ 车辆 {next_vehicle.queue_number} 在充电桩 {pile_state.pile.pile_number} 开始充电")
     
     def find_optimal_pile(self, queue_record: ChargingQueue, 
                          available_piles: List[ChargingPile]) -> Optional[ChargingPile]:
@@ -223,9 +225,10 @@ class ChargingScheduleService:
         if queue_record and queue_record.status == QueueStatus.QUEUING:
             # 更新队列状态
             queue_record.status = QueueStatus.CHARGING
-            queue_record.start_charging_time = datetime.now()
+            queue_record.start_charging_time = self.clock()
             
             # 同步更新充电桩状态为正在充电
+            pile = None
             if queue_record.charging_pile_id:
                 pile = self.db.query(ChargingPile).filter(
                     ChargingPile.id == queue_record.charging_pile_id
@@ -235,11 +238,25 @@ class ChargingScheduleService:
                     from app.models import ChargingPileStatus
                     pile.status = ChargingPileStatus.CHARGING
                     print(f"🔋 充电桩 {pile.pile_number} 状态更新为使用中")
+                    
+                    # 充电开始后预计完成时间只取决于请求电量和功率
+                    queue_record.estimated_completion_time = self.completion_timer.completion_time(queue_record, pile)
             
+            due = queue_record.estimated_completion_time
             self.db.commit()
+            
+            if pile:
+                self.completion_timer.schedule(queue_id, due)
     
     def complete_charging(self, queue_id: int) -> ChargingRecord:
-        """完成充电并生成详单"""
+        """完成充电并生成详单，由调度器为释放的排队位调度该充电模式"""
+        charging_record, pile = self._complete_charging(queue_id)
+        self.bus.publish(event_bus.CHARGING_COMPLETED, pile.charging_mode,
+                         pile_id=pile.id, queue_id=queue_id)
+        return charging_record
+    
+    def _complete_charging(self, queue_id: int) -> Tuple[ChargingRecord, ChargingPile]:
+        """结束充电、生成详单并提交，不发布事件（取消和故障处理结束后自行调度）"""
         queue_record = self.db.query(ChargingQueue).filter(
             ChargingQueue.id == queue_id
         ).first()
@@ -247,8 +264,11 @@ class ChargingScheduleService:
         if not queue_record or queue_record.status != QueueStatus.CHARGING:
             raise Exception("无效的充电记录")
         
+        # 提前结束（手动停止、取消、故障）时撤销自动完成定时
+        self.completion_timer.cancel(queue_id)
+        
         # 计算费用
-        end_time = datetime.now()
+        end_time = self.clock()
         start_time = queue_record.start_charging_time
         actual_duration = (end_time - start_time).total_seconds() / 3600  # 转换为小时
         
@@ -260,10 +280,8 @@ class ChargingScheduleService:
         # 计算实际充电量
         actual_amount = min(queue_record.requested_amount, pile.power * actual_duration)
         
-        # 计算费用
-        electricity_fee, service_fee, total_fee, unit_price, time_period = self.calculate_fees(
-            actual_amount, start_time, end_time
-        )
+        # 计算费用（含各时段的电量和费用拆分，随详单保存）
+        billing = self.params.billing.calculate_batch([actual_amount], [start_time], [end_time])
         
         # 创建充电记录
         record_number = self.generate_record_number()
@@ -276,75 +294,50 @@ class ChargingScheduleService:
             charging_duration=actual_duration,
             start_time=start_time,
             end_time=end_time,
-            electricity_fee=electricity_fee,
-            service_fee=service_fee,
-            total_fee=total_fee,
-            unit_price=unit_price,
-            time_period=time_period
+            **billing.record_fields(0)
         )
         
+        # 更新充电桩日统计汇总
+        record_pile_stats(self.db, charging_record)
+        
         # 更新充电桩统计
         pile.total_charging_count += 1
         pile.total_charging_duration += actual_duration
         pile.total_charging_amount += actual_amount
         
-        # 更新队列状态
+        # 更新队列状态，排队区下一辆车接着充电（故障的充电桩保持故障状态，排队车辆由故障处理重新调度）
+        state = StationState([pile.charging_mode])
+        pile_state = load_pile_state(self.db, pile) if pile.status != ChargingPileStatus.FAULT else PileState(pile)
         queue_record.status = QueueStatus.COMPLETED
-        
-        # 检查该充电桩是否有下一个排队的车辆
-        next_vehicle = self.db.query(ChargingQueue).filter(
-            ChargingQueue.charging_pile_id == queue_record.charging_pile_id,
-            ChargingQueue.status == QueueStatus.QUEUING
-        ).order_by(ChargingQueue.queue_time).first()
-        
-        # 如果没有下一个车辆，将充电桩状态恢复为正常
-        if not next_vehicle:
-            from app.models import ChargingPileStatus
-            pile.status = ChargingPileStatus.NORMAL
+        next_vehicle = state.release_pile(pile_state, end_time)
+        if next_vehicle:
+            print(f"  ⚡ 车辆 {next_vehicle.queue_number} 在充电桩 {pile.pile_number} 开始充电")
+        elif pile.status != ChargingPileStatus.FAULT:
             print(f"🔋 充电桩 {pile.pile_number} 状态恢复为正常")
         
         self.db.add(charging_record)
         self.db.commit()
+        self._schedule_completions(state)
         
-        if next_vehicle:
-            # 自动开始下一个车辆的充电
-            self.start_charging(next_vehicle.id)
-        
-        return charging_record
+        return charging_record, pile
     
     def calculate_fees(self, amount: float, start_time: datetime, end_time: datetime) -> Tuple[float, float, float, float, str]:
-        """计算费用"""
-        # 简化计算，使用开始时间的电价
-        hour = start_time.hour
-        
-        # 判断时段
-        if any(start <= hour < end for start, end in settings.PEAK_TIME_RANGES):
-            unit_price = settings.PEAK_TIME_PRICE
-            time_period = "峰时"
-        elif any(start <= hour < end for start, end in settings.NORMAL_TIME_RANGES):
-            unit_price = settings.NORMAL_TIME_PRICE
-            time_period = "平时"
-        else:
-            unit_price = settings.VALLEY_TIME_PRICE
-            time_period = "谷时"
-        
-        electricity_fee = unit_price * amount
-        service_fee = settings.SERVICE_FEE_PRICE * amount
-        total_fee = electricity_fee + service_fee
-        
-        return electricity_fee, service_fee, total_fee, unit_price, time_period
+        """计算费用（按峰/平/谷时段分摊充电量）"""
+        return self.params.billing.calculate_fees(amount, start_time, end_time)
     
     def generate_record_number(self) -> str:
-        """生成详单编号"""
-        now = datetime.now()
+        """生成详单编号（按日独立编号，随详单的事务一起提交）"""
+        now = self.clock()
         timestamp = now.strftime("%Y%m%d%H%M%S")
         
-        # 获取今天的记录数量
-        today_count = self.db.query(ChargingRecord).filter(
-            ChargingRecord.created_at >= now.replace(hour=0, minute=0, second=0, microsecond=0)
-        ).count()
+        def today_count() -> int:
+            # 当日序列首次使用时，接着当天已有的详单编号继续
+            return self.db.query(ChargingRecord).filter(
+                ChargingRecord.created_at >= now.replace(hour=0, minute=0, second=0, microsecond=0)
+            ).count()
         
-        return f"CR{timestamp}{today_count + 1:04d}"
+        sequence = next_sequence_value(self.db, f"record_number:{now:%Y%m%d}", today_count)
+        return f"CR{timestamp}{sequence:04d}"
     
     def modify_charging_request(self, queue_id: int, new_mode: Optional[ChargingMode] = None, 
                                new_amount: Optional[float] = None):
@@ -384,9 +377,11 @@ class ChargingScheduleService:
                 ).first()
                 waiting_time = self.calculate_waiting_time(pile)
                 charging_time = new_amount / pile.power
-                queue_record.estimated_completion_time = datetime.now() + timedelta(hours=waiting_time + charging_time)
+                queue_record.estimated_completion_time = self.clock() + timedelta(hours=waiting_time + charging_time)
                 
             self.db.commit()
+        
+        self.bus.publish(event_bus.REQUEST_MODIFIED, queue_record.charging_mode, queue_id=queue_id)
     
     def cancel_charging(self, queue_id: int):
         """取消充电"""
@@ -399,7 +394,7 @@ class ChargingScheduleService:
         
         if queue_record.status == QueueStatus.CHARGING:
             # 如果正在充电，生成部分充电记录
-            self.complete_charging(queue_id)
+            self._complete_charging(queue_id)
         else:
             # 如果是排队状态，直接取消并检查充电桩状态
             pile = None
@@ -424,11 +419,19 @@ class ChargingScheduleService:
                     print(f"🔋 充电桩 {pile.pile_number} 状态恢复为正常（取消后无车辆）")
                     self.db.commit()
         
-        # 重新调度
-        self.schedule_charging()
+        # 只重新调度被取消请求的充电模式
+        self.schedule_charging([queue_record.charging_mode])
+        
+        self.bus.publish(event_bus.REQUEST_CANCELLED, queue_record.charging_mode, queue_id=queue_id,
+                         scheduled=True)
     
     def handle_pile_fault(self, pile_id: int, recovery_strategy: str = "priority"):
-        """处理充电桩故障"""
+        """处理充电桩故障
+        
+        priority：故障充电桩的排队车辆退回等候区优先重新分配；
+        time_order：故障充电桩有排队车辆时，同模式其他充电桩的排队车辆一并退回，全部按排队先后重新分配。
+        状态修改由 StationState.fail_pile 完成（与仿真的内存引擎相同），提交后只重新调度故障充电桩的充电模式。
+        """
         pile = self.db.query(ChargingPile).filter(
             ChargingPile.id == pile_id
         ).first()
@@ -436,60 +439,18 @@ class ChargingScheduleService:
         if not pile:
             raise Exception("充电桩不存在")
         
-        pile.status = ChargingPileStatus.FAULT
-        
-        # 停止当前充电车辆的计费
-        charging_vehicle = self.db.query(ChargingQueue).filter(
-            ChargingQueue.charging_pile_id == pile_id,
-            ChargingQueue.status == QueueStatus.CHARGING
-        ).first()
+        state = StationState.load(self.db, [pile.charging_mode], lock_rows=False)
+        interrupted = state.fail_pile(load_pile_state(self.db, pile), requeue_others=recovery_strategy != "priority")
         
-        if charging_vehicle:
-            self.complete_charging(charging_vehicle.id)
-        
-        # 处理故障队列中的车辆
-        fault_queue_vehicles = self.db.query(ChargingQueue).filter(
-            ChargingQueue.charging_pile_id == pile_id,
-            ChargingQueue.status == QueueStatus.QUEUING
-        ).all()
-        
-        if recovery_strategy == "priority":
-            self.priority_reschedule(fault_queue_vehicles, pile.charging_mode)
+        if interrupted:
+            # 停止当前充电车辆的计费（一并提交排队车辆的退回）
+            self._complete_charging(interrupted.id)
         else:
-            self.time_order_reschedule(fault_queue_vehicles, pile.charging_mode)
+            self.db.commit()
         
-        self.db.commit()
-    
-    def priority_reschedule(self, fault_vehicles: List[ChargingQueue], charging_mode: ChargingMode):
-        """优先级调度"""
-        # 将故障队列车辆重新分配到其他同类型充电桩
-        for vehicle in fault_vehicles:
-            vehicle.charging_pile_id = None
-            vehicle.status = QueueStatus.WAITING
-        
-        # 重新调度
-        self.schedule_charging()
-    
-    def time_order_reschedule(self, fault_vehicles: List[ChargingQueue], charging_mode: ChargingMode):
-        """时间顺序调度"""
-        # 获取其他同类型充电桩的排队车辆
-        other_queued_vehicles = self.db.query(ChargingQueue).filter(
-            ChargingQueue.charging_mode == charging_mode,
-            ChargingQueue.status == QueueStatus.QUEUING,
-            ChargingQueue.charging_pile_id != fault_vehicles[0].charging_pile_id if fault_vehicles else None
-        ).all()
-        
-        # 合并所有车辆并按排队号码排序
-        all_vehicles = fault_vehicles + other_queued_vehicles
-        all_vehicles.sort(key=lambda x: x.queue_number)
-        
-        # 清空所有车辆的充电桩分配
-        for vehicle in all_vehicles:
-            vehicle.charging_pile_id = None
-            vehicle.status = QueueStatus.WAITING
-        
-        # 重新调度
-        self.schedule_charging()
+        self.schedule_charging([pile.charging_mode])
+        
+        self.bus.publish(event_bus.PILE_FAULT, pile.charging_mode, pile_id=pile_id, scheduled=True)
     
     def restore_pile_status(self):
         """手动恢复充电桩状态（用于调试或紧急修复）"""
@@ -0,0 +1,123 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.models import ChargingPile, ChargingQueue, QueueStatus
+import asyncio
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CompletionHandler = Callable[[int], Awaitable[None]]
+
+
+class ChargeCompletionTimer:
+    """充电完成定时器 - 以预计完成时间为键的最小堆，到点自动结束充电
+
+    充电开始时由业务代码登记（可能在请求线程中），定时循环运行在事件循环中。
+    手动结束或取消的会话通过 cancel 惰性删除。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int]] = []
+        self._deadlines: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    @staticmethod
+    def completion_time(queue: ChargingQueue, pile: ChargingPile) -> datetime:
+        """充电完成时间 = 开始充电时间 + 请求电量 / 充电功率"""
+        return queue.start_charging_time + timedelta(hours=queue.requested_amount / pile.power)
+
+    def schedule(self, queue_id: int, due: datetime):
+        """登记（或更新）一个充电会话的完成时间（线程安全）"""
+        with self._lock:
+            self._deadlines[queue_id] = due
+            heapq.heappush(self._heap, (due, queue_id))
+            is_earliest = self._heap[0] == (due, queue_id)
+
+        if is_earliest:
+            self._notify()
+
+    def cancel(self, queue_id: int):
+        """撤销一个充电会话的定时（线程安全）"""
+        with self._lock:
+            self._deadlines.pop(queue_id, None)
+
+    def rebuild(self, db: Session) -> int:
+        """根据充电中的排队记录重建定时器（系统重启时调用）"""
+        rows = db.query(ChargingQueue, ChargingPile).join(
+            ChargingPile, ChargingQueue.charging_pile_id == ChargingPile.id
+        ).filter(
+            ChargingQueue.status == QueueStatus.CHARGING,
+            ChargingQueue.start_charging_time.isnot(None)
+        ).all()
+
+        entries = [(self.completion_time(queue, pile), queue.id) for queue, pile in rows]
+        with self._lock:
+            self._heap = entries
+            heapq.heapify(self._heap)
+            self._deadlines = {queue_id: due for due, queue_id in entries}
+
+        self._notify()
+        return len(entries)
+
+    def pop_due(self, now: datetime) -> List[int]:
+        """取出所有已到期的会话"""
+        due_ids = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, queue_id = heapq.heappop(self._heap)
+                # 跳过已撤销或已被更新的条目
+                if self._deadlines.get(queue_id) == due:
+                    del self._deadlines[queue_id]
+                    due_ids.append(queue_id)
+        return due_ids
+
+    def next_due(self) -> Optional[datetime]:
+        """下一个到期会话的完成时间，无待完成会话时返回None"""
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def next_delay(self, now: datetime) -> Optional[float]:
+        """距离下一个到期会话的秒数，无待完成会话时返回None"""
+        due = self.next_due()
+        if due is None:
+            return None
+        return max(0.0, (due - now).total_seconds())
+
+    def _notify(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self, on_due: CompletionHandler):
+        """定时循环：在最近的完成时间醒来，或在新的更早会话登记时提前醒来"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        while True:
+            delay = self.next_delay(datetime.now())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            for queue_id in self.pop_due(datetime.now()):
+                try:
+                    await on_due(queue_id)
+                except Exception as e:
+                    logger.error(f"自动结束充电失败 (队列ID: {queue_id}): {e}")
+
+
+# 全局充电完成定时器实例
+charge_completion_timer = ChargeCompletionTimer()
@@ -1,14 +1,25 @@
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
 from app.models.config import SystemConfig
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import session_scope
+from app.services.config_version import current_config_version
+from app.services.runtime_params import RuntimeParams
 import json
 import threading
 import time
 
+# 两次检查配置版本号的最小间隔(秒)，间隔内读取配置只是一次字典查找
+VERSION_CHECK_INTERVAL = 1.0
+
 
 class ConfigService:
-    """配置服务 - 提供配置的动态加载和热重载功能"""
+    """配置服务 - 提供配置的动态加载和热重载功能
+    
+    缓存对应一个配置版本号，配置项的任何修改都会在事务提交后递增版本号（见 config_version）。
+    读取配置时最多每 VERSION_CHECK_INTERVAL 秒读取一次版本号，版本变化才重新加载并解析全部配置，
+    其他进程的修改也通过版本号发现。每次重新加载时同时生成运行参数快照（RuntimeParams）。
+    """
     
     _instance = None
     _lock = threading.Lock()
@@ -23,19 +34,25 @@ class ConfigService:
     def __init__(self):
         if not hasattr(self, '_initialized'):
             self._config_cache = {}
-            self._last_update = None
+            self._runtime_params = RuntimeParams.from_config({}, settings)
+            self._version = None
+            self._checked_at = 0.0
+            self._refresh_lock = threading.Lock()
             self._initialized = True
     
     def get_config(self, key: str, default: Any = None, db: Session = None) -> Any:
-        """获取配置值"""
-        if db is None:
-            db = next(get_db())
-        
+        """获取配置值（未传入会话时，只在需要检查版本号时临时打开一个会话）"""
         # 检查缓存是否需要刷新
         self._refresh_cache_if_needed(db)
         
         return self._config_cache.get(key, default)
     
+    def get_runtime_params(self, db: Session = None) -> RuntimeParams:
+        """获取当前配置版本的运行参数快照（调度和计费使用）"""
+        self._refresh_cache_if_needed(db)
+        
+        return self._runtime_params
+    
     def get_charging_power(self, charging_mode: str, db: Session = None) -> float:
         """获取充电功率配置"""
         if charging_mode == "fast":
@@ -101,20 +118,37 @@ class ConfigService:
         }
     
     def invalidate_cache(self):
-        """清空配置缓存，强制重新加载"""
-        self._config_cache.clear()
-        self._last_update = None
+        """强制下次读取时重新加载（本进程立即生效，其他进程通过版本号发现修改）"""
+        self._version = None
+        self._checked_at = 0.0
     
-    def _refresh_cache_if_needed(self, db: Session):
-        """如果需要则刷新缓存"""
-        current_time = time.time()
+    def _is_fresh(self) -> bool:
+        return self._version is not None and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL
+    
+    def _refresh_cache_if_needed(self, db: Optional[Session]):
+        """距上次检查超过间隔时读取版本号，版本变化才刷新缓存"""
+        if self._is_fresh():
+            return
         
-        # 如果缓存为空或者超过5秒没有更新，则刷新
-        if not self._config_cache or (self._last_update and current_time - self._last_update > 5):
-            self._refresh_cache(db)
+        with self._refresh_lock:
+            if self._is_fresh():
+                return
+            if db is not None:
+                self._check_version(db)
+                return
+            with session_scope() as session:
+                self._check_version(session)
+    
+    def _check_version(self, db: Session):
+        # 先读版本号再加载：加载期间若有新的修改，下次检查会再次刷新
+        version = current_config_version(db)
+        if version != self._version and not self._refresh_cache(db, version):
+            return
+        self._version = version
+        self._checked_at = time.monotonic()
     
-    def _refresh_cache(self, db: Session):
-        """刷新配置缓存"""
+    def _refresh_cache(self, db: Session, version: Optional[int] = None) -> bool:
+        """刷新配置缓存并重新生成运行参数快照，失败时保留原缓存"""
         try:
             configs = db.query(SystemConfig).filter(SystemConfig.is_active == True).all()
             
@@ -137,11 +171,13 @@ class ConfigService:
                 
                 new_cache[config.config_key] = value
             
-            self._config_cache = new_cache
-            self._last_update = time.time()
+            runtime_params = RuntimeParams.from_config(new_cache, settings, version)
+            self._config_cache, self._runtime_params = new_cache, runtime_params
+            return True
             
         except Exception as e:
             print(f"刷新配置缓存失败: {e}")
+            return False
     
     def _parse_boolean(self, value) -> bool:
         """解析布尔值"""
@@ -0,0 +1,20 @@
+from sqlalchemy.orm import Session
+from app.models import SystemConfig
+from app.services.sequence_service import current_counter, ensure_counter, watch_counter
+
+# 配置版本号所在的序列名称
+CONFIG_VERSION = "config_version"
+
+
+def current_config_version(db: Session) -> int:
+    """读取当前配置版本号"""
+    return current_counter(db, CONFIG_VERSION)
+
+
+def ensure_config_version(db: Session):
+    """创建版本号所在的行，并登记递增版本号的模型（每个进程启动时调用）
+
+    配置项有变化时提交后递增版本号，各进程的配置缓存据此重新加载。
+    """
+    ensure_counter(db, CONFIG_VERSION)
+    watch_counter(CONFIG_VERSION, (SystemConfig,))
@@ -0,0 +1,86 @@
+from typing import Awaitable, Callable, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from app.models import ChargingMode
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 事件类型
+REQUEST_SUBMITTED = "request_submitted"
+REQUEST_MODIFIED = "request_modified"
+REQUEST_CANCELLED = "request_cancelled"
+CHARGING_COMPLETED = "charging_completed"
+PILE_FAULT = "pile_fault"
+
+
+@dataclass(frozen=True)
+class StationEvent:
+    """充电站状态变化事件"""
+    event_type: str
+    charging_mode: ChargingMode
+    pile_id: Optional[int] = None
+    queue_id: Optional[int] = None
+    scheduled: bool = False  # 发布方已调度过受影响的充电模式，订阅者只需刷新状态
+    created_at: datetime = field(default_factory=datetime.now)
+
+
+EventHandler = Callable[[StationEvent], Awaitable[None]]
+
+
+class StationEventBus:
+    """充电站事件总线 - 同步业务代码发布事件，事件循环中的异步订阅者处理
+
+    业务服务运行在请求线程池中，发布时通过 call_soon_threadsafe 投递到绑定的事件循环。
+    未绑定事件循环（如脚本直接调用服务）时发布为空操作。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handlers: List[EventHandler] = []
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """绑定事件循环"""
+        self._loop = loop
+
+    def detach(self):
+        """解除事件循环绑定并移除订阅者（订阅者都在该事件循环中运行，测试结束或进程退出时调用）"""
+        self._loop = None
+        self._handlers = []
+
+    def subscribe(self, handler: EventHandler):
+        """订阅所有事件"""
+        self._handlers.append(handler)
+
+    def publish(self, event_type: str, charging_mode: ChargingMode,
+                pile_id: Optional[int] = None, queue_id: Optional[int] = None, scheduled: bool = False):
+        """发布事件（线程安全）"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        event = StationEvent(event_type, charging_mode, pile_id, queue_id, scheduled)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            self._dispatch(event)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: StationEvent):
+        for handler in self._handlers:
+            task = self._loop.create_task(handler(event))
+            task.add_done_callback(self._log_handler_error)
+
+    @staticmethod
+    def _log_handler_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"处理充电站事件出错: {task.exception()}")
+
+
+# 全局事件总线实例
+station_event_bus = StationEventBus()
@@ -0,0 +1,64 @@
+from typing import Optional
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import SchedulerLease
+import os
+import socket
+import uuid
+
+
+def default_holder_id() -> str:
+    """当前进程的租约持有者标识"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """数据库租约（领导者选举）
+
+    租约是一行记录，持有者定期续约（心跳）。续约和抢占都是带条件的单条 UPDATE：
+    只有当前持有者或租约已过期时才能更新成功，因此同一时刻最多一个进程持有租约。
+    持有者崩溃后，其他进程在租约过期后接管。
+    """
+
+    def __init__(self, name: str, ttl: float, holder: Optional[str] = None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl)
+        self.holder = holder or default_holder_id()
+
+    def acquire(self, db: Session, now: Optional[datetime] = None) -> bool:
+        """获取或续约租约，成功返回 True（自行提交）"""
+        now = now or datetime.now()
+        try:
+            renewed = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+                )
+                .values(holder=self.holder, expires_at=now + self.ttl, heartbeat_at=now)
+            ).rowcount
+            if not renewed:
+                if db.get(SchedulerLease, self.name) is not None:
+                    db.rollback()
+                    return False
+                # 租约行不存在，首次创建
+                db.add(SchedulerLease(name=self.name, holder=self.holder,
+                                      expires_at=now + self.ttl, heartbeat_at=now))
+            db.commit()
+            return True
+        except IntegrityError:
+            # 其他进程同时创建了租约行
+            db.rollback()
+            return False
+
+    def release(self, db: Session, now: Optional[datetime] = None):
+        """主动释放租约（进程退出时），其他进程无需等待过期即可接管"""
+        now = now or datetime.now()
+        db.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+            .values(expires_at=now)
+        )
+        db.commit()
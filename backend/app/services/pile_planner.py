@@ -0,0 +1,141 @@
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Set, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models import ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.services.sequence_service import bump_counter
+from app.services.station_version import STATION_VERSION
+
+# 充电桩编号前缀和名称
+PILE_PREFIXES = {ChargingMode.FAST: "F", ChargingMode.TRICKLE: "T"}
+PILE_LABELS = {ChargingMode.FAST: "快充桩", ChargingMode.TRICKLE: "慢充桩"}
+
+
+class PileTarget(NamedTuple):
+    """某种充电模式的目标配置"""
+    count: int
+    power: float
+
+
+class PilePlan(NamedTuple):
+    """把现有充电桩调整到目标配置所需的全部修改
+
+    启用中的充电桩数量是调整对象：多出的标记为 RETIRED 停用（保留充电详单和统计的关联），
+    不足时先重新启用按配置停用的同类充电桩，仍不足再新建。管理员手动关闭的（OFFLINE）充电桩不会被重新启用。
+    """
+    create: List[Tuple[str, ChargingMode, float]]  # (编号, 模式, 功率)
+    reactivate: List[ChargingPile]
+    retire: List[ChargingPile]
+    blocked: List[ChargingPile]  # 应停用但有车辆正在充电
+    repower: List[Tuple[ChargingPile, float]]
+    requeue: List[ChargingQueue]  # 停用充电桩排队区中退回等候区的车辆
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.create or self.reactivate or self.retire or self.repower)
+
+    def actions(self) -> List[str]:
+        """修改说明（需在执行方案之前生成）"""
+        actions = []
+        for pile_number, mode, power in self.create:
+            actions.append(f"添加{PILE_LABELS[mode]} {pile_number} (功率: {power}kW)")
+        for pile in self.reactivate:
+            actions.append(f"重新启用{PILE_LABELS[pile.charging_mode]} {pile.pile_number}")
+        for pile in self.retire:
+            actions.append(f"停用{PILE_LABELS[pile.charging_mode]} {pile.pile_number}")
+        for pile in self.blocked:
+            actions.append(f"无法停用{PILE_LABELS[pile.charging_mode]} {pile.pile_number}：有车辆正在充电")
+        for pile, power in self.repower:
+            actions.append(f"更新{PILE_LABELS[pile.charging_mode]} {pile.pile_number} 功率：{pile.power} -> {power}kW")
+        if self.requeue:
+            actions.append(f"{len(self.requeue)} 辆排队车辆退回等候区")
+        return actions
+
+
+def _free_numbers(prefix: str, used: Set[str], count: int) -> List[str]:
+    """从1开始取未被占用的编号"""
+    numbers = []
+    n = 0
+    while len(numbers) < count:
+        n += 1
+        pile_number = f"{prefix}{n:02d}"
+        if pile_number not in used:
+            numbers.append(pile_number)
+    return numbers
+
+
+def plan_piles(piles: Iterable[ChargingPile], active_queues: Sequence[ChargingQueue],
+               targets: Dict[ChargingMode, PileTarget]) -> PilePlan:
+    """计算调整方案（不修改任何对象）
+
+    active_queues 为已分配充电桩的排队中/充电中记录。停用时优先选择没有车辆充电的、编号靠后的充电桩。
+    """
+    piles = sorted(piles, key=lambda p: p.id)
+    used_numbers = {pile.pile_number for pile in piles}
+    charging_piles = {q.charging_pile_id for q in active_queues if q.status == QueueStatus.CHARGING}
+    queued_by_pile: Dict[int, List[ChargingQueue]] = {}
+    for queue in active_queues:
+        if queue.status == QueueStatus.QUEUING:
+            queued_by_pile.setdefault(queue.charging_pile_id, []).append(queue)
+
+    plan = PilePlan([], [], [], [], [], [])
+    for mode, target in targets.items():
+        mode_piles = [pile for pile in piles if pile.charging_mode == mode]
+        active = [pile for pile in mode_piles if pile.is_active]
+
+        if len(active) > target.count:
+            excess = len(active) - target.count
+            newest_first = active[::-1]
+            idle = [pile for pile in newest_first if pile.id not in charging_piles]
+            busy = [pile for pile in newest_first if pile.id in charging_piles]
+            retired = idle[:excess]
+            plan.retire.extend(retired)
+            plan.blocked.extend(busy[:excess - len(retired)])
+            for pile in retired:
+                plan.requeue.extend(queued_by_pile.get(pile.id, []))
+        elif len(active) < target.count:
+            missing = target.count - len(active)
+            retired = [pile for pile in mode_piles
+                       if not pile.is_active and pile.status == ChargingPileStatus.RETIRED][:missing]
+            plan.reactivate.extend(retired)
+            numbers = _free_numbers(PILE_PREFIXES[mode], used_numbers, missing - len(retired))
+            plan.create.extend((pile_number, mode, target.power) for pile_number in numbers)
+
+        plan.repower.extend((pile, target.power) for pile in mode_piles if pile.power != target.power)
+
+    return plan
+
+
+def apply_pile_plan(db: Session, plan: PilePlan):
+    """在当前事务中执行调整方案（由调用方提交，一次提交完成全部修改）"""
+    for pile, power in plan.repower:
+        pile.power = power
+    for pile in plan.retire:
+        pile.is_active = False
+        pile.status = ChargingPileStatus.RETIRED
+    for pile in plan.reactivate:
+        pile.is_active = True
+        pile.status = ChargingPileStatus.NORMAL
+    for queue in plan.requeue:
+        # 保留排队时间，重新调度时按原顺序先来先服务
+        queue.charging_pile_id = None
+        queue.status = QueueStatus.WAITING
+        queue.estimated_completion_time = None
+
+    if plan.create:
+        # 批量插入为一条语句，不经过 flush，因此显式递增充电站状态版本号
+        db.execute(insert(ChargingPile), [
+            {"pile_number": pile_number, "charging_mode": mode, "power": power,
+             "status": ChargingPileStatus.NORMAL, "is_active": True}
+            for pile_number, mode, power in plan.create
+        ])
+        bump_counter(db, STATION_VERSION)
+
+
+def load_pile_plan(db: Session, targets: Dict[ChargingMode, PileTarget]) -> Tuple[List[ChargingPile], PilePlan]:
+    """加载充电桩和其上的活跃队列（共两次查询）并计算调整方案"""
+    piles = db.query(ChargingPile).all()
+    active_queues = db.query(ChargingQueue).filter(
+        ChargingQueue.charging_pile_id.isnot(None),
+        ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
+    ).all()
+    return piles, plan_piles(piles, active_queues, targets)
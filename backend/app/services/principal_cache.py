@@ -0,0 +1,93 @@
+from typing import Dict, NamedTuple, Optional, Set
+from collections import OrderedDict
+from app.core.config import settings
+import threading
+import time
+
+# 缓存的令牌数上限，超出时淘汰最早写入的
+MAX_ENTRIES = 10000
+
+
+class Principal(NamedTuple):
+    """已认证用户的只读信息，鉴权依赖返回它而不是 User 对象，命中缓存时无需查询用户表"""
+    id: int
+    username: str
+    email: str
+    phone: Optional[str]
+    is_admin: bool
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.username, user.email, user.phone, bool(user.is_admin), user.is_active is not False)
+
+
+class PrincipalCache:
+    """访问令牌 → 用户信息的短时缓存
+
+    条目在 TTL 和令牌本身的过期时间中较早者失效。用户状态修改时按用户ID主动失效。
+
+    缓存和主动失效都只在当前进程内：多进程（多 worker）部署时，停用用户或修改管理员权限
+    只会清除处理该请求的进程中的缓存，其他进程仍使用旧信息，直到条目按 TTL
+    （SECURITY_AUTH_CACHE_TTL）过期，因此 TTL 应保持较短。
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (principal, 过期时刻)
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, deadline = entry
+            if time.monotonic() >= deadline:
+                self._remove(token)
+                return None
+            return principal
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float] = None):
+        """登记令牌，token_expires_at 为令牌的过期时间戳（JWT exp）"""
+        lifetime = self.ttl
+        if token_expires_at is not None:
+            lifetime = min(lifetime, token_expires_at - time.time())
+        if lifetime <= 0:
+            return
+
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (principal, time.monotonic() + lifetime)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > MAX_ENTRIES:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """用户信息或状态修改后，丢弃该用户所有令牌的缓存（仅当前进程，其他进程等待 TTL 过期）"""
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, set()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+
+# 全局令牌缓存实例
+principal_cache = PrincipalCache(settings.SECURITY_AUTH_CACHE_TTL)
@@ -0,0 +1,115 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+from bisect import bisect_left
+from sqlalchemy.orm import Session
+from app.models import ChargingQueue, QueueStatus
+from app.services.station_version import current_station_version
+import threading
+import time
+
+# 分组：("pile", 充电桩ID) 为充电桩队列，("waiting", 充电模式) 为等候区
+GroupKey = Tuple[str, object]
+SortKey = Tuple[datetime, int]
+
+ACTIVE_STATUSES = (QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING)
+
+# 请求路径两次检查状态版本号的最小间隔(秒)，间隔内查询位置不访问数据库
+VERSION_CHECK_INTERVAL = 1.0
+
+
+class QueuePositionIndex:
+    """排队位置索引
+
+    每个充电桩队列和每种模式的等候区各维护一个按 (排队时间, ID) 有序的列表，
+    查询位置为一次二分查找。索引对应某个充电站状态版本号，版本变化时整体重建，
+    重建由调度器在每次调度后完成，请求路径通过 refresh_if_stale 最多每 VERSION_CHECK_INTERVAL 秒
+    比较一次版本号（其他进程的修改最多延迟这么久可见）。数据库查询和排序都在锁外进行，
+    锁只保护版本比较和替换，请求线程不会排队等待别人的重建。
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+        self._groups: Dict[GroupKey, List[SortKey]] = {}
+        self._entries: Dict[int, Tuple[GroupKey, SortKey]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def group_of(queue) -> GroupKey:
+        """已分配充电桩的按桩排队，否则按模式在等候区排队"""
+        if queue.charging_pile_id:
+            return ("pile", queue.charging_pile_id)
+        return ("waiting", queue.charging_mode)
+
+    def rebuild(self, queues: Iterable, version: Optional[int] = None):
+        """根据活跃队列重建索引（queues 只需 id、charging_pile_id、charging_mode、queue_time）"""
+        groups: Dict[GroupKey, List[SortKey]] = {}
+        entries: Dict[int, Tuple[GroupKey, SortKey]] = {}
+        for queue in queues:
+            group = self.group_of(queue)
+            key = (queue.queue_time or datetime.min, queue.id)
+            groups.setdefault(group, []).append(key)
+            entries[queue.id] = (group, key)
+        for keys in groups.values():
+            keys.sort()
+
+        with self._lock:
+            # 并发重建时较旧版本的结果不覆盖较新的索引
+            if version is not None and self.version is not None and version < self.version:
+                return
+            # 整体替换，并发读取看到的总是完整的旧索引或新索引
+            self._groups, self._entries, self.version = groups, entries, version
+
+    def refresh_if_stale(self, db: Session):
+        """距上次检查版本号超过间隔时刷新，间隔内直接使用当前索引"""
+        if self.version is not None and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        self.refresh(db)
+
+    def clear(self):
+        """清空索引，下次刷新时重建"""
+        with self._lock:
+            self._groups, self._entries, self.version = {}, {}, None
+        self._checked_at = 0.0
+
+    def position(self, queue_id: int, group: Optional[GroupKey] = None) -> Optional[Tuple[int, int]]:
+        """返回 (排队位置, 该队列总人数)，队列不在索引中（或给定的 group 与索引中的分组不同）时返回 None"""
+        groups, entries = self._groups, self._entries
+        entry = entries.get(queue_id)
+        if entry is None or (group is not None and entry[0] != group):
+            return None
+        group, key = entry
+        keys = groups[group]
+        return bisect_left(keys, key) + 1, len(keys)
+
+    def refresh(self, db: Session, force: bool = False):
+        """充电站状态版本号变化时从数据库重建索引"""
+        version = current_station_version(db)
+        self._checked_at = time.monotonic()
+        if not force and version == self.version:
+            return
+
+        rows = db.query(
+            ChargingQueue.id, ChargingQueue.charging_pile_id, ChargingQueue.charging_mode, ChargingQueue.queue_time
+        ).filter(ChargingQueue.status.in_(ACTIVE_STATUSES)).all()
+        self.rebuild(rows, version)
+
+
+def query_position(db: Session, queue: ChargingQueue) -> Tuple[int, int]:
+    """逐条 COUNT 计算 (排队位置, 该队列总人数)，索引中还没有该队列时使用（规则与索引一致）"""
+    if queue.charging_pile_id:
+        group = db.query(ChargingQueue).filter(
+            ChargingQueue.charging_pile_id == queue.charging_pile_id,
+            ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
+        )
+    else:
+        group = db.query(ChargingQueue).filter(
+            ChargingQueue.charging_mode == queue.charging_mode,
+            ChargingQueue.status == QueueStatus.WAITING
+        )
+    ahead = group.filter(ChargingQueue.queue_time < queue.queue_time).count()
+    return ahead + 1, group.count()
+
+
+# 全局排队位置索引实例
+queue_position_index = QueuePositionIndex()
@@ -0,0 +1,27 @@
+from typing import Iterable, List
+from sqlalchemy.orm import Session, selectinload
+from app.models import ChargingPile, ChargingPileStatus, ChargingQueue, QueueStatus, Vehicle
+
+# 等候区、排队区和充电中的队列
+ACTIVE_STATUSES = (QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING)
+
+
+def active_piles_query(db: Session):
+    """站内的充电桩（按配置缩容停用的 RETIRED 充电桩只保留详单和统计关联，不在任何状态视图中出现）"""
+    return db.query(ChargingPile).filter(
+        ChargingPile.status != ChargingPileStatus.RETIRED
+    ).order_by(ChargingPile.id)
+
+
+def load_active_queues(db: Session, statuses: Iterable[QueueStatus] = ACTIVE_STATUSES) -> List[ChargingQueue]:
+    """按排队时间加载活跃队列，并批量预加载车辆、车主、用户和充电桩
+
+    无论队列多长都只执行固定次数的查询（队列一次，每个关联各一次 IN 查询）。
+    """
+    return db.query(ChargingQueue).options(
+        selectinload(ChargingQueue.vehicle).selectinload(Vehicle.owner),
+        selectinload(ChargingQueue.user),
+        selectinload(ChargingQueue.pile)
+    ).filter(
+        ChargingQueue.status.in_(list(statuses))
+    ).order_by(ChargingQueue.queue_time, ChargingQueue.id).all()
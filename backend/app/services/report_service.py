@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Tuple
+from datetime import date, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import ChargingPile, PileDailyStats
+
+
+def get_pile_report(db: Session, start: date, end: date, time_period: str) -> List[Dict[str, Any]]:
+    """统计 [start, end) 日期内各充电桩的充电次数、时长、电量和费用
+
+    读取充电桩日统计汇总表，代价为 O(天数 × 充电桩数)，与详单数量无关。
+    """
+    rows = db.query(
+        ChargingPile.pile_number,
+        func.sum(PileDailyStats.charging_count),
+        func.sum(PileDailyStats.charging_duration),
+        func.sum(PileDailyStats.charging_amount),
+        func.sum(PileDailyStats.electricity_fee),
+        func.sum(PileDailyStats.service_fee),
+        func.sum(PileDailyStats.total_fee),
+    ).join(
+        ChargingPile, PileDailyStats.charging_pile_id == ChargingPile.id
+    ).filter(
+        PileDailyStats.stat_date >= start,
+        PileDailyStats.stat_date < end
+    ).group_by(
+        PileDailyStats.charging_pile_id, ChargingPile.pile_number
+    ).order_by(ChargingPile.pile_number).all()
+
+    return [
+        {
+            "time_period": time_period,
+            "pile_number": pile_number,
+            "charging_count": count or 0,
+            "charging_duration": duration or 0.0,
+            "charging_amount": amount or 0.0,
+            "electricity_fee": electricity_fee or 0.0,
+            "service_fee": service_fee or 0.0,
+            "total_fee": total_fee or 0.0,
+        }
+        for pile_number, count, duration, amount, electricity_fee, service_fee, total_fee in rows
+    ]
+
+
+def day_range(target: date) -> Tuple[date, date]:
+    """自然日 [当日, 次日)"""
+    return target, target + timedelta(days=1)
+
+
+def week_range(target: date) -> Tuple[date, date]:
+    """target 所在自然周（周一开始）"""
+    start = target - timedelta(days=target.weekday())
+    return start, start + timedelta(days=7)
+
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    """自然月"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
@@ -0,0 +1,65 @@
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+from app.services.billing_service import BillingEngine
+
+
+class RuntimeParams(NamedTuple):
+    """调度和计费使用的运行参数快照
+
+    由配置服务在配置版本变化时生成一次，之后只读；管理员通过 /config 修改的值优先，
+    数据库中没有的配置项取YAML配置。一次调度或一次计费从头到尾使用同一个快照。
+    """
+    version: Optional[int]
+    fast_charging_pile_num: int
+    trickle_charging_pile_num: int
+    fast_charging_power: float
+    trickle_charging_power: float
+    waiting_area_size: int
+    charging_queue_len: int
+    billing: BillingEngine
+
+    @classmethod
+    def from_config(cls, values: Mapping[str, Any], settings, version: Optional[int] = None) -> "RuntimeParams":
+        """由已解析的配置项（config_key → 值）生成快照"""
+        def get(key: str, fallback, cast):
+            value = values.get(key)
+            try:
+                return cast(value) if value is not None else fallback
+            except (TypeError, ValueError):
+                return fallback
+
+        prices = _mapping(values.get("billing.prices"))
+        time_periods = _mapping(values.get("billing.time_periods"))
+
+        billing = BillingEngine(
+            _price(prices, "peak_time_price", settings.PEAK_TIME_PRICE),
+            _price(prices, "normal_time_price", settings.NORMAL_TIME_PRICE),
+            _price(prices, "valley_time_price", settings.VALLEY_TIME_PRICE),
+            _price(prices, "service_fee_price", settings.SERVICE_FEE_PRICE),
+            time_periods.get("peak_times", settings.BILLING_TIME_PERIODS_PEAK_TIMES),
+            time_periods.get("normal_times", settings.BILLING_TIME_PERIODS_NORMAL_TIMES),
+        )
+
+        return cls(
+            version=version,
+            fast_charging_pile_num=get("charging_piles.fast_charging_pile_num", settings.FAST_CHARGING_PILE_NUM, int),
+            trickle_charging_pile_num=get("charging_piles.trickle_charging_pile_num",
+                                          settings.TRICKLE_CHARGING_PILE_NUM, int),
+            fast_charging_power=get("charging_piles.fast_charging_power", settings.FAST_CHARGING_POWER, float),
+            trickle_charging_power=get("charging_piles.trickle_charging_power",
+                                       settings.TRICKLE_CHARGING_POWER, float),
+            waiting_area_size=get("queue_settings.waiting_area_size", settings.WAITING_AREA_SIZE, int),
+            charging_queue_len=get("queue_settings.charging_queue_len", settings.CHARGING_QUEUE_LEN, int),
+            billing=billing,
+        )
+
+
+def _mapping(value) -> Dict[str, Any]:
+    """JSON 类型的配置项解析失败时缓存中是原始字符串，按缺省处理"""
+    return value if isinstance(value, dict) else {}
+
+
+def _price(prices: Mapping[str, Any], key: str, fallback: float) -> float:
+    try:
+        return float(prices[key])
+    except (KeyError, TypeError, ValueError):
+        return fallback
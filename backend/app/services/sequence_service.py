@@ -0,0 +1,117 @@
+import logging
+from typing import Callable, Iterable
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import SequenceCounter
+
+logger = logging.getLogger(__name__)
+
+# 当前事务提交后需要递增的计数器名称（保存在 Session.info 中）
+_PENDING_KEY = "pending_counters"
+
+# 计数器名称 -> 修改后需要递增该计数器的模型
+_WATCHED_MODELS = {}
+
+
+def _increment(db, name: str):
+    return db.execute(
+        update(SequenceCounter)
+        .where(SequenceCounter.name == name)
+        .values(value=SequenceCounter.value + 1)
+        .returning(SequenceCounter.value)
+    ).scalar()
+
+
+def next_sequence_value(db: Session, name: str, initial: Callable[[], int] = lambda: 0) -> int:
+    """取序列的下一个值
+
+    单条 UPDATE ... RETURNING 原子自增，并发取号由数据库行锁串行化；
+    计数器随调用方的事务一起提交或回滚，因此不会产生空号。
+    序列不存在时以 initial() 的返回值（已分配的最大值）初始化。
+    """
+    value = _increment(db, name)
+    if value is None:
+        try:
+            with db.begin_nested():
+                db.add(SequenceCounter(name=name, value=initial()))
+        except IntegrityError:
+            # 其他会话已同时完成初始化
+            pass
+        value = _increment(db, name)
+    return value
+
+
+def current_counter(db: Session, name: str) -> int:
+    """读取计数器的当前值（按主键读取一行）"""
+    return db.execute(
+        select(SequenceCounter.value).where(SequenceCounter.name == name)
+    ).scalar() or 0
+
+
+def ensure_counter(db: Session, name: str):
+    """创建计数器所在的行，每个进程启动时调用，之后递增只需 UPDATE"""
+    if db.get(SequenceCounter, name) is not None:
+        return
+    try:
+        db.add(SequenceCounter(name=name, value=0))
+        db.commit()
+    except IntegrityError:
+        # 其他进程已同时创建
+        db.rollback()
+
+
+def watch_counter(name: str, models: Iterable[type]):
+    """这些模型的对象在 flush 时有增删改，事务提交后递增计数器"""
+    _WATCHED_MODELS[name] = tuple(models)
+
+
+def bump_counter(session: Session, name: str):
+    """在当前事务提交后递增计数器（批量 INSERT/UPDATE 语句不经过 flush，需要调用方显式调用）"""
+    session.info.setdefault(_PENDING_KEY, set()).add(name)
+
+
+def _touches(session: Session, models: tuple) -> bool:
+    for obj in session.new:
+        if isinstance(obj, models):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, models):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, models) and session.is_modified(obj):
+            return True
+    return False
+
+
+@event.listens_for(Session, "before_flush")
+def _mark_watched_counters(session: Session, flush_context, instances):
+    """只在会话中记录需要递增的计数器，不在写事务中更新计数器行"""
+    for name, models in _WATCHED_MODELS.items():
+        if _touches(session, models):
+            bump_counter(session, name)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_pending_counters(session: Session):
+    """事务提交后在独立的短事务中递增计数器
+
+    计数器行只在这个短事务中加锁，不会把提交请求、调度和结束充电等写事务串行化。
+    读取方可能在提交与递增之间读到新数据和旧计数器值，递增后会再次刷新，不会错过修改。
+    """
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            for name in sorted(pending):
+                if _increment(connection, name) is None:
+                    logger.warning(f"计数器 {name} 不存在，应在启动时由 ensure_counter 创建")
+    except Exception as e:
+        # 修改已经提交，递增失败只会推迟缓存刷新，不影响本次请求
+        logger.warning(f"递增计数器 {sorted(pending)} 失败: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_counters(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,487 @@
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from abc import ABC, abstractmethod
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingRecord, ChargingMode, ChargingPileStatus, QueueStatus
+from app.services.charging_service import ChargingScheduleService
+from app.services.completion_timer import ChargeCompletionTimer
+from app.services.event_bus import StationEventBus
+from app.services.runtime_params import RuntimeParams
+from app.services.station_version import ensure_station_version
+from app.services.station_state import PileState, StationState
+import heapq
+import os
+import random
+import time
+import numpy as np
+
+# 仿真事件类型
+ARRIVAL, FAULT, REPAIR = "arrival", "fault", "repair"
+
+# 充电桩编号前缀
+_PILE_PREFIXES = {ChargingMode.FAST: "F", ChargingMode.TRICKLE: "T"}
+
+
+class SimulationConfig(NamedTuple):
+    """仿真参数，充电桩、等候区和计费配置默认取 config.yaml"""
+    days: float
+    fast_piles: int
+    trickle_piles: int
+    fast_power: float
+    trickle_power: float
+    waiting_area_size: int
+    charging_queue_len: int
+    arrival_rate: float = 20.0  # 每小时平均到达车辆数（泊松到达）
+    fast_ratio: float = 0.5  # 选择快充的比例
+    fast_amount: Tuple[float, float] = (30.0, 10.0)  # 快充请求电量（均值, 标准差），截断正态分布
+    trickle_amount: Tuple[float, float] = (15.0, 5.0)  # 慢充请求电量（均值, 标准差）
+    min_amount: float = 1.0
+    max_amount: float = 60.0  # 不超过车辆电池容量
+    fault_rate: float = 0.0  # 每个充电桩每天平均故障次数
+    repair_hours: float = 2.0  # 平均修复时长(小时)，指数分布
+    fault_strategy: str = "priority"  # 故障车辆重新调度策略：priority / time_order
+    seed: int = 42
+    start: datetime = datetime(2024, 1, 1)
+
+    @classmethod
+    def from_settings(cls, settings, days: float = 30.0, **overrides) -> "SimulationConfig":
+        values = dict(
+            days=days,
+            fast_piles=settings.FAST_CHARGING_PILE_NUM,
+            trickle_piles=settings.TRICKLE_CHARGING_PILE_NUM,
+            fast_power=settings.FAST_CHARGING_POWER,
+            trickle_power=settings.TRICKLE_CHARGING_POWER,
+            waiting_area_size=settings.WAITING_AREA_SIZE,
+            charging_queue_len=settings.CHARGING_QUEUE_LEN,
+        )
+        values.update(overrides)
+        return cls(**values)
+
+
+class SimulationReport(NamedTuple):
+    """仿真结果"""
+    days: float
+    arrivals: int
+    rejected: int  # 等候区已满被拒绝的请求
+    completed: int  # 生成详单的充电会话（含故障中断的部分充电）
+    faults: int
+    throughput_per_day: float
+    wait_minutes: Dict[str, float]  # 提交请求到开始充电的等待时间分位数（分钟）
+    utilisation: Dict[str, float]  # 各充电模式充电桩的充电时间占比
+    energy: float  # 总充电量(度)
+    revenue: float  # 总费用(元)
+    events: int
+    wall_seconds: float
+
+
+class _Totals(NamedTuple):
+    """仿真引擎汇总的详单数据"""
+    completed: int
+    energy: float
+    revenue: float
+    hours_by_mode: Dict[ChargingMode, float]
+    waits: List[float]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    values = np.asarray(samples)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p90": float(p90), "p99": float(p99),
+            "max": float(values.max())}
+
+
+class StationSimulator(ABC):
+    """充电站离散事件仿真
+
+    时间由虚拟时钟给出：依次处理最早发生的事件（车辆到达、充电完成、充电桩故障和修复），事件之间不等待。
+    同一时刻先处理充电完成，释放的充电位可立即使用。随机数的抽取顺序与引擎无关，
+    相同参数和种子下各引擎得到相同的事件序列。引擎由子类实现。
+    """
+
+    def __init__(self, config: SimulationConfig, settings):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.now = config.start
+        self.end = config.start + timedelta(days=config.days)
+        self.params = RuntimeParams.from_config({}, settings)._replace(
+            waiting_area_size=config.waiting_area_size,
+            charging_queue_len=config.charging_queue_len,
+        )
+        self.service = ChargingScheduleService(None, self.params, clock=lambda: self.now)
+
+        self._events: List[Tuple[datetime, int, str, Optional[int]]] = []
+        self._sequence = 0
+        self.pile_modes: Dict[int, ChargingMode] = {}
+        self.faulted: Set[int] = set()
+        self.arrivals = self.rejected = self.faults = self.event_count = 0
+
+    # ---- 引擎接口 ----
+
+    @abstractmethod
+    def create_piles(self) -> Dict[int, ChargingMode]:
+        """创建充电桩，返回 {充电桩ID: 充电模式}（ID 按快充、慢充的顺序从1开始）"""
+
+    @abstractmethod
+    def submit(self, mode: ChargingMode, amount: float) -> bool:
+        """提交充电请求，等候区已满时返回False"""
+
+    @abstractmethod
+    def next_completion(self) -> Optional[datetime]:
+        """最早的充电完成时间"""
+
+    @abstractmethod
+    def complete_due(self):
+        """结束所有到期的充电会话并调度相应模式"""
+
+    @abstractmethod
+    def fail_pile(self, pile_id: int):
+        """充电桩故障，按 fault_strategy 重新调度"""
+
+    @abstractmethod
+    def repair_pile(self, pile_id: int):
+        """充电桩修复后重新参与调度"""
+
+    @abstractmethod
+    def totals(self) -> _Totals:
+        """汇总详单数据"""
+
+    # ---- 事件循环 ----
+
+    def _push(self, at: datetime, kind: str, payload: Optional[int] = None):
+        self._sequence += 1
+        heapq.heappush(self._events, (at, self._sequence, kind, payload))
+
+    def _hours(self, rate_per_hour: float) -> timedelta:
+        """泊松过程的下一次间隔"""
+        return timedelta(hours=self.rng.expovariate(rate_per_hour))
+
+    def _pile_specs(self) -> List[Tuple[str, ChargingMode, float]]:
+        config = self.config
+        specs = []
+        for mode, count, power in [
+            (ChargingMode.FAST, config.fast_piles, config.fast_power),
+            (ChargingMode.TRICKLE, config.trickle_piles, config.trickle_power),
+        ]:
+            specs.extend((f"{_PILE_PREFIXES[mode]}{i + 1:02d}", mode, power) for i in range(count))
+        return specs
+
+    def setup(self):
+        """创建充电桩并登记首批事件"""
+        config = self.config
+        self.pile_modes = self.create_piles()
+        if config.arrival_rate > 0:
+            self._push(self.now + self._hours(config.arrival_rate), ARRIVAL)
+        if config.fault_rate > 0 and self.pile_modes:
+            self._push(self.now + self._hours(config.fault_rate * len(self.pile_modes) / 24), FAULT)
+
+    def _amount(self, mode: ChargingMode) -> float:
+        mean, std = self.config.fast_amount if mode == ChargingMode.FAST else self.config.trickle_amount
+        return min(self.config.max_amount, max(self.config.min_amount, self.rng.gauss(mean, std)))
+
+    def _arrive(self):
+        config = self.config
+        self.arrivals += 1
+        mode = ChargingMode.FAST if self.rng.random() < config.fast_ratio else ChargingMode.TRICKLE
+        if not self.submit(mode, self._amount(mode)):
+            self.rejected += 1
+        self._push(self.now + self._hours(config.arrival_rate), ARRIVAL)
+
+    def _fault(self):
+        config = self.config
+        healthy = [pile_id for pile_id in self.pile_modes if pile_id not in self.faulted]
+        if healthy:
+            pile_id = self.rng.choice(healthy)
+            self.faults += 1
+            self.faulted.add(pile_id)
+            self.fail_pile(pile_id)
+            self._push(self.now + self._hours(1 / config.repair_hours), REPAIR, pile_id)
+
+        self._push(self.now + self._hours(config.fault_rate * len(self.pile_modes) / 24), FAULT)
+
+    def _repair(self, pile_id: int):
+        self.faulted.discard(pile_id)
+        self.repair_pile(pile_id)
+
+    def step(self) -> bool:
+        """处理下一个事件，超过仿真时长时返回False"""
+        completion = self.next_completion()
+        event_at = self._events[0][0] if self._events else None
+        if completion is not None and (event_at is None or completion <= event_at):
+            if completion > self.end:
+                return False
+            self.now = completion
+            self.complete_due()
+        else:
+            if event_at is None or event_at > self.end:
+                return False
+            self.now, _, kind, payload = heapq.heappop(self._events)
+            if kind == ARRIVAL:
+                self._arrive()
+            elif kind == FAULT:
+                self._fault()
+            else:
+                self._repair(payload)
+
+        self.event_count += 1
+        return True
+
+    def run(self) -> SimulationReport:
+        """运行到仿真结束时刻并生成报告（调度服务的调试输出被丢弃）"""
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            self.setup()
+            while self.step():
+                pass
+        return self.report(time.perf_counter() - started)
+
+    def report(self, wall_seconds: float = 0.0) -> SimulationReport:
+        config = self.config
+        totals = self.totals()
+
+        horizon = config.days * 24
+        pile_counts = {ChargingMode.FAST: config.fast_piles, ChargingMode.TRICKLE: config.trickle_piles}
+        utilisation = {
+            mode.value: totals.hours_by_mode.get(mode, 0.0) / (pile_counts[mode] * horizon)
+            if pile_counts[mode] and horizon else 0.0
+            for mode in ChargingMode
+        }
+
+        return SimulationReport(
+            days=config.days,
+            arrivals=self.arrivals,
+            rejected=self.rejected,
+            completed=totals.completed,
+            faults=self.faults,
+            throughput_per_day=totals.completed / config.days if config.days else 0.0,
+            wait_minutes=_percentiles(totals.waits),
+            utilisation=utilisation,
+            energy=float(totals.energy),
+            revenue=float(totals.revenue),
+            events=self.event_count,
+            wall_seconds=wall_seconds,
+        )
+
+
+class MemoryStationSimulator(StationSimulator):
+    """内存引擎：充电站状态常驻内存，不经过数据库
+
+    排队记录和充电桩是不加入会话的模型对象，调度直接调用 ChargingScheduleService.dispatch，
+    与数据库调度运行同一套两阶段算法；结束充电和故障处理与 ChargingScheduleService 调用相同的 StationState 方法，
+    计费使用同一个计费引擎。
+    """
+
+    def __init__(self, config: SimulationConfig, settings):
+        super().__init__(config, settings)
+        self.modes = [ChargingMode.FAST, ChargingMode.TRICKLE]
+        self.state = StationState(self.modes)
+        self.pile_states: Dict[int, PileState] = {}
+        self.queues: List[ChargingQueue] = []
+        self._completions: List[Tuple[datetime, int]] = []
+        self._charging: Dict[int, PileState] = {}  # 充电中的队列ID -> 所在充电桩
+        self._queue_numbers = {mode: 0 for mode in self.modes}
+        self.completed = 0
+        self.energy = self.revenue = 0.0
+        self.hours_by_mode = {mode: 0.0 for mode in self.modes}
+
+    def create_piles(self) -> Dict[int, ChargingMode]:
+        for pile_id, (pile_number, mode, power) in enumerate(self._pile_specs(), start=1):
+            pile = ChargingPile(id=pile_id, pile_number=pile_number, charging_mode=mode, power=power,
+                                status=ChargingPileStatus.NORMAL, is_active=True)
+            pile_state = PileState(pile)
+            self.pile_states[pile_id] = pile_state
+            self.state.piles[mode].append(pile_state)
+        return {pile_id: pile_state.pile.charging_mode for pile_id, pile_state in self.pile_states.items()}
+
+    def _dispatch(self, modes: List[ChargingMode]):
+        self.service.dispatch(self.state, modes, self.now)
+        self._track_started()
+
+    def _track_started(self):
+        """登记本次开始充电的会话的完成时间"""
+        for queue_id, due in self.state.started:
+            queue = self.queues[queue_id - 1]
+            self._charging[queue_id] = self.pile_states[queue.charging_pile_id]
+            heapq.heappush(self._completions, (due, queue_id))
+        self.state.started.clear()
+
+    def submit(self, mode: ChargingMode, amount: float) -> bool:
+        waiting_count = sum(len(waiting) for waiting in self.state.waiting.values())
+        if waiting_count >= self.params.waiting_area_size:
+            return False
+
+        self._queue_numbers[mode] += 1
+        queue = ChargingQueue(
+            id=len(self.queues) + 1,
+            queue_number=f"{_PILE_PREFIXES[mode]}{self._queue_numbers[mode]}",
+            charging_mode=mode,
+            requested_amount=amount,
+            status=QueueStatus.WAITING,
+            queue_time=self.now
+        )
+        self.queues.append(queue)
+        self.state.waiting[mode].append(queue)
+        self._dispatch([mode])
+        return True
+
+    def next_completion(self) -> Optional[datetime]:
+        # 跳过故障中断的会话
+        while self._completions and self._completions[0][1] not in self._charging:
+            heapq.heappop(self._completions)
+        return self._completions[0][0] if self._completions else None
+
+    def _finish(self, queue: ChargingQueue, pile_state: PileState):
+        """生成详单（与 complete_charging 相同的电量和费用计算），充电位由 StationState.release_pile 释放"""
+        pile = pile_state.pile
+        start_time = queue.start_charging_time
+        actual_duration = (self.now - start_time).total_seconds() / 3600
+        actual_amount = min(queue.requested_amount, pile.power * actual_duration)
+        total_fee = self.params.billing.calculate_fees(actual_amount, start_time, self.now)[2]
+
+        self.completed += 1
+        self.energy += actual_amount
+        self.revenue += total_fee
+        self.hours_by_mode[pile.charging_mode] += actual_duration
+
+        queue.status = QueueStatus.COMPLETED
+        del self._charging[queue.id]
+
+    def complete_due(self):
+        modes = set()
+        while self._completions and self._completions[0][0] <= self.now:
+            _, queue_id = heapq.heappop(self._completions)
+            pile_state = self._charging.get(queue_id)
+            if pile_state is None:
+                continue
+            self._finish(self.queues[queue_id - 1], pile_state)
+            self.state.release_pile(pile_state, self.now)
+            modes.add(pile_state.pile.charging_mode)
+
+        self._track_started()
+        if modes:
+            self._dispatch(sorted(modes, key=lambda m: m.value))
+
+    def fail_pile(self, pile_id: int):
+        pile_state = self.pile_states[pile_id]
+        interrupted = self.state.fail_pile(pile_state, requeue_others=self.config.fault_strategy != "priority")
+
+        # 停止当前充电车辆的计费
+        if interrupted is not None:
+            self._finish(interrupted, pile_state)
+            self.state.release_pile(pile_state, self.now)
+
+        self._dispatch([pile_state.pile.charging_mode])
+
+    def repair_pile(self, pile_id: int):
+        pile_state = self.pile_states[pile_id]
+        pile = pile_state.pile
+        pile.status = ChargingPileStatus.NORMAL
+        piles = self.state.piles[pile.charging_mode]
+        piles.append(pile_state)
+        piles.sort(key=lambda p: p.pile.id)
+        self._dispatch([pile.charging_mode])
+
+    def totals(self) -> _Totals:
+        waits = [
+            (queue.start_charging_time - queue.queue_time).total_seconds() / 60
+            for queue in self.queues if queue.start_charging_time is not None
+        ]
+        return _Totals(self.completed, self.energy, self.revenue, self.hours_by_mode, waits)
+
+
+class SqliteStationSimulator(StationSimulator):
+    """数据库引擎：在内存 SQLite 上调用完整的 ChargingScheduleService（逐条写详单、统计和版本号）
+
+    用于核对内存引擎，比内存引擎慢两个数量级。使用独立的充电完成定时器和事件总线，不影响全局实例。
+    """
+
+    def __init__(self, config: SimulationConfig, settings):
+        super().__init__(config, settings)
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        # 仿真会话是数据库的唯一写入者，提交后无需让对象过期重新加载
+        self.db = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)()
+        self.timer = ChargeCompletionTimer()
+        self.service = ChargingScheduleService(self.db, self.params, clock=lambda: self.now,
+                                               completion_timer=self.timer, bus=StationEventBus())
+
+    def create_piles(self) -> Dict[int, ChargingMode]:
+        for pile_number, mode, power in self._pile_specs():
+            self.db.add(ChargingPile(pile_number=pile_number, charging_mode=mode, power=power,
+                                     status=ChargingPileStatus.NORMAL, is_active=True))
+        self.user = User(username="simulation", email="simulation@example.com", hashed_password="x")
+        self.db.add(self.user)
+        self.db.commit()
+        ensure_station_version(self.db)
+        return dict(self.db.query(ChargingPile.id, ChargingPile.charging_mode).order_by(ChargingPile.id).all())
+
+    def submit(self, mode: ChargingMode, amount: float) -> bool:
+        # 每次到达是一辆新车，避免同一辆车重复申请
+        vehicle = Vehicle(license_plate=f"SIM-{self.arrivals}", battery_capacity=self.config.max_amount,
+                          owner_id=self.user.id)
+        self.db.add(vehicle)
+        self.db.flush()
+        try:
+            self.service.submit_charging_request(self.user.id, vehicle.id, mode, amount)
+        except Exception:
+            # 等候区已满
+            self.db.rollback()
+            return False
+        return True
+
+    def next_completion(self) -> Optional[datetime]:
+        return self.timer.next_due()
+
+    def complete_due(self):
+        modes = set()
+        for queue_id in self.timer.pop_due(self.now):
+            record = self.service.complete_charging(queue_id)
+            modes.add(self.pile_modes[record.charging_pile_id])
+        if modes:
+            self.service.schedule_charging(sorted(modes, key=lambda m: m.value))
+
+    def fail_pile(self, pile_id: int):
+        self.service.handle_pile_fault(pile_id, self.config.fault_strategy)
+
+    def repair_pile(self, pile_id: int):
+        pile = self.db.get(ChargingPile, pile_id)
+        pile.status = ChargingPileStatus.NORMAL
+        self.db.commit()
+        self.service.schedule_charging([self.pile_modes[pile_id]])
+
+    def totals(self) -> _Totals:
+        completed, energy, revenue = self.db.query(
+            func.count(ChargingRecord.id),
+            func.coalesce(func.sum(ChargingRecord.charging_amount), 0.0),
+            func.coalesce(func.sum(ChargingRecord.total_fee), 0.0),
+        ).one()
+
+        hours_by_mode = dict(self.db.query(
+            ChargingPile.charging_mode, func.sum(ChargingRecord.charging_duration)
+        ).join(ChargingPile, ChargingRecord.charging_pile_id == ChargingPile.id).group_by(ChargingPile.charging_mode).all())
+
+        waits = [
+            (started_at - queued_at).total_seconds() / 60
+            for queued_at, started_at in self.db.query(
+                ChargingQueue.queue_time, ChargingQueue.start_charging_time
+            ).filter(ChargingQueue.start_charging_time.isnot(None))
+        ]
+        return _Totals(completed, energy, revenue, hours_by_mode, waits)
+
+
+# 可选的仿真引擎
+SIMULATION_ENGINES = {
+    "memory": MemoryStationSimulator,
+    "sqlite": SqliteStationSimulator,
+}
+
+
+def create_simulator(config: SimulationConfig, settings, engine: str = "memory") -> StationSimulator:
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"未知的仿真引擎: {engine}，可选: {', '.join(SIMULATION_ENGINES)}")
+    return SIMULATION_ENGINES[engine](config, settings)
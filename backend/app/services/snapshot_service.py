@@ -0,0 +1,126 @@
+from typing import Any, Dict, List
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.models import ChargingPile, ChargingQueue, ChargingPileStatus, QueueStatus
+from app.services.queue_loader import active_piles_query, load_active_queues
+
+
+def queue_summary(queues: List[ChargingQueue]) -> Dict[str, Any]:
+    """活跃队列总体统计"""
+    waiting_count = sum(1 for q in queues if q.status in (QueueStatus.WAITING, QueueStatus.QUEUING))
+    charging_count = sum(1 for q in queues if q.status == QueueStatus.CHARGING)
+    return {
+        "total_queues": waiting_count + charging_count,
+        "waiting_count": waiting_count,
+        "charging_count": charging_count,
+        "avg_wait_time": waiting_count * 15  # 每人平均15分钟
+    }
+
+
+def pile_queue_rows(piles: List[ChargingPile], queues: List[ChargingQueue]) -> List[Dict[str, Any]]:
+    """各充电桩的队列状态（queues 需按排队时间排序）"""
+    by_pile: Dict[int, List[ChargingQueue]] = {}
+    for queue in queues:
+        if queue.charging_pile_id is not None:
+            by_pile.setdefault(queue.charging_pile_id, []).append(queue)
+
+    result = []
+    for pile in piles:
+        pile_queues = by_pile.get(pile.id, [])
+        charging_queue = next((q for q in pile_queues if q.status == QueueStatus.CHARGING), None)
+        current_user = charging_queue.user.username if charging_queue and charging_queue.user else None
+
+        queue_details = []
+        for i, queue in enumerate(pile_queues):
+            vehicle_info = "未知车辆"
+            if queue.vehicle:
+                vehicle_info = f"{queue.vehicle.license_plate} ({queue.vehicle.model or '未知型号'})"
+            queue_details.append({
+                "queue_id": queue.id,
+                "position": i + 1,
+                "username": queue.user.username if queue.user else "未知用户",
+                "vehicle_info": vehicle_info,
+                "request_time": queue.queue_time,
+                "status": queue.status.value
+            })
+
+        # 等待队列长度（排除正在充电的）
+        queue_length = sum(1 for q in pile_queues if q.status in (QueueStatus.WAITING, QueueStatus.QUEUING))
+
+        # 充电桩的实际状态（基于使用情况）
+        pile_status = pile.status.value
+        if charging_queue:
+            pile_status = "charging"
+        elif pile.status == ChargingPileStatus.NORMAL and pile.is_active:
+            pile_status = "idle"
+
+        result.append({
+            "pile_id": pile.id,
+            "pile_name": f"{pile.charging_mode.value}充电桩-{pile.pile_number}",
+            "pile_status": pile_status,
+            "queue_length": queue_length,
+            "current_user": current_user,
+            "estimated_wait_time": queue_length * 30,  # 每人30分钟
+            "queue_details": queue_details
+        })
+    return result
+
+
+def scene_queue_row(queue: ChargingQueue) -> Dict[str, Any]:
+    """场景动画使用的队列信息（含车辆和车主）"""
+    vehicle_info = None
+    if queue.vehicle:
+        owner = queue.vehicle.owner
+        vehicle_info = {
+            "id": queue.vehicle.id,
+            "license_plate": queue.vehicle.license_plate,
+            "battery_capacity": queue.vehicle.battery_capacity or 0.0,
+            "model": queue.vehicle.model or "未知型号",
+            "status": queue.status.value,
+            "owner": {
+                "username": owner.username,
+                "email": owner.email,
+                "phone": owner.phone
+            } if owner else None
+        }
+
+    return {
+        "id": queue.id,
+        "queue_number": queue.queue_number,
+        "status": queue.status.value,
+        "charging_mode": queue.charging_mode.value,
+        "charging_pile_id": queue.charging_pile_id,
+        "pile_id": queue.pile.pile_number if queue.pile else None,
+        "vehicle": vehicle_info,
+        "estimated_completion": queue.estimated_completion_time,
+        "start_charging_time": queue.start_charging_time,
+        "queue_time": queue.queue_time
+    }
+
+
+def build_station_snapshot(db: Session, version: int) -> Dict[str, Any]:
+    """充电站状态快照：充电桩、各桩队列、活跃队列和总体统计，共固定次数的查询"""
+    piles = active_piles_query(db).all()
+    queues = load_active_queues(db)
+
+    return {
+        "version": version,
+        "generated_at": datetime.now(),
+        "piles": [
+            {
+                "id": pile.id,
+                "pile_number": pile.pile_number,
+                "charging_mode": pile.charging_mode.value,
+                "power": pile.power,
+                "status": pile.status.value,
+                "is_active": pile.is_active,
+                "total_charging_count": pile.total_charging_count,
+                "total_charging_duration": pile.total_charging_duration,
+                "total_charging_amount": pile.total_charging_amount
+            }
+            for pile in piles
+        ],
+        "pile_queues": pile_queue_rows(piles, queues),
+        "queues": [scene_queue_row(queue) for queue in queues],
+        "summary": queue_summary(queues)
+    }
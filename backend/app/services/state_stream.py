@@ -0,0 +1,267 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from datetime import datetime
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.event_bus import StationEvent, station_event_bus
+from app.services.queue_loader import active_piles_query, load_active_queues
+from app.services.queue_index import QueuePositionIndex
+from app.services.station_version import current_station_version
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多缓存的消息数，超出后丢弃积压的增量，改为推送一次完整快照
+SUBSCRIBER_BUFFER = 32
+
+# 无状态变化时发送心跳注释的间隔(秒)，防止代理断开空闲连接
+KEEPALIVE_INTERVAL = 15
+
+Rows = Dict[int, Dict[str, Any]]
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _load_rows(db) -> Tuple[Rows, Rows]:
+    """加载充电桩和活跃队列，转换为可直接序列化的字典（含排队位置）"""
+    piles = {
+        pile.id: {
+            "id": pile.id,
+            "pile_number": pile.pile_number,
+            "charging_mode": pile.charging_mode.value,
+            "power": pile.power,
+            "status": pile.status.value,
+            "is_active": pile.is_active,
+        }
+        for pile in active_piles_query(db).all()
+    }
+
+    queues: Rows = {}
+    active_queues = load_active_queues(db)
+    for queue in active_queues:
+        queues[queue.id] = {
+            "id": queue.id,
+            "queue_number": queue.queue_number,
+            "user_id": queue.user_id,
+            "vehicle_id": queue.vehicle_id,
+            "license_plate": queue.vehicle.license_plate if queue.vehicle else None,
+            "charging_mode": queue.charging_mode.value,
+            "status": queue.status.value,
+            "charging_pile_id": queue.charging_pile_id,
+            "pile_number": queue.pile.pile_number if queue.pile else None,
+            "requested_amount": queue.requested_amount,
+            "queue_time": _isoformat(queue.queue_time),
+            "start_charging_time": _isoformat(queue.start_charging_time),
+            "estimated_completion_time": _isoformat(queue.estimated_completion_time),
+        }
+
+    # 排队位置与 /users/queue/status 使用相同的规则
+    positions = QueuePositionIndex()
+    positions.rebuild(active_queues)
+    for queue_id, row in queues.items():
+        row["position"], row["total_in_queue"] = positions.position(queue_id)
+
+    return piles, queues
+
+
+def _diff(old: Rows, new: Rows) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """返回 (新增或变化的行, 移除的ID)"""
+    upserted = [row for row_id, row in new.items() if old.get(row_id) != row]
+    removed = [row_id for row_id in old if row_id not in new]
+    return upserted, removed
+
+
+def _message(event: str, data: Dict[str, Any]) -> str:
+    """编码为一条 SSE 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Subscriber:
+    """一个推送连接，user_id 为 None 表示管理员（接收全部状态）"""
+    __slots__ = ("user_id", "queue")
+
+    def __init__(self, user_id: Optional[int]):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+
+
+class StationStateStream:
+    """充电站状态推送 - 每个进程只维护一份状态，变化时计算差异并分发给各连接
+
+    充电站事件到达时立即检查，另按固定间隔检查状态版本号，覆盖其他进程或未发布事件的修改。
+    每次变化只查询一次数据库，与连接数无关；普通用户只收到自己车辆的队列变化。
+    """
+
+    def __init__(self):
+        self._admins: Set[Subscriber] = set()
+        self._users: Dict[int, Set[Subscriber]] = {}
+        self._version: Optional[int] = None
+        self._piles: Rows = {}
+        self._queues: Rows = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._admins) + sum(len(subscribers) for subscribers in self._users.values())
+
+    def subscribe(self, user_id: Optional[int]) -> Subscriber:
+        """注册连接，user_id 为 None 表示管理员"""
+        subscriber = Subscriber(user_id)
+        if user_id is None:
+            self._admins.add(subscriber)
+        else:
+            self._users.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber.user_id is None:
+            self._admins.discard(subscriber)
+            return
+        subscribers = self._users.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._users[subscriber.user_id]
+
+    def snapshot_message(self, subscriber: Subscriber) -> str:
+        """当前状态中该连接可见部分的完整快照"""
+        if subscriber.user_id is None:
+            piles = list(self._piles.values())
+            queues = list(self._queues.values())
+        else:
+            piles = []
+            queues = [row for row in self._queues.values() if row["user_id"] == subscriber.user_id]
+        return _message("snapshot", {"version": self._version, "piles": piles, "queues": queues})
+
+    def _send(self, subscriber: Subscriber, message: str):
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 连接消费过慢：丢弃积压的增量，改为一次完整快照
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(self.snapshot_message(subscriber))
+
+    def apply(self, version: int, piles: Rows, queues: Rows):
+        """用新状态替换当前状态，并把差异分发给各连接"""
+        pile_upserted, pile_removed = _diff(self._piles, piles)
+        queue_upserted, queue_removed = _diff(self._queues, queues)
+        old_queues = self._queues
+
+        self._version, self._piles, self._queues = version, piles, queues
+        if not (pile_upserted or pile_removed or queue_upserted or queue_removed):
+            return
+
+        if self._admins:
+            message = _message("diff", {
+                "version": version,
+                "piles": {"upserted": pile_upserted, "removed": pile_removed},
+                "queues": {"upserted": queue_upserted, "removed": queue_removed},
+            })
+            for subscriber in self._admins:
+                self._send(subscriber, message)
+
+        # 按用户分组，只为有变化且在线的用户各编码一次
+        user_changes: Dict[int, Tuple[List[Dict[str, Any]], List[int]]] = {}
+        for row in queue_upserted:
+            if row["user_id"] in self._users:
+                user_changes.setdefault(row["user_id"], ([], []))[0].append(row)
+        for queue_id in queue_removed:
+            user_id = old_queues[queue_id]["user_id"]
+            if user_id in self._users:
+                user_changes.setdefault(user_id, ([], []))[1].append(queue_id)
+
+        for user_id, (upserted, removed) in user_changes.items():
+            message = _message("diff", {
+                "version": version,
+                "piles": {"upserted": [], "removed": []},
+                "queues": {"upserted": upserted, "removed": removed},
+            })
+            for subscriber in self._users[user_id]:
+                self._send(subscriber, message)
+
+    @staticmethod
+    def _read_version() -> int:
+        db = SessionLocal()
+        try:
+            return current_station_version(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _read_state() -> Tuple[int, Rows, Rows]:
+        db = SessionLocal()
+        try:
+            version = current_station_version(db)
+            piles, queues = _load_rows(db)
+            return version, piles, queues
+        finally:
+            db.close()
+
+    async def refresh(self):
+        """版本号变化时重新加载状态并分发差异"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if self._version is not None and await asyncio.to_thread(self._read_version) == self._version:
+                return
+            version, piles, queues = await asyncio.to_thread(self._read_state)
+            self.apply(version, piles, queues)
+
+    async def events(self, user_id: Optional[int]) -> AsyncIterator[str]:
+        """一个连接的 SSE 消息流：先发送完整快照，之后只发送差异，空闲时发送心跳
+
+        连接在消息流开始迭代时注册、结束时注销，客户端在收到第一条消息前断开也不会遗留连接。
+        """
+        subscriber = self.subscribe(user_id)
+        try:
+            if self._version is None:
+                await self.refresh()
+            yield self.snapshot_message(subscriber)
+
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def _on_station_event(self, event: StationEvent):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """启动状态推送（需在事件循环中调用）"""
+        logger.info("启动充电站状态推送...")
+
+        self._wakeup = asyncio.Event()
+        station_event_bus.subscribe(self._on_station_event)
+        interval = settings.SYSTEM_STATE_STREAM_POLL_INTERVAL
+
+        async def watch():
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+                # 没有连接时不查询数据库，下一个连接建立时再加载
+                if not self.subscriber_count:
+                    self._version = None
+                    continue
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error(f"充电站状态推送出错: {str(e)}")
+
+        asyncio.create_task(watch())
+
+
+# 全局状态推送实例
+station_state_stream = StationStateStream()
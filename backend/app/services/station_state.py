@@ -0,0 +1,246 @@
+from typing import Dict, FrozenSet, List, Optional, Iterable, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.models import ChargingPile, ChargingQueue, ChargingMode, QueueStatus, ChargingPileStatus
+
+
+def supports_skip_locked(db: Session) -> bool:
+    """数据库是否支持 SELECT ... FOR UPDATE SKIP LOCKED"""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+# 不参与调度的充电桩状态
+UNSCHEDULABLE_STATUSES = [ChargingPileStatus.FAULT, ChargingPileStatus.OFFLINE, ChargingPileStatus.RETIRED]
+
+
+def dispatch_piles_query(db: Session, modes: List[ChargingMode]):
+    """参与调度的充电桩（故障、离线或已停用的不参与）"""
+    return db.query(ChargingPile).filter(
+        ChargingPile.charging_mode.in_(modes),
+        ChargingPile.is_active == True,
+        ChargingPile.status.notin_(UNSCHEDULABLE_STATUSES)
+    ).order_by(ChargingPile.id)
+
+
+def waiting_queues_query(db: Session, modes: List[ChargingMode], lock_rows: bool = False):
+    """等候区车辆（先来先服务），lock_rows 时跳过其他调度已锁定的车辆"""
+    query = db.query(ChargingQueue).filter(
+        ChargingQueue.charging_mode.in_(modes),
+        ChargingQueue.status == QueueStatus.WAITING
+    ).order_by(ChargingQueue.queue_time, ChargingQueue.id)
+    if lock_rows:
+        query = query.with_for_update(skip_locked=True)
+    return query
+
+
+class PileState:
+    """单个充电桩的内存状态：充电位 + 排队区"""
+
+    def __init__(self, pile: ChargingPile):
+        self.pile = pile
+        self.charging: Optional[ChargingQueue] = None
+        self.queuing: List[ChargingQueue] = []  # 按queue_time排序
+        self.loaded: FrozenSet[Tuple[int, QueueStatus]] = frozenset()  # 加载时的(队列ID, 状态)，用于提交前复核
+
+    @property
+    def vehicles(self) -> List[ChargingQueue]:
+        """充电位和排队区的所有车辆"""
+        return self.queuing if self.charging is None else [self.charging] + self.queuing
+
+    @property
+    def occupied_hours(self) -> float:
+        """充电位和排队区所有车辆的充电总时长（小时）"""
+        return sum(v.requested_amount for v in self.vehicles) / self.pile.power
+
+
+def load_pile_state(db: Session, pile: ChargingPile) -> PileState:
+    """加载单个充电桩的充电位和排队区（不论充电桩是否可调度）"""
+    pile_state = PileState(pile)
+    for queue in db.query(ChargingQueue).filter(
+        ChargingQueue.charging_pile_id == pile.id,
+        ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
+    ).order_by(ChargingQueue.queue_time, ChargingQueue.id).all():
+        if queue.status == QueueStatus.CHARGING:
+            pile_state.charging = queue
+        else:
+            pile_state.queuing.append(queue)
+    return pile_state
+
+
+class StationState:
+    """充电站内存状态 - 每次调度只加载一次，两个调度阶段都在其上运行"""
+
+    def __init__(self, modes: Iterable[ChargingMode]):
+        self.modes = list(modes)
+        self.piles: Dict[ChargingMode, List[PileState]] = {mode: [] for mode in self.modes}
+        self.waiting: Dict[ChargingMode, List[ChargingQueue]] = {mode: [] for mode in self.modes}
+        self.started: List[Tuple[int, datetime]] = []  # 本次调度开始充电的(队列ID, 完成时间)
+        self.changed = False
+        self.lock_rows = False
+        self.chosen: Dict[int, PileState] = {}  # 本次调度修改过的充电桩
+
+    @classmethod
+    def load(cls, db: Session, modes: Iterable[ChargingMode] = (ChargingMode.FAST, ChargingMode.TRICKLE),
+             lock_rows: Optional[bool] = None) -> "StationState":
+        """加载指定模式的充电桩和活跃队列
+
+        lock_rows 为 None 时按数据库决定：支持行锁的数据库（PostgreSQL）锁定等候车辆，
+        并发调度时各自跳过对方已锁定的车辆（SKIP LOCKED），同一车辆不会被重复分配。
+        充电桩和其上的队列不加锁读取全部，充电桩的选择与锁的时序无关；
+        提交前由 recheck_chosen_piles 只锁定选中的充电桩并复核。SQLite 写事务本身串行，用两次查询加载。
+        """
+        state = cls(modes)
+        if lock_rows is None:
+            lock_rows = supports_skip_locked(db)
+        state.lock_rows = lock_rows
+
+        piles = dispatch_piles_query(db, state.modes).all()
+
+        pile_states = {}
+        for pile in piles:
+            pile_state = PileState(pile)
+            pile_states[pile.id] = pile_state
+            state.piles[pile.charging_mode].append(pile_state)
+
+        if lock_rows:
+            # 等候车辆跳过其他调度已锁定的行；充电桩上的排队和充电记录不加锁，提交前复核
+            waiting = waiting_queues_query(db, state.modes, lock_rows=True).all()
+            active = []
+            if pile_states:
+                active = db.query(ChargingQueue).filter(
+                    ChargingQueue.charging_pile_id.in_(list(pile_states)),
+                    ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
+                ).order_by(ChargingQueue.queue_time, ChargingQueue.id).all()
+            queues = waiting + active
+        else:
+            queues = db.query(ChargingQueue).filter(
+                ChargingQueue.charging_mode.in_(state.modes),
+                ChargingQueue.status.in_([QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING])
+            ).order_by(ChargingQueue.queue_time, ChargingQueue.id).all()
+
+        for queue in queues:
+            if queue.status == QueueStatus.WAITING:
+                state.waiting[queue.charging_mode].append(queue)
+                continue
+
+            pile_state = pile_states.get(queue.charging_pile_id)
+            if pile_state is None:
+                # 所在充电桩不可调度，保持原样
+                continue
+            if queue.status == QueueStatus.CHARGING:
+                pile_state.charging = queue
+            else:
+                pile_state.queuing.append(queue)
+
+        if lock_rows:
+            for pile_state in pile_states.values():
+                pile_state.loaded = frozenset((queue.id, queue.status) for queue in pile_state.vehicles)
+
+        return state
+
+    def recheck_chosen_piles(self, db: Session):
+        """提交前按ID顺序锁定本次调度修改过的充电桩及其队列，复核与加载时一致
+
+        加载后其他调度、取消或结束充电修改了该充电桩（或充电桩已不可调度）时，撤销本次对它的修改，
+        相关车辆留待下次调度。只在加载时使用了行锁（lock_rows）时需要。
+        """
+        if not self.lock_rows:
+            return
+        with db.no_autoflush:
+            for pile_id in sorted(self.chosen):
+                pile_state = self.chosen[pile_id]
+                schedulable = db.query(ChargingPile.id).filter(
+                    ChargingPile.id == pile_id,
+                    ChargingPile.is_active == True,
+                    ChargingPile.status.notin_(UNSCHEDULABLE_STATUSES)
+                ).with_for_update().first() is not None
+                current = db.query(ChargingQueue.id, ChargingQueue.status).filter(
+                    ChargingQueue.charging_pile_id == pile_id,
+                    ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
+                ).with_for_update().all()
+                if schedulable and frozenset(current) == pile_state.loaded:
+                    continue
+
+                # 丢弃尚未写入的修改，对象下次访问时重新加载
+                reverted = {queue.id for queue in pile_state.vehicles}
+                for queue in pile_state.vehicles:
+                    db.expire(queue)
+                db.expire(pile_state.pile)
+                self.started = [(queue_id, due) for queue_id, due in self.started if queue_id not in reverted]
+
+    def assign_to_queue(self, queue: ChargingQueue, pile_state: PileState, now: datetime):
+        """将等候区车辆移入充电桩排队区（仅修改内存对象，调用方负责移出等候区列表）"""
+        waiting_time = pile_state.occupied_hours
+        charging_time = queue.requested_amount / pile_state.pile.power
+
+        queue.charging_pile_id = pile_state.pile.id
+        queue.status = QueueStatus.QUEUING
+        queue.estimated_completion_time = now + timedelta(hours=waiting_time + charging_time)
+
+        pile_state.queuing.append(queue)
+        self.chosen[pile_state.pile.id] = pile_state
+        self.changed = True
+
+    def start_charging(self, pile_state: PileState, now: datetime) -> ChargingQueue:
+        """排队区第一辆车进入充电位（仅修改内存对象）"""
+        queue = pile_state.queuing.pop(0)
+        queue.status = QueueStatus.CHARGING
+        queue.start_charging_time = now
+        queue.estimated_completion_time = now + timedelta(hours=queue.requested_amount / pile_state.pile.power)
+
+        pile_state.charging = queue
+        pile_state.pile.status = ChargingPileStatus.CHARGING
+        self.started.append((queue.id, queue.estimated_completion_time))
+        self.chosen[pile_state.pile.id] = pile_state
+        self.changed = True
+        return queue
+
+    def release_pile(self, pile_state: PileState, now: datetime) -> Optional[ChargingQueue]:
+        """充电位上的车辆离开后（仅修改内存对象）：排队区第一辆车接着充电，返回该车辆；
+        没有排队车辆时充电桩恢复空闲。故障充电桩保持故障，排队车辆由故障处理退回等候区。
+        """
+        pile_state.charging = None
+        pile = pile_state.pile
+        if pile.status == ChargingPileStatus.FAULT:
+            return None
+        self.changed = True
+        if pile_state.queuing:
+            pile_state.queuing.sort(key=lambda q: (q.queue_time, q.id))
+            return self.start_charging(pile_state, now)
+        pile.status = ChargingPileStatus.NORMAL
+        return None
+
+    def fail_pile(self, pile_state: PileState, requeue_others: bool = False) -> Optional[ChargingQueue]:
+        """充电桩故障（仅修改内存对象）：移出调度，排队车辆退回等候区，返回被中断的充电车辆（由调用方结束计费）
+
+        requeue_others（按时间顺序策略）时，故障充电桩有排队车辆则同模式其他充电桩的排队车辆一并退回，
+        全部按排队先后重新分配。
+        """
+        pile = pile_state.pile
+        mode = pile.charging_mode
+        pile.status = ChargingPileStatus.FAULT
+        self.piles[mode] = [other for other in self.piles.get(mode, []) if other.pile.id != pile.id]
+
+        requeue = list(pile_state.queuing)
+        pile_state.queuing.clear()
+        if requeue and requeue_others:
+            for other in self.piles[mode]:
+                requeue.extend(other.queuing)
+                other.queuing.clear()
+        self.requeue(requeue)
+        self.changed = True
+        return pile_state.charging
+
+    def requeue(self, queues: Iterable[ChargingQueue]):
+        """排队车辆退回等候区（仅修改内存对象）；等候区按排队时间先来先服务，退回的车辆排在后来者之前"""
+        modes = set()
+        for queue in queues:
+            queue.charging_pile_id = None
+            queue.status = QueueStatus.WAITING
+            queue.estimated_completion_time = None
+            self.waiting.setdefault(queue.charging_mode, []).append(queue)
+            modes.add(queue.charging_mode)
+        for mode in modes:
+            self.waiting[mode].sort(key=lambda q: (q.queue_time, q.id))
+        if modes:
+            self.changed = True
@@ -0,0 +1,20 @@
+from sqlalchemy.orm import Session
+from app.models import ChargingPile, ChargingQueue, Vehicle
+from app.services.sequence_service import current_counter, ensure_counter, watch_counter
+
+# 充电站状态版本号所在的序列名称
+STATION_VERSION = "station_version"
+
+
+def current_station_version(db: Session) -> int:
+    """读取当前充电站状态版本号"""
+    return current_counter(db, STATION_VERSION)
+
+
+def ensure_station_version(db: Session):
+    """创建版本号所在的行，并登记递增版本号的模型（每个进程启动时调用）
+
+    充电桩、队列或车辆的变化会改变管理端看到的充电站状态，登记后这些修改在提交后递增版本号。
+    """
+    ensure_counter(db, STATION_VERSION)
+    watch_counter(STATION_VERSION, (ChargingPile, ChargingQueue, Vehicle))
@@ -0,0 +1,115 @@
+from typing import Dict, Optional, Tuple
+from datetime import date, datetime, time
+from sqlalchemy.orm import Session
+from app.models import ChargingRecord, PileDailyStats
+from app.services.billing_service import NORMAL, PEAK, VALLEY, PERIOD_AMOUNT_FIELDS, PERIOD_FEE_FIELDS, PERIOD_NAMES
+import numpy as np
+
+# 汇总的累加字段
+STAT_FIELDS = ("charging_duration", "charging_amount", "electricity_fee", "service_fee", "total_fee")
+
+StatKey = Tuple[date, int, str]
+
+# 早期详单的英文时段名
+LEGACY_PERIODS = {"peak": PEAK, "normal": NORMAL, "valley": VALLEY}
+
+
+def _period_index(time_period: str) -> int:
+    """详单记录的主要时段编号（早期详单可能使用英文时段名，无法识别的计入平时）"""
+    if time_period in PERIOD_NAMES:
+        return PERIOD_NAMES.index(time_period)
+    return LEGACY_PERIODS.get(time_period, NORMAL)
+
+
+def _split_by_period(records) -> Dict[StatKey, Dict[str, float]]:
+    """按详单上保存的峰/平/谷拆分累加到 (日期, 充电桩, 时段)
+
+    拆分在计费时按当时的电价时段得出并随详单保存，增量更新和回填重建读取同一份数据，
+    电价时段调整后重建的结果不变。未保存拆分的旧详单整体计入其记录的主要时段。
+    """
+    values = np.array([[getattr(r, field) for field in STAT_FIELDS] for r in records], dtype=np.float64)
+    dominant = np.array([_period_index(r.time_period) for r in records], dtype=np.int64)
+    fallback = np.eye(3)[dominant]
+    amounts = np.array([[getattr(r, field) for field in PERIOD_AMOUNT_FIELDS] for r in records], dtype=np.float64)
+    fees = np.array([[getattr(r, field) for field in PERIOD_FEE_FIELDS] for r in records], dtype=np.float64)
+    legacy = np.isnan(amounts).any(axis=1) | np.isnan(fees).any(axis=1)
+
+    # 时长、电量、服务费按各时段电量占比拆分（零电量的会话计入主要时段）；充电费取保存的各时段费用，总费用为两者之和
+    amount_sums = amounts.sum(axis=1, keepdims=True)
+    shares = np.divide(amounts, amount_sums, out=fallback.copy(), where=~legacy[:, None] & (amount_sums > 0))
+    split = values[:, None, :] * shares[:, :, None]
+    electricity, service, total = (STAT_FIELDS.index(f) for f in ("electricity_fee", "service_fee", "total_fee"))
+    split[:, :, electricity] = np.where(legacy[:, None], values[:, None, electricity] * fallback, fees)
+    split[:, :, total] = split[:, :, electricity] + split[:, :, service]
+
+    buckets: Dict[StatKey, Dict[str, float]] = {}
+    for i, record in enumerate(records):
+        stat_date = record.end_time.date()
+        for period, share in enumerate(shares[i]):
+            if share <= 0 and period != dominant[i]:
+                continue
+            key = (stat_date, record.charging_pile_id, PERIOD_NAMES[period])
+            bucket = buckets.setdefault(key, dict.fromkeys(("charging_count",) + STAT_FIELDS, 0.0))
+            bucket["charging_count"] += 1 if period == dominant[i] else 0
+            for field, value in zip(STAT_FIELDS, split[i, period]):
+                bucket[field] += float(value)
+    return buckets
+
+
+def record_pile_stats(db: Session, record: ChargingRecord):
+    """充电详单写入时增量更新日统计（不提交，随详单在同一事务中提交）"""
+    buckets = _split_by_period([record])
+
+    stat_date = record.end_time.date()
+    existing = {
+        stats.time_period: stats
+        for stats in db.query(PileDailyStats).filter(
+            PileDailyStats.stat_date == stat_date,
+            PileDailyStats.charging_pile_id == record.charging_pile_id
+        ).all()
+    }
+
+    for (_, pile_id, period), bucket in buckets.items():
+        stats = existing.get(period)
+        if stats is None:
+            stats = PileDailyStats(stat_date=stat_date, charging_pile_id=pile_id, time_period=period,
+                                   charging_count=0, **dict.fromkeys(STAT_FIELDS, 0.0))
+            db.add(stats)
+        stats.charging_count += int(bucket["charging_count"])
+        for field in STAT_FIELDS:
+            setattr(stats, field, getattr(stats, field) + bucket[field])
+    db.flush()
+
+
+def rebuild_pile_stats(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+    """根据 charging_records 重建日统计，日期范围为 [start_date, end_date)，不指定则全部重建"""
+    stats_query = db.query(PileDailyStats)
+    records_query = db.query(
+        ChargingRecord.charging_pile_id, ChargingRecord.end_time, ChargingRecord.time_period,
+        *[getattr(ChargingRecord, field) for field in STAT_FIELDS + PERIOD_AMOUNT_FIELDS + PERIOD_FEE_FIELDS]
+    )
+    if start_date:
+        stats_query = stats_query.filter(PileDailyStats.stat_date >= start_date)
+        records_query = records_query.filter(ChargingRecord.end_time >= datetime.combine(start_date, time.min))
+    if end_date:
+        stats_query = stats_query.filter(PileDailyStats.stat_date < end_date)
+        records_query = records_query.filter(ChargingRecord.end_time < datetime.combine(end_date, time.min))
+
+    stats_query.delete(synchronize_session=False)
+
+    records = records_query.all()
+    if records:
+        buckets = _split_by_period(records)
+        db.bulk_insert_mappings(PileDailyStats, [
+            {
+                "stat_date": stat_date,
+                "charging_pile_id": pile_id,
+                "time_period": period,
+                **bucket,
+                "charging_count": int(bucket["charging_count"]),
+            }
+            for (stat_date, pile_id, period), bucket in buckets.items()
+        ])
+    db.commit()
+
+    return len(records)
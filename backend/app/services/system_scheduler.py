@@ -1,63 +1,82 @@
 from typing import List
 from datetime import datetime
 from sqlalchemy.orm import Session
-from app.models import ChargingQueue, ChargingPile, QueueStatus, ChargingPileStatus
+from app.models import ChargingQueue, ChargingPile, ChargingRecord, PileDailyStats, ChargingMode, QueueStatus, ChargingPileStatus
 from app.services.charging_service import ChargingScheduleService
-from app.core.database import get_db
+from app.services.event_bus import StationEvent, station_event_bus
+from app.services.completion_timer import charge_completion_timer
+from app.services.statistics_service import rebuild_pile_stats
+from app.services.station_version import current_station_version
+from app.services.lease_service import Lease
+from app.services.queue_index import queue_position_index
+from app.core.config import settings
+from app.core.database import session_scope
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 调度租约名称
+SCHEDULER_LEASE = "scheduler"
+
 class SystemScheduler:
-    """系统调度器 - 处理系统启动时的状态恢复和自动调度"""
+    """系统调度器 - 处理系统启动时的状态恢复和自动调度
     
-    def __init__(self):
-        self.db = next(get_db())
-        self.charging_service = ChargingScheduleService(self.db)
+    调度器是进程内长期存在的实例，但不持有数据库会话：每个步骤、每次调度都使用独立的短生命周期会话，
+    避免会话中的对象随运行时间累积并读到过期数据。
+    多进程部署时各进程通过数据库租约选出一个领导者。调度职责的划分：
+    - 请求路径（提交、取消、故障处理）在处理请求的进程中就地调度，无论该进程是否为领导者，
+      用户提交后立即进入排队区而不必等待领导者；并发调度的正确性由 StationState 的行锁和提交前复核保证。
+    - 后台任务只由领导者执行：状态恢复、事件驱动调度、兜底周期调度和自动结束充电（避免重复生成详单）。
+      非领导者就地开始的充电只登记在本进程的定时器中，领导者按 SYSTEM_SCHEDULER_POLL_INTERVAL
+      检查状态版本号，发现其他进程的修改后重建自己的充电完成定时器。
+    领导者崩溃后，其他进程在租约过期后接管。
+    """
     
-    def get_fresh_db(self):
-        """获取新的数据库会话"""
-        return next(get_db())
+    def __init__(self):
+        self._pending_modes = set()
+        self._wakeup = None
+        self.lease = Lease(SCHEDULER_LEASE, settings.SYSTEM_SCHEDULER_LEASE_TTL)
+        self.is_leader = False
+        self._seen_version = None
     
     def restore_pile_status(self):
         """恢复充电桩状态"""
         logger.info("恢复充电桩状态...")
         
         try:
-            # 获取所有充电桩
-            all_piles = self.db.query(ChargingPile).all()
-            
-            restored_count = 0
-            for pile in all_piles:
-                # 检查该充电桩是否有正在充电的车辆
-                charging_vehicle = self.db.query(ChargingQueue).filter(
-                    ChargingQueue.charging_pile_id == pile.id,
-                    ChargingQueue.status == QueueStatus.CHARGING
-                ).first()
+            with session_scope() as db:
+                # 获取所有充电桩
+                all_piles = db.query(ChargingPile).all()
                 
-                if charging_vehicle:
-                    # 有车辆正在充电，状态应为使用中
-                    if pile.status != ChargingPileStatus.CHARGING:
-                        pile.status = ChargingPileStatus.CHARGING
-                        restored_count += 1
-                        logger.info(f"🔋 充电桩 {pile.pile_number} 状态恢复为使用中 (车辆: {charging_vehicle.queue_number})")
-                else:
-                    # 没有车辆正在充电，状态应为正常（除非是故障或离线）
-                    if pile.status == ChargingPileStatus.CHARGING:
-                        pile.status = ChargingPileStatus.NORMAL
-                        restored_count += 1
-                        logger.info(f"🔋 充电桩 {pile.pile_number} 状态恢复为正常")
+                restored_count = 0
+                for pile in all_piles:
+                    # 检查该充电桩是否有正在充电的车辆
+                    charging_vehicle = db.query(ChargingQueue).filter(
+                        ChargingQueue.charging_pile_id == pile.id,
+                        ChargingQueue.status == QueueStatus.CHARGING
+                    ).first()
+                    
+                    if charging_vehicle:
+                        # 有车辆正在充电，状态应为使用中
+                        if pile.status != ChargingPileStatus.CHARGING:
+                            pile.status = ChargingPileStatus.CHARGING
+                            restored_count += 1
+                            logger.info(f"🔋 充电桩 {pile.pile_number} 状态恢复为使用中 (车辆: {charging_vehicle.queue_number})")
+                    else:
+                        # 没有车辆正在充电，状态应为正常（除非是故障或离线）
+                        if pile.status == ChargingPileStatus.CHARGING:
+                            pile.status = ChargingPileStatus.NORMAL
+                            restored_count += 1
+                            logger.info(f"🔋 充电桩 {pile.pile_number} 状态恢复为正常")
             
             if restored_count > 0:
-                self.db.commit()
                 logger.info(f"恢复了 {restored_count} 个充电桩状态")
             else:
                 logger.info("所有充电桩状态正常，无需恢复")
-                
+        
         except Exception as e:
             logger.error(f"恢复充电桩状态失败: {e}")
-            self.db.rollback()
     
     def recover_system_state(self):
         """系统启动时恢复状态"""
@@ -76,99 +95,146 @@ class SystemScheduler:
             # 4. 检查排队中的车辆是否可以开始充电
             self.check_queuing_vehicles()
             
-            # 5. 清理无效状态
+            # 5. 根据充电中的记录重建自动完成定时器
+            self.rebuild_completion_timer()
+            
+            # 6. 清理无效状态
             self.cleanup_invalid_states()
             
+            # 7. 日统计汇总表为空时从充电详单回填（升级后首次启动）
+            self.backfill_pile_stats()
+            
             logger.info("系统状态恢复完成")
             
         except Exception as e:
             logger.error(f"系统状态恢复失败: {str(e)}")
     
+    def backfill_pile_stats(self):
+        """日统计汇总表为空而已有充电详单时，从详单重建汇总"""
+        with session_scope() as db:
+            if db.query(PileDailyStats.id).first() is not None:
+                return
+            if db.query(ChargingRecord.id).first() is None:
+                return
+            
+            logger.info("日统计汇总表为空，从充电详单回填...")
+            record_count = rebuild_pile_stats(db)
+        logger.info(f"回填了 {record_count} 条充电详单的日统计")
+    
     def fix_orphaned_queues(self):
         """修复孤立的排队记录（充电桩ID无效或充电桩不存在）"""
         logger.info("检查孤立的排队记录...")
         
-        # 查找充电桩ID无效的队列记录
-        orphaned_queues = self.db.query(ChargingQueue).filter(
-            ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING]),
-            ChargingQueue.charging_pile_id.isnot(None)
-        ).all()
-        
-        fixed_count = 0
-        for queue in orphaned_queues:
-            # 检查充电桩是否存在且可用
-            pile = self.db.query(ChargingPile).filter(
-                ChargingPile.id == queue.charging_pile_id,
-                ChargingPile.is_active == True
-            ).first()
+        with session_scope() as db:
+            # 查找充电桩ID无效的队列记录
+            orphaned_queues = db.query(ChargingQueue).filter(
+                ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING]),
+                ChargingQueue.charging_pile_id.isnot(None)
+            ).all()
             
-            if not pile:
-                # 充电桩不存在或不可用，将车辆移回等候区
-                queue.charging_pile_id = None
-                queue.status = QueueStatus.WAITING
-                queue.estimated_completion_time = None
-                fixed_count += 1
-                logger.info(f"修复孤立队列记录: {queue.queue_number}")
+            fixed_count = 0
+            for queue in orphaned_queues:
+                # 检查充电桩是否存在且可用
+                pile = db.query(ChargingPile).filter(
+                    ChargingPile.id == queue.charging_pile_id,
+                    ChargingPile.is_active == True
+                ).first()
+                
+                if not pile:
+                    # 充电桩不存在或不可用，将车辆移回等候区
+                    queue.charging_pile_id = None
+                    queue.status = QueueStatus.WAITING
+                    queue.estimated_completion_time = None
+                    fixed_count += 1
+                    logger.info(f"修复孤立队列记录: {queue.queue_number}")
         
         if fixed_count > 0:
-            self.db.commit()
             logger.info(f"修复了 {fixed_count} 个孤立队列记录")
     
     def reschedule_waiting_vehicles(self):
         """重新调度等候区的车辆"""
         logger.info("重新调度等候区车辆...")
         
-        # 获取所有等候区的车辆
-        waiting_vehicles = self.db.query(ChargingQueue).filter(
-            ChargingQueue.status == QueueStatus.WAITING
-        ).order_by(ChargingQueue.queue_time).all()
-        
-        if waiting_vehicles:
-            logger.info(f"发现 {len(waiting_vehicles)} 个等候区车辆，开始重新调度")
-            self.charging_service.schedule_charging()
-        else:
-            logger.info("等候区无车辆需要调度")
+        with session_scope() as db:
+            # 统计等候区的车辆
+            waiting_count = db.query(ChargingQueue).filter(
+                ChargingQueue.status == QueueStatus.WAITING
+            ).count()
+            
+            if waiting_count:
+                logger.info(f"发现 {waiting_count} 个等候区车辆，开始重新调度")
+                ChargingScheduleService(db).schedule_charging()
+            else:
+                logger.info("等候区无车辆需要调度")
     
     def check_queuing_vehicles(self):
         """检查排队中的车辆是否可以开始充电"""
         logger.info("检查排队中的车辆...")
         
         # 使用新的数据库会话确保数据最新
-        db = self.get_fresh_db()
-        charging_service = ChargingScheduleService(db)
-        
-        # 获取所有充电桩
-        piles = db.query(ChargingPile).filter(
-            ChargingPile.is_active == True,
-            ChargingPile.status == ChargingPileStatus.NORMAL
-        ).all()
-        
-        started_count = 0
-        for pile in piles:
-            # 检查该充电桩是否有正在充电的车辆
-            charging_vehicle = db.query(ChargingQueue).filter(
-                ChargingQueue.charging_pile_id == pile.id,
-                ChargingQueue.status == QueueStatus.CHARGING
-            ).first()
+        with session_scope() as db:
+            charging_service = ChargingScheduleService(db)
             
-            if not charging_vehicle:
-                # 该充电桩空闲，检查是否有排队的车辆
-                next_vehicle = db.query(ChargingQueue).filter(
+            # 获取所有充电桩
+            piles = db.query(ChargingPile).filter(
+                ChargingPile.is_active == True,
+                ChargingPile.status == ChargingPileStatus.NORMAL
+            ).all()
+            
+            started_count = 0
+            for pile in piles:
+                # 检查该充电桩是否有正在充电的车辆
+                charging_vehicle = db.query(ChargingQueue).filter(
                     ChargingQueue.charging_pile_id == pile.id,
-                    ChargingQueue.status == QueueStatus.QUEUING
-                ).order_by(ChargingQueue.queue_time).first()
+                    ChargingQueue.status == QueueStatus.CHARGING
+                ).first()
                 
-                if next_vehicle:
-                    # 开始充电
-                    charging_service.start_charging(next_vehicle.id)
-                    started_count += 1
-                    logger.info(f"自动开始充电: {next_vehicle.queue_number} 在充电桩 {pile.pile_number}")
+                if not charging_vehicle:
+                    # 该充电桩空闲，检查是否有排队的车辆
+                    next_vehicle = db.query(ChargingQueue).filter(
+                        ChargingQueue.charging_pile_id == pile.id,
+                        ChargingQueue.status == QueueStatus.QUEUING
+                    ).order_by(ChargingQueue.queue_time).first()
+                    
+                    if next_vehicle:
+                        # 开始充电
+                        charging_service.start_charging(next_vehicle.id)
+                        started_count += 1
+                        logger.info(f"自动开始充电: {next_vehicle.queue_number} 在充电桩 {pile.pile_number}")
         
         if started_count > 0:
             logger.info(f"自动开始了 {started_count} 个充电任务")
         else:
             logger.info("没有需要自动开始的充电任务")
     
+    def rebuild_completion_timer(self):
+        """重建充电完成定时器，重启期间已到期的会话会立即结束"""
+        logger.info("重建充电完成定时器...")
+        
+        with session_scope() as db:
+            count = charge_completion_timer.rebuild(db)
+        logger.info(f"登记了 {count} 个充电中会话的自动完成时间")
+    
+    def complete_due_session(self, queue_id: int):
+        """到达预计完成时间，自动结束充电"""
+        with session_scope() as db:
+            queue = db.query(ChargingQueue).filter(ChargingQueue.id == queue_id).first()
+            if queue and queue.status == QueueStatus.CHARGING:
+                record = ChargingScheduleService(db).complete_charging(queue_id)
+                logger.info(f"自动结束充电: {queue.queue_number}, 详单 {record.record_number}")
+    
+    def start_completion_timer(self):
+        """启动充电完成定时器"""
+        logger.info("启动充电完成定时器...")
+        
+        async def on_due(queue_id: int):
+            # 由领导者结束充电，避免多个进程重复生成详单
+            if not self.is_leader:
+                return
+            await asyncio.to_thread(self.complete_due_session, queue_id)
+        
+        asyncio.create_task(charge_completion_timer.run(on_due))
+    
     def cleanup_invalid_states(self):
         """清理无效状态"""
         logger.info("清理无效状态...")
@@ -177,21 +243,158 @@ class SystemScheduler:
         # 这里可以根据业务需求添加具体的清理逻辑
         pass
     
+    def schedule_modes(self, modes: List[ChargingMode]) -> int:
+        """只对受影响的充电模式执行一次调度（在工作线程中使用独立会话），返回调度后的状态版本号"""
+        with session_scope() as db:
+            before = current_station_version(db)
+            ChargingScheduleService(db).schedule_charging(modes)
+            after = current_station_version(db)
+            
+            # 调度后更新排队位置索引
+            queue_position_index.refresh(db)
+        
+        # 调度前已有其他进程的修改时不前移已知版本号，留给 sync_external_changes 发现
+        if before == self._seen_version:
+            self._seen_version = after
+        return after
+    
+    def dispatch_pending(self, modes: List[ChargingMode], sync: bool):
+        """调度事件涉及的充电模式；sync 时（到达检查间隔）再检查其他进程的修改，与事件是否持续到达无关"""
+        if modes:
+            self.schedule_modes(modes)
+        if sync:
+            self.sync_external_changes()
+    
+    async def _on_station_event(self, event: StationEvent):
+        """记录受影响的充电模式并唤醒调度循环，同一时刻的多个事件合并为一次调度
+        
+        发布方已调度过的事件（提交、取消、故障）不再重复调度。
+        """
+        if event.scheduled:
+            return
+        self._pending_modes.add(event.charging_mode)
+        self._wakeup.set()
+    
+    def start_event_scheduler(self):
+        """启动事件驱动调度器"""
+        logger.info("启动事件驱动调度器...")
+        
+        self._wakeup = asyncio.Event()
+        station_event_bus.attach(asyncio.get_running_loop())
+        station_event_bus.subscribe(self._on_station_event)
+        
+        loop = asyncio.get_running_loop()
+        interval = settings.SYSTEM_SCHEDULER_POLL_INTERVAL
+        
+        async def dispatch_events():
+            # 其他进程处理的请求不会发布到本进程的事件总线，按独立的间隔检查状态版本号
+            next_sync = loop.time() + interval
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_sync - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                
+                modes = sorted(self._pending_modes, key=lambda mode: mode.value)
+                self._pending_modes.clear()
+                sync = loop.time() >= next_sync
+                if sync:
+                    next_sync = loop.time() + interval
+                if not self.is_leader:
+                    continue
+                
+                try:
+                    await asyncio.to_thread(self.dispatch_pending, modes, sync)
+                except Exception as e:
+                    logger.error(f"事件调度出错: {str(e)}")
+        
+        asyncio.create_task(dispatch_events())
+    
+    def sync_external_changes(self):
+        """状态版本号变化且不是本进程调度造成时，调度全部模式并重建充电完成定时器
+        
+        其他进程中开始的充电只登记在该进程的定时器中，需要由领导者重新登记。
+        """
+        with session_scope() as db:
+            version = current_station_version(db)
+        if version == self._seen_version:
+            return
+        
+        version = self.schedule_modes(list(ChargingMode))
+        self.rebuild_completion_timer()
+        self._seen_version = version
+    
+    def renew_lease(self) -> bool:
+        """获取或续约调度租约"""
+        with session_scope() as db:
+            return self.lease.acquire(db)
+    
+    def release_lease(self):
+        """释放调度租约（进程退出时调用）"""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        with session_scope() as db:
+            self.lease.release(db)
+    
+    async def elect_leader(self):
+        """续约一次调度租约，并据此切换领导者身份"""
+        try:
+            acquired = await asyncio.to_thread(self.renew_lease)
+        except Exception as e:
+            logger.error(f"续约调度租约出错: {str(e)}")
+            acquired = False
+        
+        if acquired and not self.is_leader:
+            logger.info(f"获得调度租约 ({self.lease.holder})，开始执行调度")
+            await asyncio.to_thread(self.recover_system_state)
+            self._seen_version = None
+            self.is_leader = True
+        elif not acquired and self.is_leader:
+            logger.warning(f"失去调度租约 ({self.lease.holder})，停止执行调度")
+            self.is_leader = False
+    
+    async def start_leader_election(self):
+        """启动调度租约心跳：先尝试一次获取租约（获得后恢复系统状态），之后每 1/3 有效期续约一次"""
+        logger.info("启动调度租约选举...")
+        
+        await self.elect_leader()
+        if not self.is_leader:
+            logger.info("调度租约由其他进程持有，本进程只处理请求")
+        
+        heartbeat = settings.SYSTEM_SCHEDULER_LEASE_TTL / 3
+        
+        async def heartbeat_loop():
+            while True:
+                await asyncio.sleep(heartbeat)
+                await self.elect_leader()
+        
+        asyncio.create_task(heartbeat_loop())
+    
+    def periodic_tick(self):
+        """一次兜底检查，每个步骤使用独立的数据库会话"""
+        # 检查排队中的车辆是否可以开始充电
+        self.check_queuing_vehicles()
+        
+        # 重新调度等候区车辆
+        self.reschedule_waiting_vehicles()
+    
     def start_periodic_scheduler(self):
-        """启动周期性调度器"""
+        """启动周期性调度器（兜底，日常调度由事件驱动）"""
         logger.info("启动周期性调度器...")
         
+        interval = settings.SYSTEM_PERIODIC_SCHEDULE_INTERVAL
+        
         async def periodic_check():
             while True:
                 try:
-                    # 每30秒检查一次是否需要调度
-                    await asyncio.sleep(30)
-                    
-                    # 检查排队中的车辆是否可以开始充电
-                    self.check_queuing_vehicles()
+                    # 兜底检查，防止遗漏事件
+                    await asyncio.sleep(interval)
+                    if not self.is_leader:
+                        continue
                     
-                    # 重新调度等候区车辆
-                    self.reschedule_waiting_vehicles()
+                    await asyncio.to_thread(self.periodic_tick)
                     
                 except Exception as e:
                     logger.error(f"周期性调度出错: {str(e)}")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+充电桩日统计回填脚本
+根据 charging_records 重建 pile_daily_stats 汇总表
+
+用法: python backfill_pile_stats.py [开始日期 YYYY-MM-DD] [结束日期 YYYY-MM-DD，不含]
+"""
+
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import engine, Base, SessionLocal
+from app.services.statistics_service import rebuild_pile_stats
+import app.models  # noqa: F401  注册所有模型
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def main(start_date=None, end_date=None):
+    # 确保汇总表存在
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        record_count = rebuild_pile_stats(db, start_date, end_date)
+    finally:
+        db.close()
+    print(f"✅ 已根据 {record_count} 条充电详单重建日统计")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:] + [None, None]
+    print("🔄 开始回填充电桩日统计...")
+    try:
+        main(parse_date(args[0]), parse_date(args[1]))
+    except Exception as e:
+        print(f"❌ 回填失败: {e}")
+        sys.exit(1)
+    print("🎉 回填完成!")
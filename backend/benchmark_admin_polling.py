@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+管理端并发轮询压测
+多个线程持续轮询管理端接口，同时用探针请求根路径，统计各自的延迟分位数。
+若接口在事件循环中执行同步数据库操作，探针延迟会随轮询并发数明显上升。
+
+用法: python benchmark_admin_polling.py --pollers 32 --duration 30
+（需先启动后端服务）
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ADMIN_ENDPOINTS = [
+    "/admin/queue/active",
+    "/admin/users",
+    "/admin/piles",
+    "/admin/queue/summary",
+    "/admin/config/",
+]
+
+
+def percentile(samples, pct):
+    """计算分位数（毫秒）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def login(base_url, username, password):
+    """登录获取管理员token"""
+    response = requests.post(f"{base_url}/auth/login", data={"username": username, "password": password}, timeout=10)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def poll_admin(base_url, headers, stop_at, samples, errors, lock):
+    """持续轮询管理端接口"""
+    session = requests.Session()
+    i = 0
+    while time.perf_counter() < stop_at:
+        endpoint = ADMIN_ENDPOINTS[i % len(ADMIN_ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{endpoint}", headers=headers, timeout=30)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if response.status_code == 200:
+                    samples.append(elapsed)
+                else:
+                    errors.append(f"{endpoint}: {response.status_code}")
+        except requests.RequestException as e:
+            with lock:
+                errors.append(f"{endpoint}: {e}")
+
+
+def probe_root(server_url, stop_at, samples, interval):
+    """以固定间隔请求根路径，衡量事件循环是否被阻塞"""
+    session = requests.Session()
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        try:
+            session.get(f"{server_url}/", timeout=30)
+            samples.append(time.perf_counter() - started)
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="管理端并发轮询压测")
+    parser.add_argument("--server", default="http://localhost:8000", help="后端服务地址")
+    parser.add_argument("--api-prefix", default="/api/v1", help="API路径前缀")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--pollers", type=int, default=32, help="并发轮询线程数")
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长(秒)")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="探针请求间隔(秒)")
+    args = parser.parse_args()
+
+    base_url = f"{args.server}{args.api_prefix}"
+    headers = {"Authorization": f"Bearer {login(base_url, args.username, args.password)}"}
+
+    admin_samples, probe_samples, errors = [], [], []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    print(f"🚀 {args.pollers} 个线程并发轮询 {len(ADMIN_ENDPOINTS)} 个管理端接口，持续 {args.duration:.0f} 秒...")
+    with ThreadPoolExecutor(max_workers=args.pollers + 1) as executor:
+        executor.submit(probe_root, args.server, stop_at, probe_samples, args.probe_interval)
+        for _ in range(args.pollers):
+            executor.submit(poll_admin, base_url, headers, stop_at, admin_samples, errors, lock)
+
+    print(f"\n📊 管理端接口: {len(admin_samples)} 次成功, {len(errors)} 次失败, "
+          f"吞吐 {len(admin_samples) / args.duration:.1f} req/s")
+    print(f"   p50 {percentile(admin_samples, 50):.1f} ms | p95 {percentile(admin_samples, 95):.1f} ms | "
+          f"p99 {percentile(admin_samples, 99):.1f} ms")
+    print(f"📊 根路径探针: {len(probe_samples)} 次")
+    print(f"   p50 {percentile(probe_samples, 50):.1f} ms | p95 {percentile(probe_samples, 95):.1f} ms | "
+          f"p99 {percentile(probe_samples, 99):.1f} ms")
+    if errors:
+        print(f"⚠️  部分错误: {errors[:5]}")
+
+
+if __name__ == "__main__":
+    main()
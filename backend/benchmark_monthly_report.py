@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+月报统计耗时测试
+在内存数据库中生成一个月的充电详单（默认 100 个充电桩 × 每桩每天 5 条），重建充电桩日统计后
+多次调用月报接口，统计耗时分位数。月报只读取日统计汇总表，耗时不随详单数量增长。
+
+用法: python benchmark_monthly_report.py --piles 100 --per-day 5 --max-ms 100
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import ChargingPile, ChargingRecord, User, Vehicle, ChargingMode, ChargingPileStatus
+from app.services.station_version import ensure_station_version
+from app.services.statistics_service import rebuild_pile_stats
+from app.api.api_v1.endpoints.admin import get_monthly_report
+
+MONTH_START = datetime(2024, 6, 1)
+
+
+def percentile(samples, pct):
+    """计算分位数（毫秒）"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def setup_database(piles, days, per_day):
+    """创建内存数据库，批量写入详单并重建日统计，返回会话和详单数"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    ensure_station_version(db)
+
+    user = User(username="report", email="report@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    vehicle = Vehicle(license_plate="REPORT-1", battery_capacity=60.0, owner_id=user.id)
+    pile_rows = [ChargingPile(pile_number=f"F{i + 1:03d}", charging_mode=ChargingMode.FAST, power=30.0,
+                              status=ChargingPileStatus.NORMAL, is_active=True) for i in range(piles)]
+    db.add(vehicle)
+    db.add_all(pile_rows)
+    db.flush()
+
+    mappings = []
+    for day in range(days):
+        for pile in pile_rows:
+            for n in range(per_day):
+                created = MONTH_START + timedelta(days=day, hours=n % 24, minutes=n)
+                mappings.append({
+                    "record_number": f"CR{day:03d}{pile.id:04d}{n:04d}",
+                    "user_id": user.id, "vehicle_id": vehicle.id, "charging_pile_id": pile.id,
+                    "charging_amount": 10.0, "charging_duration": 0.5,
+                    "start_time": created - timedelta(minutes=30), "end_time": created,
+                    "electricity_fee": 7.0, "service_fee": 8.0, "total_fee": 15.0,
+                    "unit_price": 0.7, "time_period": "平时", "created_at": created,
+                })
+    db.bulk_insert_mappings(ChargingRecord, mappings)
+    db.commit()
+    rebuild_pile_stats(db)
+    return db, len(mappings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="月报统计耗时测试")
+    parser.add_argument("--piles", type=int, default=100, help="充电桩数量")
+    parser.add_argument("--days", type=int, default=30, help="详单覆盖的天数")
+    parser.add_argument("--per-day", type=int, default=5, help="每个充电桩每天的详单数")
+    parser.add_argument("--repeat", type=int, default=20, help="月报调用次数")
+    parser.add_argument("--max-ms", type=float, default=100.0, help="允许的 p50 耗时(毫秒)")
+    args = parser.parse_args()
+
+    print(f"🚀 生成 {args.piles} 个充电桩 {args.days} 天的详单...")
+    db, record_count = setup_database(args.piles, args.days, args.per_day)
+    month = MONTH_START.strftime("%Y-%m")
+
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        get_monthly_report(month=month, admin_user=None, db=db)
+        samples.append(time.perf_counter() - started)
+    db.close()
+
+    p50 = percentile(samples, 50)
+    print(f"\n📊 月报统计 {record_count} 条详单，调用 {args.repeat} 次")
+    print(f"   p50 {p50:.1f} ms | p95 {percentile(samples, 95):.1f} ms | 最长 {max(samples) * 1000:.1f} ms")
+    if p50 > args.max_ms:
+        print(f"❌ p50 超过 {args.max_ms:.0f} ms")
+        sys.exit(1)
+    print("✅ 月报耗时符合要求")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+调度器内存浸泡测试
+在临时数据库上模拟长时间运行的充电站：每个节拍（默认30秒模拟时间）有车辆提交充电请求，
+调度器执行事件调度和兜底检查，到期会话自动结束并生成详单。
+预热后与结束时比较进程常驻内存(RSS)，增长超过阈值即失败。
+调度器若持有长生命周期会话，会话中的对象随节拍累积，RSS 会持续上升。
+
+用法: python benchmark_scheduler_memory.py --hours 24 --max-growth-mb 8
+"""
+
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+
+from app.core.database import Base, SessionLocal, session_scope
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.services.charging_service import ChargingScheduleService
+from app.services.system_scheduler import SystemScheduler
+
+
+def rss_mb():
+    """当前进程常驻内存(MB)，非 Linux 平台退化为峰值常驻内存"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def setup_database(vehicle_count):
+    """创建临时数据库，并让调度器和服务使用的会话都指向它"""
+    path = os.path.join(tempfile.mkdtemp(), "soak.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal.configure(bind=engine)
+
+    with session_scope() as db:
+        for i in range(2):
+            db.add(ChargingPile(pile_number=f"F{i + 1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                                status=ChargingPileStatus.NORMAL, is_active=True))
+        for i in range(3):
+            db.add(ChargingPile(pile_number=f"T{i + 1:02d}", charging_mode=ChargingMode.TRICKLE, power=7.0,
+                                status=ChargingPileStatus.NORMAL, is_active=True))
+        for n in range(vehicle_count):
+            user = User(username=f"soak{n}", email=f"soak{n}@example.com", hashed_password="x")
+            db.add_all([user, Vehicle(license_plate=f"SOAK-{n}", battery_capacity=60.0, owner=user)])
+
+    with session_scope() as db:
+        return [(vehicle.owner_id, vehicle.id) for vehicle in db.query(Vehicle).all()]
+
+
+def submit_requests(vehicles, rng, arrival_rate):
+    """模拟用户请求：部分空闲车辆提交充电请求（每个请求使用独立会话，与接口一致）"""
+    submitted = 0
+    for user_id, vehicle_id in rng.sample(vehicles, k=min(len(vehicles), arrival_rate)):
+        with session_scope() as db:
+            mode = rng.choice(list(ChargingMode))
+            try:
+                ChargingScheduleService(db).submit_charging_request(user_id, vehicle_id, mode, rng.uniform(5, 30))
+                submitted += 1
+            except Exception:
+                # 车辆已在排队或等候区已满
+                db.rollback()
+    return submitted
+
+
+def charging_queue_ids():
+    with session_scope() as db:
+        return [queue_id for (queue_id,) in db.query(ChargingQueue.id).filter(
+            ChargingQueue.status == QueueStatus.CHARGING
+        ).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="调度器内存浸泡测试")
+    parser.add_argument("--hours", type=float, default=24.0, help="模拟运行时长(小时)")
+    parser.add_argument("--tick", type=float, default=30.0, help="每个节拍的模拟时长(秒)")
+    parser.add_argument("--vehicles", type=int, default=200, help="车辆数")
+    parser.add_argument("--arrival-rate", type=int, default=2, help="每个节拍尝试提交请求的车辆数")
+    parser.add_argument("--charge-ticks", type=int, default=20, help="会话充电持续的节拍数")
+    parser.add_argument("--periodic-every", type=int, default=10, help="每隔多少节拍执行一次兜底检查")
+    parser.add_argument("--warmup", type=float, default=0.1, help="预热比例，之后开始计算内存增长")
+    parser.add_argument("--max-growth-mb", type=float, default=8.0, help="允许的最大RSS增长(MB)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    ticks = int(args.hours * 3600 / args.tick)
+    warmup_ticks = max(1, int(ticks * args.warmup))
+    rng = random.Random(args.seed)
+
+    vehicles = setup_database(args.vehicles)
+    scheduler = SystemScheduler()
+    started_at = {}
+    submitted = completed = 0
+    baseline = peak = None
+
+    print(f"🚀 模拟 {args.hours:.0f} 小时（{ticks} 个节拍，每节拍 {args.tick:.0f} 秒），{args.vehicles} 辆车...")
+    began = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for tick in range(ticks):
+            submitted += submit_requests(vehicles, rng, args.arrival_rate)
+            scheduler.schedule_modes(list(ChargingMode))
+            if tick % args.periodic_every == 0:
+                scheduler.periodic_tick()
+
+            # 充电满 charge_ticks 个节拍的会话到期自动结束
+            for queue_id in charging_queue_ids():
+                started_at.setdefault(queue_id, tick)
+                if tick - started_at[queue_id] >= args.charge_ticks:
+                    scheduler.complete_due_session(queue_id)
+                    del started_at[queue_id]
+                    completed += 1
+
+            if tick + 1 == warmup_ticks:
+                gc.collect()
+                baseline = peak = rss_mb()
+            elif baseline is not None and tick % 100 == 0:
+                gc.collect()
+                peak = max(peak, rss_mb())
+
+    gc.collect()
+    final = rss_mb()
+    peak = max(peak, final)
+    growth = final - baseline
+
+    print(f"\n📊 提交 {submitted} 个请求，完成 {completed} 次充电，耗时 {time.perf_counter() - began:.1f} 秒")
+    print(f"   预热后 RSS {baseline:.1f} MB | 峰值 {peak:.1f} MB | 结束 {final:.1f} MB | 增长 {growth:+.1f} MB")
+    if growth > args.max_growth_mb:
+        print(f"❌ RSS 增长超过 {args.max_growth_mb:.1f} MB")
+        sys.exit(1)
+    print("✅ RSS 保持平稳")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+SQLite 连接参数对比压测
+在两个临时数据库上分别运行相同的并发负载：若干进程持续提交并取消充电请求（写），
+若干进程持续查询排队状态（读），与多进程部署时各工作进程共用一个数据库文件的情况一致。对比 SQLite 默认参数（回滚日志）与配置文件中的连接参数（WAL 等），
+统计各自的吞吐、延迟分位数和“database is locked”失败次数。
+
+用法: python benchmark_sqlite_profile.py --writers 4 --readers 8 --duration 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, configure_sqlite, sqlite_pragmas
+from app.models import User, Vehicle, ChargingPile, ChargingMode, ChargingPileStatus
+from app.services.charging_service import ChargingScheduleService
+from app.services.queue_loader import load_active_queues
+from app.services.snapshot_service import queue_summary
+
+
+def percentile(samples, pct):
+    """计算分位数（毫秒）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def make_sessionmaker(path, pragmas):
+    """pragmas 为 None 时使用 SQLite 默认参数"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if pragmas is not None:
+        configure_sqlite(engine, pragmas)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def setup_database(pragmas, vehicle_count):
+    """创建临时数据库并写入充电桩和车辆"""
+    path = os.path.join(tempfile.mkdtemp(), "profile.db")
+    SessionLocal = make_sessionmaker(path, pragmas)
+    Base.metadata.create_all(bind=SessionLocal.kw["bind"])
+
+    db = SessionLocal()
+    for i in range(2):
+        db.add(ChargingPile(pile_number=f"F{i + 1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                            status=ChargingPileStatus.NORMAL, is_active=True))
+    for i in range(3):
+        db.add(ChargingPile(pile_number=f"T{i + 1:02d}", charging_mode=ChargingMode.TRICKLE, power=7.0,
+                            status=ChargingPileStatus.NORMAL, is_active=True))
+    for n in range(vehicle_count):
+        user = User(username=f"bench{n}", email=f"bench{n}@example.com", hashed_password="x")
+        db.add_all([user, Vehicle(license_plate=f"BENCH-{n}", battery_capacity=60.0, owner=user)])
+    db.commit()
+    vehicles = [(vehicle.owner_id, vehicle.id) for vehicle in db.query(Vehicle).all()]
+    db.close()
+    SessionLocal.kw["bind"].dispose()
+    return path, vehicles
+
+
+def submit_and_cancel(path, pragmas, vehicles, start_at, stop_at):
+    """写负载：提交充电请求后立即取消（每次一个会话，与接口一致）"""
+    SessionLocal = make_sessionmaker(path, pragmas)
+    samples, errors = [], []
+    rng = random.Random(os.getpid())
+    sys.stdout = open(os.devnull, "w")
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < stop_at:
+        user_id, vehicle_id = rng.choice(vehicles)
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            service = ChargingScheduleService(db)
+            service.submit_charging_request(user_id, vehicle_id, rng.choice(list(ChargingMode)), 10.0)
+            for queue in load_active_queues(db):
+                if queue.vehicle_id == vehicle_id:
+                    service.cancel_charging(queue.id)
+            samples.append(time.perf_counter() - started)
+        except OperationalError as e:
+            db.rollback()
+            errors.append(str(e.orig))
+        except Exception:
+            # 车辆已在排队、等候区已满等业务拒绝
+            db.rollback()
+        finally:
+            db.close()
+    return samples, errors
+
+
+def poll_status(path, pragmas, vehicles, start_at, stop_at):
+    """读负载：查询活跃队列并计算汇总（排队状态轮询）"""
+    SessionLocal = make_sessionmaker(path, pragmas)
+    samples, errors = [], []
+    rng = random.Random(os.getpid())
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < stop_at:
+        _, vehicle_id = rng.choice(vehicles)
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            queues = load_active_queues(db)
+            queue_summary(queues)
+            next((queue for queue in queues if queue.vehicle_id == vehicle_id), None)
+            samples.append(time.perf_counter() - started)
+        except OperationalError as e:
+            errors.append(str(e.orig))
+        finally:
+            db.close()
+    return samples, errors
+
+
+def collect(futures):
+    samples, errors = [], []
+    for future in futures:
+        worker_samples, worker_errors = future.result()
+        samples.extend(worker_samples)
+        errors.extend(worker_errors)
+    return samples, errors
+
+
+def run_profile(name, pragmas, args):
+    path, vehicles = setup_database(pragmas, args.vehicles)
+
+    with ProcessPoolExecutor(max_workers=args.writers + args.readers) as executor:
+        # 留出进程启动时间，所有进程在同一时刻开始
+        start_at = time.time() + 2
+        stop_at = start_at + args.duration
+        writers = [executor.submit(submit_and_cancel, path, pragmas, vehicles, start_at, stop_at)
+                   for _ in range(args.writers)]
+        readers = [executor.submit(poll_status, path, pragmas, vehicles, start_at, stop_at)
+                   for _ in range(args.readers)]
+        write_samples, write_errors = collect(writers)
+        read_samples, read_errors = collect(readers)
+
+    with make_sessionmaker(path, None)() as db:
+        journal_mode = db.connection().exec_driver_sql("PRAGMA journal_mode").scalar()
+
+    print(f"\n📊 {name} (journal_mode={journal_mode})")
+    for label, samples, errors in (("提交+取消", write_samples, write_errors), ("状态查询", read_samples, read_errors)):
+        print(f"   {label}: {len(samples) / args.duration:.1f} ops/s, 锁失败 {len(errors)} 次 | "
+              f"p50 {percentile(samples, 50):.1f} ms | p95 {percentile(samples, 95):.1f} ms | "
+              f"p99 {percentile(samples, 99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 连接参数对比压测")
+    parser.add_argument("--writers", type=int, default=4, help="写进程数")
+    parser.add_argument("--readers", type=int, default=8, help="读进程数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每种参数的压测时长(秒)")
+    parser.add_argument("--vehicles", type=int, default=200, help="车辆数")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.writers} 个写进程 + {args.readers} 个读进程，每种参数 {args.duration:.0f} 秒...")
+    run_profile("SQLite 默认参数", None, args)
+    run_profile("配置文件参数", sqlite_pragmas(), args)
+
+
+if __name__ == "__main__":
+    main()
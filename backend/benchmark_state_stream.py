@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+充电站状态推送分发耗时测试
+在进程内注册大量用户连接和管理员连接，反复让一部分队列的排队位置变化，
+统计每次计算差异并分发给各连接的耗时。只有受影响的用户会收到消息，耗时应与在线连接总数基本无关。
+
+用法: python benchmark_state_stream.py --users 5000 --admins 50 --changed 300 --max-ms 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.state_stream import StationStateStream
+
+
+def percentile(samples, pct):
+    """计算分位数（毫秒）"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def queue_rows(changed, shift):
+    """changed 个用户各一辆车，排队位置整体前移 shift 位"""
+    return {n: {"id": n, "user_id": n, "status": "waiting", "position": n + 1 - shift} for n in range(changed)}
+
+
+def drain(subscribers):
+    for subscriber in subscribers:
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="充电站状态推送分发耗时测试")
+    parser.add_argument("--users", type=int, default=5000, help="在线的用户连接数")
+    parser.add_argument("--admins", type=int, default=50, help="在线的管理员连接数")
+    parser.add_argument("--changed", type=int, default=300, help="每次变化涉及的用户数")
+    parser.add_argument("--repeat", type=int, default=50, help="变化次数")
+    parser.add_argument("--max-ms", type=float, default=500.0, help="允许的 p50 耗时(毫秒)")
+    args = parser.parse_args()
+
+    stream = StationStateStream()
+    subscribers = [stream.subscribe(user_id) for user_id in range(args.users)]
+    subscribers += [stream.subscribe(None) for _ in range(args.admins)]
+    stream.apply(0, {}, queue_rows(args.changed, 0))
+    drain(subscribers)
+
+    print(f"🚀 {args.users} 个用户连接 + {args.admins} 个管理员连接，每次 {args.changed} 个用户的队列变化...")
+    samples = []
+    for version in range(1, args.repeat + 1):
+        rows = queue_rows(args.changed, version % 2)
+        started = time.perf_counter()
+        stream.apply(version, {}, rows)
+        samples.append(time.perf_counter() - started)
+        drain(subscribers)
+
+    p50 = percentile(samples, 50)
+    print(f"\n📊 分发 {args.repeat} 次变化")
+    print(f"   p50 {p50:.1f} ms | p95 {percentile(samples, 95):.1f} ms | 最长 {max(samples) * 1000:.1f} ms")
+    if p50 > args.max_ms:
+        print(f"❌ p50 超过 {args.max_ms:.0f} ms")
+        sys.exit(1)
+    print("✅ 分发耗时符合要求")
+
+
+if __name__ == "__main__":
+    main()
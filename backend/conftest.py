@@ -0,0 +1,102 @@
+"""测试公用夹具：独立的内存数据库、只挂载部分路由的测试应用，前后重置进程内的缓存单例"""
+
+import sys
+import os
+from typing import NamedTuple
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, SessionLocal, get_db
+from app.services.config_service import config_service
+from app.services.config_version import ensure_config_version
+from app.services.principal_cache import principal_cache
+from app.services.queue_index import queue_position_index
+from app.services.station_version import ensure_station_version
+
+
+class MemoryDatabase(NamedTuple):
+    """内存数据库：engine 用于统计语句，Session 用于模拟其他会话（进程），db 为测试使用的会话"""
+    engine: Engine
+    Session: sessionmaker
+    db: Session
+
+
+def reset_singletons():
+    """清空配置缓存、鉴权缓存和排队位置索引，测试之间互不影响"""
+    config_service.invalidate_cache()
+    principal_cache.clear()
+    queue_position_index.clear()
+
+
+def create_memory_db() -> MemoryDatabase:
+    """创建独立的内存数据库和版本号所在的行"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = Session()
+    ensure_station_version(db)
+    ensure_config_version(db)
+    return MemoryDatabase(engine, Session, db)
+
+
+@pytest.fixture
+def make_memory_db():
+    """返回创建内存数据库的函数（同一测试需要多个独立数据库时使用），测试结束后关闭会话并重置缓存单例"""
+    created = []
+
+    def make() -> MemoryDatabase:
+        created.append(create_memory_db())
+        return created[-1]
+
+    reset_singletons()
+    try:
+        yield make
+    finally:
+        for memory in created:
+            memory.db.close()
+        reset_singletons()
+
+
+@pytest.fixture
+def memory_db(make_memory_db):
+    """独立的内存数据库，测试结束后关闭会话并重置缓存单例"""
+    return make_memory_db()
+
+
+@pytest.fixture
+def session_local(memory_db):
+    """让 SessionLocal（后台任务和临时会话使用）指向内存数据库，测试结束后恢复原来的绑定"""
+    original = SessionLocal.kw["bind"]
+    SessionLocal.configure(bind=memory_db.engine)
+    try:
+        yield memory_db
+    finally:
+        SessionLocal.configure(bind=original)
+
+
+@pytest.fixture
+def make_client(memory_db):
+    """返回创建测试应用的函数：只挂载给定路由，每个请求使用内存数据库的新会话"""
+    def override_get_db():
+        session = memory_db.Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def make(router, prefix: str, overrides: dict = None) -> TestClient:
+        app = FastAPI()
+        app.include_router(router, prefix=prefix)
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides.update(overrides or {})
+        return TestClient(app)
+
+    return make
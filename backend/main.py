@@ -2,8 +2,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.api_v1.api import api_router
-from app.core.database import engine, Base
+from app.core.database import engine, Base, create_missing_columns, create_missing_indexes, session_scope
 from app.services.system_scheduler import system_scheduler
+from app.services.state_stream import station_state_stream
+from app.services.station_version import ensure_station_version
+from app.services.config_version import ensure_config_version
 import uvicorn
 import logging
 
@@ -14,6 +17,10 @@ logger = logging.getLogger(__name__)
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+# 为已有数据库补建新增的列和索引
+create_missing_columns(engine)
+create_missing_indexes(engine)
+
 app = FastAPI(
     title="智能充电桩调度计费系统",
     description="PHY Charging Station Management System",
@@ -25,14 +32,33 @@ async def startup_event():
     """系统启动事件"""
     logger.info("系统启动中...")
     
-    # 恢复系统状态
-    system_scheduler.recover_system_state()
+    # 每个进程都创建版本号所在的行，之后提交修改只需 UPDATE 递增
+    with session_scope() as db:
+        ensure_station_version(db)
+        ensure_config_version(db)
+    
+    # 获取调度租约，获得租约的进程恢复系统状态并负责调度
+    await system_scheduler.start_leader_election()
+    
+    # 启动事件驱动调度器
+    system_scheduler.start_event_scheduler()
     
-    # 启动周期性调度器
+    # 启动充电完成定时器
+    system_scheduler.start_completion_timer()
+    
+    # 启动充电站状态推送
+    station_state_stream.start()
+    
+    # 启动兜底周期性调度器
     system_scheduler.start_periodic_scheduler()
     
     logger.info("系统启动完成")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """系统关闭事件：释放调度租约，其他进程无需等待过期即可接管"""
+    system_scheduler.release_lease()
+
 # 跨域中间件
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""测试鉴权缓存：命中时不查询用户表、禁用用户后立即失效、密码校验排队上限"""
+
+import sys
+import os
+import time
+import asyncio
+from datetime import timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.models import User
+from app.api.api_v1.endpoints import auth, admin, users
+from app.services.principal_cache import Principal, PrincipalCache, principal_cache
+
+
+def add_user(db, username="driver"):
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x", is_active=True)
+    db.add(user)
+    db.commit()
+    return user, auth.create_access_token({"sub": username}, timedelta(minutes=30))
+
+
+def test_cached_token_skips_users_table(memory_db):
+    """同一令牌第二次鉴权不再执行查询"""
+    engine, _, db = memory_db
+    user, token = add_user(db)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    first = auth.get_user_by_token(token, db)
+    queries_first = len(statements)
+    second = auth.get_user_by_token(token, db)
+
+    assert queries_first == 1
+    assert len(statements) == queries_first
+    assert first == second == Principal(user.id, "driver", "driver@example.com", None, False, True)
+
+
+def test_disabling_user_invalidates_cache(memory_db):
+    """管理员禁用用户后，已缓存的令牌立即失效"""
+    db = memory_db.db
+    user, token = add_user(db)
+    assert auth.get_user_by_token(token, db).id == user.id
+
+    admin.update_user_status(user.id, {"is_active": False}, admin_user=None, db=db)
+
+    assert len(principal_cache) == 0
+    with pytest.raises(HTTPException) as excinfo:
+        auth.get_user_by_token(token, db)
+    assert excinfo.value.status_code == 401
+
+
+def test_entries_expire():
+    """条目在 TTL 或令牌过期时间中较早者失效"""
+    cache = PrincipalCache(ttl=0.05)
+    principal = Principal(1, "driver", "driver@example.com", None, False, True)
+
+    cache.put("fresh", principal)
+    cache.put("expired-token", principal, token_expires_at=time.time() - 1)
+    assert cache.get("fresh") == principal
+    assert cache.get("expired-token") is None
+
+    time.sleep(0.1)
+    assert cache.get("fresh") is None
+    assert len(cache) == 0
+
+
+def test_password_hash_backlog_rejected():
+    """等待校验的登录请求达到上限时返回429，而不是继续排队"""
+    held = 0
+    while auth._password_slots.acquire(blocking=False):
+        held += 1
+    try:
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(auth.run_password_hash(auth.verify_password, "secret", auth.get_password_hash("secret")))
+        assert excinfo.value.status_code == 429
+    finally:
+        for _ in range(held):
+            auth._password_slots.release()
+
+    hashed = asyncio.run(auth.run_password_hash(auth.get_password_hash, "secret"))
+    assert asyncio.run(auth.run_password_hash(auth.verify_password, "secret", hashed))
+
+
+def test_register_and_login(make_client):
+    """异步的注册和登录接口：数据库操作和密码哈希都在线程池中完成"""
+    client = make_client(auth.router, "/auth")
+
+    body = {"username": "newcomer", "email": "newcomer@example.com", "password": "secret"}
+    assert client.post("/auth/register", json=body).json()["username"] == "newcomer"
+    assert client.post("/auth/register", json=body).json()["detail"] == "用户名已存在"
+
+    login = client.post("/auth/login", data={"username": "newcomer", "password": "secret"})
+    assert login.status_code == 200
+    assert login.json()["token_type"] == "bearer"
+    assert client.post("/auth/login", data={"username": "newcomer", "password": "wrong"}).status_code == 401
+
+
+def test_handlers_receive_principal(memory_db, make_client):
+    """经过真实鉴权依赖的接口拿到的是缓存中的只读用户信息，按用户ID查询数据"""
+    user, token = add_user(memory_db.db)
+    headers = {"Authorization": f"Bearer {token}"}
+    me = make_client(auth.router, "/auth").get("/auth/me", headers=headers).json()
+    assert (me["id"], me["username"], me["is_admin"]) == (user.id, "driver", False)
+
+    client = make_client(users.router, "/users")
+    body = {"license_plate": "PRINCIPAL-1", "battery_capacity": 60.0, "model": "Model 3"}
+    assert client.post("/users/vehicles", json=body, headers=headers).status_code == 200
+    assert [v["license_plate"] for v in client.get("/users/vehicles", headers=headers).json()] == ["PRINCIPAL-1"]
+
+
+def test_inactive_user_login_unchanged(memory_db, make_client):
+    """登录接口只校验用户名和密码，停用账户在使用令牌时被拒绝"""
+    client = make_client(auth.router, "/auth")
+    memory_db.db.add(User(username="retired", email="retired@example.com",
+                          hashed_password=auth.get_password_hash("secret"), is_active=False))
+    memory_db.db.commit()
+
+    token = client.post("/auth/login", data={"username": "retired", "password": "secret"}).json()["access_token"]
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
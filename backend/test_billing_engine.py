@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""测试分时计费引擎：跨时段精确分摊与批量重新计费"""
+
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.services.billing_service import BillingEngine
+
+# 峰 1.0 / 平 0.7 / 谷 0.4，服务费 0.8
+engine = BillingEngine(
+    peak_price=1.0, normal_price=0.7, valley_price=0.4, service_fee_price=0.8,
+    peak_ranges=[[10, 15], [18, 21]], normal_ranges=[[7, 10], [15, 18], [21, 23]]
+)
+
+
+def approx(a, b):
+    return abs(a - b) < 1e-9
+
+
+def test_price_table():
+    """1440分钟电价表与时段配置一致，跨零点的谷时正确处理"""
+    assert len(engine.minute_prices) == 1440
+    assert engine.minute_prices[10 * 60] == 1.0
+    assert engine.minute_prices[15 * 60 - 1] == 1.0
+    assert engine.minute_prices[15 * 60] == 0.7
+    assert engine.minute_prices[23 * 60 + 30] == 0.4
+    assert engine.minute_prices[3 * 60] == 0.4
+
+
+def test_single_period_session():
+    """整个会话在同一时段内，与原按开始时间计费一致"""
+    electricity, service, total, unit_price, period = engine.calculate_fees(
+        30.0, datetime(2024, 1, 1, 11, 0), datetime(2024, 1, 1, 12, 0)
+    )
+    assert approx(electricity, 30.0)
+    assert approx(service, 24.0)
+    assert approx(total, 54.0)
+    assert approx(unit_price, 1.0)
+    assert period == "峰时"
+
+
+def test_session_split_across_periods():
+    """9:30-10:30 各半小时平时/峰时，电量按时长平均分摊"""
+    electricity, _, _, unit_price, _ = engine.calculate_fees(
+        30.0, datetime(2024, 1, 1, 9, 30), datetime(2024, 1, 1, 10, 30)
+    )
+    assert approx(electricity, 15.0 * 0.7 + 15.0 * 1.0)
+    assert approx(unit_price, 0.85)
+
+
+def test_session_across_midnight_with_seconds():
+    """22:30:30 到次日 07:30:30，跨平/谷/平三段且不在整分钟"""
+    start = datetime(2024, 1, 1, 22, 30, 30)
+    end = datetime(2024, 1, 2, 7, 30, 30)
+    result = engine.calculate_batch([90.0], [start], [end])
+
+    hours = (end - start).total_seconds() / 3600
+    normal_hours = (datetime(2024, 1, 1, 23) - start).total_seconds() / 3600 + 0.5 + 30 / 3600
+    valley_hours = 8.0
+    assert approx(normal_hours + valley_hours, hours)
+    assert np.allclose(result.period_amounts[0], [0.0, 90.0 * normal_hours / hours, 90.0 * valley_hours / hours])
+    assert result.time_period[0] == "谷时"
+
+
+def test_zero_duration_session():
+    """零时长会话按开始时刻电价计费"""
+    moment = datetime(2024, 1, 1, 19, 0)
+    electricity, _, _, unit_price, period = engine.calculate_fees(0.0, moment, moment)
+    assert electricity == 0.0
+    assert unit_price == 1.0
+    assert period == "峰时"
+
+
+def test_batch_matches_single_and_is_fast():
+    """批量计费与逐条计费结果一致，上万条一次完成"""
+    rng = np.random.default_rng(7)
+    count = 20000
+    base = datetime(2024, 3, 1)
+    starts = [base + timedelta(minutes=int(m)) for m in rng.integers(0, 60 * 24 * 30, count)]
+    ends = [s + timedelta(minutes=int(d)) for s, d in zip(starts, rng.integers(1, 600, count))]
+    amounts = rng.uniform(5, 80, count)
+
+    started = time.perf_counter()
+    result = engine.calculate_batch(amounts, starts, ends)
+    elapsed = time.perf_counter() - started
+
+    for i in range(0, count, 997):
+        assert approx(engine.calculate_fees(amounts[i], starts[i], ends[i])[0], result.electricity_fee[i])
+    assert np.allclose(result.period_amounts.sum(axis=1), amounts)
+    print(f"批量计费 {count} 条耗时: {elapsed * 1000:.1f} ms")
+    assert elapsed < 2.0
+
+
+if __name__ == "__main__":
+    test_price_table()
+    test_single_period_session()
+    test_session_split_across_periods()
+    test_session_across_midnight_with_seconds()
+    test_zero_duration_session()
+    test_batch_matches_single_and_is_fast()
+    print("✅ 测试完成")
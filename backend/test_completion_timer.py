@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""测试充电完成定时器：按完成时间触发、撤销、重启后重建"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.models import ChargingQueue, ChargingPile, User, Vehicle, ChargingMode, QueueStatus, ChargingPileStatus
+from app.services.completion_timer import ChargeCompletionTimer
+
+
+def test_pop_due_in_completion_order():
+    """到期会话按完成时间顺序取出，撤销和更新过的条目被跳过"""
+    timer = ChargeCompletionTimer()
+    now = datetime.now()
+    timer.schedule(1, now + timedelta(minutes=30))
+    timer.schedule(2, now + timedelta(minutes=10))
+    timer.schedule(3, now + timedelta(minutes=20))
+    timer.schedule(4, now + timedelta(minutes=5))
+    timer.cancel(4)
+    timer.schedule(3, now + timedelta(minutes=40))
+
+    assert timer.next_delay(now) == 600
+    assert timer.pop_due(now + timedelta(minutes=35)) == [2, 1]
+    assert timer.pop_due(now + timedelta(hours=1)) == [3]
+    assert timer.next_delay(now) is None
+    assert len(timer) == 0
+
+
+def test_run_fires_when_session_finishes():
+    """定时循环在完成时间到达时回调，新登记的更早会话会提前唤醒循环"""
+    timer = ChargeCompletionTimer()
+    fired = []
+
+    async def main():
+        async def on_due(queue_id):
+            fired.append((queue_id, datetime.now()))
+
+        task = asyncio.create_task(timer.run(on_due))
+        await asyncio.sleep(0)
+        start = datetime.now()
+        timer.schedule(1, start + timedelta(seconds=0.3))
+        await asyncio.to_thread(timer.schedule, 2, start + timedelta(seconds=0.1))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        return start
+
+    start = asyncio.run(main())
+    assert [queue_id for queue_id, _ in fired] == [2, 1]
+    assert (fired[0][1] - start).total_seconds() < 0.25
+
+
+def test_rebuild_from_charging_queues(memory_db):
+    """重启后根据充电中的排队记录重建，完成时间 = 开始时间 + 电量/功率"""
+    db = memory_db.db
+    user = User(username="timer", email="timer@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    vehicle = Vehicle(license_plate="TIMER-1", battery_capacity=60.0, owner_id=user.id)
+    pile = ChargingPile(pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                        status=ChargingPileStatus.CHARGING, is_active=True)
+    db.add_all([vehicle, pile])
+    db.flush()
+
+    started = datetime(2024, 1, 1, 8, 0, 0)
+    db.add_all([
+        ChargingQueue(queue_number="F1", user_id=user.id, vehicle_id=vehicle.id, charging_mode=ChargingMode.FAST,
+                      requested_amount=15.0, status=QueueStatus.CHARGING, charging_pile_id=pile.id,
+                      start_charging_time=started),
+        ChargingQueue(queue_number="F2", user_id=user.id, vehicle_id=vehicle.id, charging_mode=ChargingMode.FAST,
+                      requested_amount=30.0, status=QueueStatus.QUEUING, charging_pile_id=pile.id),
+    ])
+    db.commit()
+
+    timer = ChargeCompletionTimer()
+    assert timer.rebuild(db) == 1
+    charging = db.query(ChargingQueue).filter(ChargingQueue.queue_number == "F1").first()
+    assert timer.pop_due(started + timedelta(minutes=29)) == []
+    assert timer.pop_due(started + timedelta(minutes=30)) == [charging.id]
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
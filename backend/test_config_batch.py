@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""测试批量更新配置：一次查询加载、按类型校验、全部成功或全部不生效（返回400）、配置版本号只递增一次"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import SystemConfig
+from app.api.api_v1.endpoints import config
+from app.services.config_version import current_config_version
+
+CONFIG_COUNT = 500
+
+
+@pytest.fixture
+def client(memory_db, make_client):
+    """只挂载配置路由的测试应用，数据库中有 CONFIG_COUNT 个整数配置项和一个布尔配置项"""
+    db = memory_db.db
+    db.add_all([
+        SystemConfig(config_key=f"bulk.item_{i}", config_value="0", config_type="integer", category="bulk")
+        for i in range(CONFIG_COUNT)
+    ])
+    db.add(SystemConfig(config_key="bulk.enabled", config_value="true", config_type="boolean", category="bulk"))
+    db.commit()
+    return make_client(config.router, "/config", {config.get_current_admin_user: lambda: None})
+
+
+def values(db):
+    db.expire_all()
+    return {c.config_key: c.config_value for c in db.query(SystemConfig).all()}
+
+
+def test_batch_update_single_query_and_version_bump(client, memory_db):
+    engine, _, db = memory_db
+    version = current_config_version(db)
+    updates = [{"config_key": f"bulk.item_{i}", "config_value": i} for i in range(CONFIG_COUNT)]
+
+    statements = []
+    counter = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", counter)
+    started = time.perf_counter()
+    response = client.post("/config/batch-update", json=updates)
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", counter)
+
+    assert response.status_code == 200
+    assert response.json()["success_count"] == CONFIG_COUNT
+    assert response.json()["error_count"] == 0
+    # 只有一次加载配置项的查询
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT") and "system_configs" in s]
+    assert len(selects) == 1
+    assert current_config_version(db) == version + 1
+    assert values(db)["bulk.item_7"] == "7"
+    print(f"批量更新 {CONFIG_COUNT} 个配置项耗时: {elapsed * 1000:.1f} ms")
+
+
+def test_invalid_value_rejects_whole_batch(client, memory_db):
+    db = memory_db.db
+    version = current_config_version(db)
+
+    response = client.post("/config/batch-update", json=[
+        {"config_key": "bulk.item_0", "config_value": "5"},
+        {"config_key": "bulk.item_1", "config_value": "not-a-number"},
+        {"config_key": "bulk.enabled", "config_value": "maybe"},
+        {"config_key": "bulk.missing", "config_value": "1"},
+    ])
+
+    # 与单项更新一致返回400，三项错误都在错误信息中
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert "bulk.item_1" in detail and "bulk.enabled" in detail and "bulk.missing" in detail
+    assert "bulk.item_0" not in detail
+    # 合法的一项也没有被修改
+    assert values(db)["bulk.item_0"] == "0"
+    assert current_config_version(db) == version
+
+
+def test_unchanged_values_do_not_bump_version(client, memory_db):
+    db = memory_db.db
+    version = current_config_version(db)
+
+    response = client.post("/config/batch-update", json=[{"config_key": "bulk.enabled", "config_value": "true"}])
+
+    assert response.json()["success_count"] == 1
+    assert current_config_version(db) == version
+
+
+def test_validators_shared_with_single_update(client):
+    response = client.put("/config/bulk.enabled", json={"config_value": "maybe"})
+
+    assert response.status_code == 400
+    assert "布尔值" in response.json()["detail"]
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
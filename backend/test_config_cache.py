@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""测试配置缓存：间隔内读取不查询数据库，版本号变化才重新加载，其他会话的修改可被发现"""
+
+import sys
+import os
+from contextlib import contextmanager
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import SystemConfig
+from app.services import config_service as config_module
+from app.services.config_service import config_service
+from app.services.config_version import current_config_version
+
+
+@pytest.fixture
+def config_db(memory_db):
+    """内存数据库中写入一项配置"""
+    memory_db.db.add(SystemConfig(config_key="queue_settings.waiting_area_size", config_value="10",
+                                  config_type="integer", category="queue_settings", is_active=True))
+    memory_db.db.commit()
+    return memory_db
+
+
+@contextmanager
+def check_every_read():
+    """每次读取都检查版本号"""
+    original = config_module.VERSION_CHECK_INTERVAL
+    config_module.VERSION_CHECK_INTERVAL = 0.0
+    try:
+        yield
+    finally:
+        config_module.VERSION_CHECK_INTERVAL = original
+
+
+def count_queries(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_hot_path_does_not_query(config_db):
+    engine, _, db = config_db
+
+    assert config_service.get_config("queue_settings.waiting_area_size", db=db) == 10
+    statements = count_queries(engine)
+    for _ in range(100):
+        assert config_service.get_config("queue_settings.waiting_area_size", db=db) == 10
+    assert statements == []
+
+
+def test_update_bumps_version_and_is_picked_up(config_db):
+    _, Session, db = config_db
+    version = current_config_version(db)
+
+    with check_every_read():
+        assert config_service.get_config("queue_settings.waiting_area_size", db=db) == 10
+
+        # 另一个会话（相当于另一个进程）修改配置，不调用 invalidate_cache
+        other = Session()
+        item = other.query(SystemConfig).filter(SystemConfig.config_key == "queue_settings.waiting_area_size").first()
+        item.config_value = "20"
+        other.commit()
+        other.close()
+
+        assert current_config_version(db) == version + 1
+        assert config_service.get_config("queue_settings.waiting_area_size", db=db) == 20
+
+
+def test_version_bumped_after_commit_only(config_db):
+    """写事务中不更新版本号行，提交后在独立事务中递增，回滚则不递增"""
+    engine, Session, db = config_db
+    version = current_config_version(db)
+
+    other = Session()
+    statements = count_queries(engine)
+    item = other.query(SystemConfig).filter(SystemConfig.config_key == "queue_settings.waiting_area_size").first()
+    item.config_value = "30"
+    other.flush()
+    assert not any("sequence_counters" in s for s in statements)
+    other.rollback()
+    assert current_config_version(other) == version
+
+    item.config_value = "30"
+    other.commit()
+    assert current_config_version(other) == version + 1
+    other.close()
+
+
+def test_unchanged_version_skips_reload(config_db):
+    engine, _, db = config_db
+
+    with check_every_read():
+        config_service.get_config("queue_settings.waiting_area_size", db=db)
+        statements = count_queries(engine)
+        config_service.get_config("queue_settings.waiting_area_size", db=db)
+    # 只读取版本号一行，不重新加载配置表
+    assert len(statements) == 1
+    assert "sequence_counters" in statements[0]
+
+
+def test_without_session_closes_connection(config_db, session_local):
+    engine = config_db.engine
+    checked_out = []
+    event.listen(engine, "checkout", lambda *args: checked_out.append(1))
+    event.listen(engine, "checkin", lambda *args: checked_out.pop())
+    assert config_service.get_config("queue_settings.waiting_area_size") == 10
+    # 临时会话用完即归还连接
+    assert checked_out == []
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
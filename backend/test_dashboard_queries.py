@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""测试管理端活跃队列接口：查询次数固定，不随队列长度增长"""
+
+import sys
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.api.api_v1.endpoints.admin import get_active_queues, get_charging_queue_with_vehicles
+
+
+def seed_queues(db, queue_count):
+    """写入 queue_count 条活跃队列及少量历史队列"""
+    piles = [ChargingPile(pile_number=f"F{i+1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                          status=ChargingPileStatus.CHARGING, is_active=True) for i in range(5)]
+    db.add_all(piles)
+    base = datetime(2024, 1, 1)
+    statuses = [QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING]
+    for n in range(queue_count + 10):
+        user = User(username=f"user{n}", email=f"user{n}@example.com", hashed_password="x")
+        vehicle = Vehicle(license_plate=f"PLATE-{n}", battery_capacity=60.0, owner=user)
+        db.add_all([user, vehicle])
+        db.flush()
+        status = statuses[n % 3] if n < queue_count else QueueStatus.COMPLETED
+        db.add(ChargingQueue(
+            queue_number=f"F{n + 1}", user_id=user.id, vehicle_id=vehicle.id, charging_mode=ChargingMode.FAST,
+            requested_amount=20.0, status=status, queue_time=base + timedelta(minutes=n),
+            charging_pile_id=None if status == QueueStatus.WAITING else piles[n % 5].id
+        ))
+    db.commit()
+    db.expunge_all()
+
+
+@contextmanager
+def count_queries(db, counter):
+    def before_execute(*args):
+        counter.append(1)
+    event.listen(db.bind, "before_cursor_execute", before_execute)
+    try:
+        yield
+    finally:
+        event.remove(db.bind, "before_cursor_execute", before_execute)
+
+
+def run_endpoint(db, endpoint, queue_count):
+    seed_queues(db, queue_count)
+    queries = []
+    with count_queries(db, queries):
+        result = endpoint(admin_user=None, db=db)
+    return result, len(queries)
+
+
+def test_active_queues_constant_queries(make_memory_db):
+    """/admin/queue/active 的查询次数与队列长度无关"""
+    small, small_queries = run_endpoint(make_memory_db().db, get_active_queues, 6)
+    large, large_queries = run_endpoint(make_memory_db().db, get_active_queues, 200)
+
+    assert len(small) == 4
+    assert len(large) == 133
+    assert all(row["user"]["username"].startswith("user") for row in large)
+    assert all(row["charging_pile"]["pile_number"] for row in large)
+    assert small_queries == large_queries <= 5
+
+
+def test_scene_queue_constant_queries(make_memory_db):
+    """/admin/scene/charging-queue 只返回活跃队列，查询次数与队列长度无关"""
+    small, small_queries = run_endpoint(make_memory_db().db, get_charging_queue_with_vehicles, 6)
+    large, large_queries = run_endpoint(make_memory_db().db, get_charging_queue_with_vehicles, 200)
+
+    assert len(small) == 6
+    assert len(large) == 200
+    assert all(row["vehicle"]["owner"]["username"].startswith("user") for row in large)
+    assert all(row["pile_id"] for row in large if row["status"] != "waiting")
+    assert small_queries == large_queries <= 5
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
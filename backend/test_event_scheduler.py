@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""测试事件驱动调度：事件总线投递与按充电模式合并调度"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.core.config import settings
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.services import event_bus
+from app.services.charging_service import ChargingScheduleService
+from app.services.completion_timer import ChargeCompletionTimer, charge_completion_timer
+from app.services.event_bus import StationEventBus, station_event_bus
+from app.services.system_scheduler import SystemScheduler
+
+
+def test_publish_from_worker_thread():
+    """请求线程中发布的事件被事件循环中的订阅者收到"""
+    bus = StationEventBus()
+
+    async def main():
+        received = []
+        done = asyncio.Event()
+
+        async def handler(event):
+            received.append(event)
+            done.set()
+
+        bus.attach(asyncio.get_running_loop())
+        bus.subscribe(handler)
+        await asyncio.to_thread(bus.publish, event_bus.PILE_FAULT, ChargingMode.FAST, pile_id=3)
+        await asyncio.wait_for(done.wait(), timeout=1)
+        return received
+
+    received = asyncio.run(main())
+    assert len(received) == 1
+    assert received[0].event_type == event_bus.PILE_FAULT
+    assert received[0].charging_mode == ChargingMode.FAST
+    assert received[0].pile_id == 3
+
+
+def test_publish_without_loop_is_noop():
+    """脚本中直接调用服务时没有事件循环，发布不报错"""
+    bus = StationEventBus()
+    bus.publish(event_bus.REQUEST_SUBMITTED, ChargingMode.TRICKLE, queue_id=1)
+
+
+def test_scheduler_only_touches_affected_mode():
+    """同一批事件合并为一次调度，且只调度受影响的充电模式"""
+    scheduler = SystemScheduler()
+    scheduler.is_leader = True
+    calls = []
+    scheduler.schedule_modes = lambda modes: calls.append(modes)
+
+    async def main():
+        scheduler.start_event_scheduler()
+        station_event_bus.publish(event_bus.CHARGING_COMPLETED, ChargingMode.FAST, pile_id=1)
+        station_event_bus.publish(event_bus.REQUEST_MODIFIED, ChargingMode.FAST, queue_id=2)
+        await asyncio.sleep(0.1)
+
+        station_event_bus.publish(event_bus.CHARGING_COMPLETED, ChargingMode.TRICKLE, pile_id=3)
+        await asyncio.sleep(0.1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        station_event_bus.detach()
+    assert calls == [[ChargingMode.FAST], [ChargingMode.TRICKLE]]
+
+
+def test_scheduler_skips_events_scheduled_inline():
+    """提交、取消和故障处理已在请求中调度过，调度器不再执行第二次调度"""
+    scheduler = SystemScheduler()
+    scheduler.is_leader = True
+    calls = []
+    scheduler.schedule_modes = lambda modes: calls.append(modes)
+
+    async def main():
+        scheduler.start_event_scheduler()
+        station_event_bus.publish(event_bus.REQUEST_SUBMITTED, ChargingMode.FAST, queue_id=1, scheduled=True)
+        station_event_bus.publish(event_bus.PILE_FAULT, ChargingMode.TRICKLE, pile_id=2, scheduled=True)
+        await asyncio.sleep(0.1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        station_event_bus.detach()
+    assert calls == []
+
+
+def test_cancel_schedules_only_its_mode(memory_db):
+    db = memory_db.db
+    user = User(username="cancel", email="cancel@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    vehicle = Vehicle(license_plate="CANCEL-1", battery_capacity=60.0, owner_id=user.id)
+    db.add(vehicle)
+    db.flush()
+    queue = ChargingQueue(queue_number="T1", user_id=user.id, vehicle_id=vehicle.id,
+                          charging_mode=ChargingMode.TRICKLE, requested_amount=10.0, status=QueueStatus.WAITING)
+    db.add(queue)
+    db.commit()
+
+    service = ChargingScheduleService(db)
+    scheduled = []
+    service.schedule_charging = lambda modes=None: scheduled.append(modes)
+    service.cancel_charging(queue.id)
+
+    assert scheduled == [[ChargingMode.TRICKLE]]
+    assert queue.status == QueueStatus.CANCELLED
+
+
+def test_follower_does_not_schedule():
+    """未持有调度租约的进程不执行调度"""
+    scheduler = SystemScheduler()
+    calls = []
+    scheduler.schedule_modes = lambda modes: calls.append(modes)
+
+    async def main():
+        scheduler.start_event_scheduler()
+        station_event_bus.publish(event_bus.CHARGING_COMPLETED, ChargingMode.FAST, pile_id=1)
+        await asyncio.sleep(0.1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        station_event_bus.detach()
+    assert calls == []
+
+
+def test_sync_not_starved_by_event_stream(monkeypatch):
+    """持续到达的事件不会推迟检查其他进程修改的间隔"""
+    monkeypatch.setattr(settings, "SYSTEM_SCHEDULER_POLL_INTERVAL", 0.05)
+    scheduler = SystemScheduler()
+    scheduler.is_leader = True
+    calls, syncs = [], []
+    scheduler.schedule_modes = lambda modes: calls.append(modes)
+    scheduler.sync_external_changes = lambda: syncs.append(1)
+
+    async def main():
+        scheduler.start_event_scheduler()
+        for _ in range(30):
+            station_event_bus.publish(event_bus.CHARGING_COMPLETED, ChargingMode.FAST, pile_id=1)
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(main())
+    finally:
+        station_event_bus.detach()
+    assert calls
+    assert syncs
+
+
+def test_leader_picks_up_follower_charging(session_local):
+    """非领导者在请求中就地调度，开始的充电只登记在它自己的定时器中；
+    领导者之后调度其他模式也不会掩盖这一修改，检查版本号时重建自己的定时器"""
+    db = session_local.db
+    user = User(username="follower", email="follower@example.com", hashed_password="x")
+    db.add_all([user, ChargingPile(pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                                   status=ChargingPileStatus.NORMAL, is_active=True)])
+    db.flush()
+    vehicle = Vehicle(license_plate="FOLLOWER-1", battery_capacity=60.0, owner_id=user.id)
+    db.add(vehicle)
+    db.commit()
+
+    leader = SystemScheduler()
+    leader.is_leader = True
+    leader.sync_external_changes()
+    assert len(charge_completion_timer) == 0
+
+    follower_timer = ChargeCompletionTimer()
+    follower = ChargingScheduleService(db, completion_timer=follower_timer)
+    follower.submit_charging_request(user.id, vehicle.id, ChargingMode.FAST, 30.0)
+    queue = db.query(ChargingQueue).one()
+    assert queue.status == QueueStatus.CHARGING
+    assert len(follower_timer) == 1
+
+    try:
+        leader.dispatch_pending([ChargingMode.TRICKLE], sync=False)
+        assert len(charge_completion_timer) == 0
+
+        leader.dispatch_pending([], sync=True)
+        assert len(charge_completion_timer) == 1
+        assert charge_completion_timer.next_due() == follower_timer.next_due()
+    finally:
+        charge_completion_timer.cancel(queue.id)
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""测试充电桩自动配置：一次计算全部修改、单事务提交、停用充电桩的排队车辆退回等候区"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import SystemConfig, User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.api.api_v1.endpoints import admin
+from app.services.config_service import config_service
+from app.services.pile_planner import PileTarget, plan_piles
+from app.services.snapshot_service import build_station_snapshot
+from app.services.state_stream import _load_rows
+from app.services.station_version import current_station_version
+
+
+@pytest.fixture
+def client(make_client):
+    """只挂载管理端路由的测试应用"""
+    return make_client(admin.router, "/admin", {admin.get_admin_user: lambda: None})
+
+
+def add_piles(db, fast_piles=2, trickle_piles=3):
+    for i in range(fast_piles):
+        db.add(ChargingPile(pile_number=f"F{i + 1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                            status=ChargingPileStatus.NORMAL, is_active=True))
+    for i in range(trickle_piles):
+        db.add(ChargingPile(pile_number=f"T{i + 1:02d}", charging_mode=ChargingMode.TRICKLE, power=10.0,
+                            status=ChargingPileStatus.NORMAL, is_active=True))
+    db.commit()
+
+
+def set_pile_config(db, fast_num, trickle_num, fast_power=30.0, trickle_power=10.0):
+    for key, value, config_type in [
+        ("fast_charging_pile_num", fast_num, "integer"),
+        ("trickle_charging_pile_num", trickle_num, "integer"),
+        ("fast_charging_power", fast_power, "float"),
+        ("trickle_charging_power", trickle_power, "float"),
+    ]:
+        config_key = f"charging_piles.{key}"
+        config = db.query(SystemConfig).filter(SystemConfig.config_key == config_key).first()
+        if config is None:
+            config = SystemConfig(config_key=config_key, config_type=config_type, category="charging_piles")
+            db.add(config)
+        config.config_value = str(value)
+    db.commit()
+    config_service.invalidate_cache()
+
+
+def active_piles(db, mode):
+    db.expire_all()
+    return [p.pile_number for p in db.query(ChargingPile).filter(
+        ChargingPile.charging_mode == mode, ChargingPile.is_active == True
+    ).order_by(ChargingPile.id).all()]
+
+
+def test_scale_up_in_one_transaction(client, memory_db):
+    """从 5 个充电桩扩容到 200 个：常数次查询、一次提交"""
+    engine, _, db = memory_db
+    add_piles(db)
+    set_pile_config(db, 100, 100)
+    version = current_station_version(db)
+
+    statements = []
+    counter = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", counter)
+    started = time.perf_counter()
+    response = client.post("/admin/piles/auto-configure")
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", counter)
+
+    assert response.status_code == 200
+    assert response.json()["final_status"] == {"fast_piles": 100, "trickle_piles": 100, "total_piles": 200}
+    assert len(active_piles(db, ChargingMode.FAST)) == 100
+    assert active_piles(db, ChargingMode.TRICKLE)[-1] == "T100"
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT INTO CHARGING_PILES")]
+    assert len(inserts) == 1
+    # 语句数与充电桩数量无关
+    assert len(statements) < 30
+    # 批量插入不经过 flush，充电站状态版本号仍然递增
+    assert current_station_version(db) > version
+    print(f"扩容到 200 个充电桩耗时: {elapsed * 1000:.1f} ms，{len(statements)} 条语句")
+
+
+def test_scale_down_requeues_and_keeps_charging_pile(client, memory_db):
+    """缩容时优先停用空闲的充电桩，其排队车辆退回等候区并重新调度；正在充电的充电桩保留"""
+    db = memory_db.db
+    add_piles(db, fast_piles=3, trickle_piles=0)
+    user = User(username="plan", email="plan@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    piles = db.query(ChargingPile).order_by(ChargingPile.id).all()
+
+    def add_queue(n, pile, status):
+        vehicle = Vehicle(license_plate=f"PLAN-{n}", battery_capacity=60.0, owner_id=user.id)
+        db.add(vehicle)
+        db.flush()
+        db.add(ChargingQueue(queue_number=f"F{n}", user_id=user.id, vehicle_id=vehicle.id,
+                             charging_mode=ChargingMode.FAST, requested_amount=10.0,
+                             status=status, charging_pile_id=pile.id))
+
+    # F03 正在充电；F02 只有排队车辆
+    add_queue(1, piles[2], QueueStatus.CHARGING)
+    add_queue(2, piles[1], QueueStatus.QUEUING)
+    piles[1].status = ChargingPileStatus.NORMAL
+    db.commit()
+    set_pile_config(db, 1, 0)
+
+    body = client.post("/admin/piles/auto-configure").json()
+
+    # 需要停用 2 个：F03 有车辆正在充电，停用空闲的 F02 和 F01
+    assert active_piles(db, ChargingMode.FAST) == ["F03"]
+    assert body["final_status"]["fast_piles"] == 1
+    assert "1 辆排队车辆退回等候区" in body["actions"]
+    # F02 上排队的车辆退回等候区后重新调度到 F03 排队
+    queue = db.query(ChargingQueue).filter(ChargingQueue.queue_number == "F2").first()
+    assert queue.charging_pile_id == piles[2].id
+    assert queue.status == QueueStatus.QUEUING
+    retired = db.get(ChargingPile, piles[1].id)
+    assert retired.status == ChargingPileStatus.RETIRED
+    # 按配置停用的充电桩不出现在充电桩列表中
+    listed = [p["pile_number"] for p in client.get("/admin/piles").json()]
+    assert listed == ["F03"]
+
+
+def test_retired_piles_hidden_from_snapshot_and_stream(client, memory_db):
+    """缩容停用的充电桩不出现在状态快照、推送状态和各桩队列中"""
+    db = memory_db.db
+    add_piles(db, fast_piles=2, trickle_piles=0)
+    set_pile_config(db, 1, 0)
+    client.post("/admin/piles/auto-configure")
+
+    db.expire_all()
+    retired = db.query(ChargingPile).filter(ChargingPile.status == ChargingPileStatus.RETIRED).one()
+    kept = active_piles(db, ChargingMode.FAST)
+
+    snapshot = build_station_snapshot(db, 0)
+    assert [pile["pile_number"] for pile in snapshot["piles"]] == kept
+    assert retired.id not in [row["pile_id"] for row in snapshot["pile_queues"]]
+    piles, _ = _load_rows(db)
+    assert retired.id not in piles and len(piles) == 1
+    assert retired.id not in [row["pile_id"] for row in client.get("/admin/queue/piles").json()]
+
+
+def test_plan_reuses_retired_piles_and_free_numbers():
+    piles = [
+        ChargingPile(id=1, pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                     status=ChargingPileStatus.NORMAL, is_active=True),
+        ChargingPile(id=2, pile_number="F02", charging_mode=ChargingMode.FAST, power=30.0,
+                     status=ChargingPileStatus.RETIRED, is_active=False),
+        ChargingPile(id=3, pile_number="F04", charging_mode=ChargingMode.FAST, power=25.0,
+                     status=ChargingPileStatus.NORMAL, is_active=True),
+    ]
+
+    plan = plan_piles(piles, [], {ChargingMode.FAST: PileTarget(5, 30.0)})
+
+    assert [p.pile_number for p in plan.reactivate] == ["F02"]
+    assert [number for number, _, _ in plan.create] == ["F03", "F05"]
+    assert [(p.pile_number, power) for p, power in plan.repower] == [("F04", 30.0)]
+    assert plan.retire == [] and plan.requeue == []
+
+
+def test_stopped_pile_is_not_reactivated(client, memory_db):
+    """管理员关闭维护中的充电桩后自动配置，不重新启用该充电桩而是新建"""
+    db = memory_db.db
+    add_piles(db, fast_piles=3, trickle_piles=0)
+    stopped = db.query(ChargingPile).filter(ChargingPile.pile_number == "F02").first()
+    assert client.post(f"/admin/piles/{stopped.id}/stop").status_code == 200
+    set_pile_config(db, 3, 0)
+
+    body = client.post("/admin/piles/auto-configure").json()
+
+    assert "重新启用快充桩 F02" not in body["actions"]
+    assert active_piles(db, ChargingMode.FAST) == ["F01", "F03", "F04"]
+    db.refresh(stopped)
+    assert stopped.status == ChargingPileStatus.OFFLINE and not stopped.is_active
+    # 手动关闭的充电桩仍在列表中，可由管理员重新启动
+    assert "F02" in [p["pile_number"] for p in client.get("/admin/piles").json()]
+
+
+def test_plan_blocks_piles_with_charging_vehicle():
+    piles = [
+        ChargingPile(id=i, pile_number=f"T{i:02d}", charging_mode=ChargingMode.TRICKLE, power=10.0,
+                     status=ChargingPileStatus.CHARGING, is_active=True)
+        for i in (1, 2)
+    ]
+    charging = ChargingQueue(id=1, charging_pile_id=2, status=QueueStatus.CHARGING)
+    queued = ChargingQueue(id=2, charging_pile_id=2, status=QueueStatus.QUEUING)
+
+    plan = plan_piles(piles, [charging, queued], {ChargingMode.TRICKLE: PileTarget(0, 10.0)})
+
+    assert [p.pile_number for p in plan.retire] == ["T01"]
+    assert [p.pile_number for p in plan.blocked] == ["T02"]
+    # 保留的充电桩上的排队车辆不受影响
+    assert plan.requeue == []
+    assert "无法停用慢充桩 T02：有车辆正在充电" in plan.actions()
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""测试充电桩日统计汇总：写详单时增量更新与回填重建结果一致，电价时段调整后重建结果不变"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import numpy as np
+from sqlalchemy import func, inspect, text
+
+from app.core.database import create_missing_columns
+from app.models import (ChargingPile, ChargingQueue, ChargingRecord, PileDailyStats, User, Vehicle,
+                        ChargingMode, ChargingPileStatus, QueueStatus)
+from app.services.billing_service import BillingEngine, PERIOD_AMOUNT_FIELDS, PERIOD_FEE_FIELDS, reprice_charging_records
+from app.services.charging_service import ChargingScheduleService
+from app.services.statistics_service import STAT_FIELDS, record_pile_stats, rebuild_pile_stats
+
+engine = BillingEngine(
+    peak_price=1.0, normal_price=0.7, valley_price=0.4, service_fee_price=0.8,
+    peak_ranges=[[10, 15], [18, 21]], normal_ranges=[[7, 10], [15, 18], [21, 23]]
+)
+
+
+def seed_station(db, piles=3):
+    user = User(username="stats", email="stats@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    vehicle = Vehicle(license_plate="STATS-1", battery_capacity=60.0, owner_id=user.id)
+    pile_rows = [ChargingPile(pile_number=f"F{i+1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                              status=ChargingPileStatus.NORMAL, is_active=True) for i in range(piles)]
+    db.add(vehicle)
+    db.add_all(pile_rows)
+    db.flush()
+    return user, vehicle, pile_rows
+
+
+def make_record(number, user, vehicle, pile, start, hours, billing=engine):
+    end = start + timedelta(hours=hours)
+    amount = pile.power * hours
+    return ChargingRecord(
+        record_number=f"CR{number:06d}", user_id=user.id, vehicle_id=vehicle.id, charging_pile_id=pile.id,
+        charging_amount=amount, charging_duration=hours, start_time=start, end_time=end,
+        **billing.calculate_batch([amount], [start], [end]).record_fields(0)
+    )
+
+
+def snapshot(db):
+    rows = db.query(PileDailyStats).order_by(
+        PileDailyStats.stat_date, PileDailyStats.charging_pile_id, PileDailyStats.time_period
+    ).all()
+    return [
+        (row.stat_date, row.charging_pile_id, row.time_period, row.charging_count,
+         *[getattr(row, field) for field in STAT_FIELDS])
+        for row in rows
+    ]
+
+
+def test_incremental_matches_rebuild(memory_db):
+    """逐条增量更新的汇总与回填重建完全一致，且总量等于详单合计"""
+    db = memory_db.db
+    user, vehicle, piles = seed_station(db)
+
+    rng = np.random.default_rng(3)
+    base = datetime(2024, 5, 1)
+    for n in range(300):
+        start = base + timedelta(minutes=int(rng.integers(0, 60 * 24 * 10)))
+        record = make_record(n, user, vehicle, piles[n % len(piles)], start, float(rng.uniform(0.1, 6.0)))
+        record_pile_stats(db, record)
+        db.add(record)
+    db.commit()
+
+    incremental = snapshot(db)
+    rebuild_pile_stats(db)
+    rebuilt = snapshot(db)
+
+    assert len(incremental) == len(rebuilt)
+    for left, right in zip(incremental, rebuilt):
+        assert left[:4] == right[:4]
+        assert np.allclose(left[4:], right[4:])
+
+    totals = db.query(func.sum(PileDailyStats.charging_count), func.sum(PileDailyStats.total_fee)).one()
+    record_totals = db.query(func.count(ChargingRecord.id), func.sum(ChargingRecord.total_fee)).one()
+    assert totals[0] == record_totals[0] == 300
+    assert abs(totals[1] - record_totals[1]) < 1e-6
+
+
+def test_session_split_across_periods(memory_db):
+    """9:30-10:30 的会话按时长平分到平时和峰时，次数计入主要时段"""
+    db = memory_db.db
+    user, vehicle, piles = seed_station(db, piles=1)
+    record = make_record(1, user, vehicle, piles[0], datetime(2024, 5, 1, 9, 30), 1.0)
+    record_pile_stats(db, record)
+    db.add(record)
+    db.commit()
+
+    stats = {row.time_period: row for row in db.query(PileDailyStats).all()}
+    assert set(stats) == {"峰时", "平时"}
+    assert abs(stats["峰时"].charging_amount - 15.0) < 1e-9
+    assert abs(stats["平时"].charging_amount - 15.0) < 1e-9
+    assert abs(stats["峰时"].electricity_fee - 15.0) < 1e-9
+    assert abs(stats["平时"].electricity_fee - 10.5) < 1e-9
+    assert stats["峰时"].charging_count + stats["平时"].charging_count == 1
+
+
+def test_rebuild_ignores_later_tariff_changes(memory_db):
+    """拆分随详单保存：之后调整电价时段，重建结果仍与写详单时的增量结果一致；重新计费后按新时段拆分"""
+    db = memory_db.db
+    user, vehicle, piles = seed_station(db, piles=1)
+    record = make_record(1, user, vehicle, piles[0], datetime(2024, 5, 1, 9, 30), 1.0)
+    record_pile_stats(db, record)
+    db.add(record)
+    db.commit()
+    incremental = snapshot(db)
+
+    # 全天改为谷时：重建读取详单上保存的拆分，不使用当前电价时段
+    all_valley = BillingEngine(peak_price=1.0, normal_price=0.7, valley_price=0.4, service_fee_price=0.8,
+                               peak_ranges=[], normal_ranges=[])
+    rebuild_pile_stats(db)
+    assert snapshot(db) == incremental
+
+    # 按新电价重新计费后，拆分和重建结果随之更新
+    reprice_charging_records(db, all_valley)
+    rebuild_pile_stats(db)
+    stats = db.query(PileDailyStats).one()
+    assert (stats.time_period, stats.charging_count) == ("谷时", 1)
+    assert abs(stats.electricity_fee - 12.0) < 1e-9
+
+
+def test_legacy_record_without_split(memory_db):
+    """旧数据库补建拆分字段，未保存拆分的详单整体计入其记录的主要时段"""
+    db_engine, _, db = memory_db
+    with db_engine.begin() as connection:
+        for field in PERIOD_AMOUNT_FIELDS + PERIOD_FEE_FIELDS:
+            connection.execute(text(f"ALTER TABLE charging_records DROP COLUMN {field}"))
+
+    added = create_missing_columns(db_engine)
+    assert added == [f"charging_records.{field}" for field in PERIOD_AMOUNT_FIELDS + PERIOD_FEE_FIELDS]
+    assert set(PERIOD_AMOUNT_FIELDS) <= {c["name"] for c in inspect(db_engine).get_columns("charging_records")}
+    assert create_missing_columns(db_engine) == []
+
+    user, vehicle, piles = seed_station(db, piles=1)
+    for n, period in enumerate(["normal", "谷时"]):
+        db.add(ChargingRecord(
+            record_number=f"CR{n:06d}", user_id=user.id, vehicle_id=vehicle.id, charging_pile_id=piles[0].id,
+            charging_amount=10.0, charging_duration=0.5, start_time=datetime(2024, 5, 1, 9, 30),
+            end_time=datetime(2024, 5, 1, 10), electricity_fee=7.0, service_fee=8.0, total_fee=15.0,
+            unit_price=0.7, time_period=period
+        ))
+    db.commit()
+    rebuild_pile_stats(db)
+
+    stats = {row.time_period: row for row in db.query(PileDailyStats).all()}
+    assert set(stats) == {"平时", "谷时"}
+    assert all(row.charging_count == 1 and abs(row.total_fee - 15.0) < 1e-9 for row in stats.values())
+
+
+def test_complete_charging_updates_stats(memory_db):
+    """完成充电生成详单时同一事务内更新日统计"""
+    db = memory_db.db
+    user, vehicle, piles = seed_station(db, piles=1)
+    queue = ChargingQueue(
+        queue_number="F1", user_id=user.id, vehicle_id=vehicle.id, charging_mode=ChargingMode.FAST,
+        requested_amount=10.0, status=QueueStatus.CHARGING, charging_pile_id=piles[0].id,
+        start_charging_time=datetime.now() - timedelta(minutes=10)
+    )
+    db.add(queue)
+    db.commit()
+
+    record = ChargingScheduleService(db).complete_charging(queue.id)
+
+    totals = db.query(func.sum(PileDailyStats.charging_count), func.sum(PileDailyStats.charging_amount)).one()
+    assert totals[0] == 1
+    assert abs(totals[1] - record.charging_amount) < 1e-9
+    assert abs(sum(getattr(record, field) for field in PERIOD_AMOUNT_FIELDS) - record.charging_amount) < 1e-9
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""测试热点查询的执行计划：每条查询都必须走索引，不能退化为全表扫描"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import func, text
+
+from app.models import ChargingQueue, ChargingRecord, ChargingMode, QueueStatus
+
+ACTIVE_STATUSES = [QueueStatus.WAITING, QueueStatus.QUEUING, QueueStatus.CHARGING]
+
+
+def seed_history(db):
+    """写入一批历史队列记录"""
+    base = datetime(2024, 1, 1)
+    statuses = [QueueStatus.COMPLETED] * 8 + [QueueStatus.CANCELLED] + ACTIVE_STATUSES
+    db.bulk_insert_mappings(ChargingQueue, [
+        {
+            "queue_number": f"Q{n}", "user_id": n % 50 + 1, "vehicle_id": n % 200 + 1,
+            "charging_mode": ChargingMode.FAST if n % 2 else ChargingMode.TRICKLE,
+            "requested_amount": 20.0, "status": statuses[n % len(statuses)],
+            "charging_pile_id": n % 5 + 1, "queue_time": base + timedelta(minutes=n),
+        }
+        for n in range(5000)
+    ])
+    db.commit()
+
+
+def explain(db, query):
+    """返回查询计划的各个步骤"""
+    sql = query.statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [row[-1] for row in rows]
+
+
+def assert_indexed(db, query, index_name, table="charging_queues"):
+    plan = explain(db, query)
+    steps = [step for step in plan if table in step]
+    assert steps, plan
+    for step in steps:
+        # SCAN（含 SCAN ... USING INDEX）意味着遍历整张表或整个索引
+        assert step.startswith("SEARCH"), plan
+        assert index_name in step, plan
+    return plan
+
+
+def test_pile_queue_queries(memory_db):
+    """按充电桩查询排队/充电中的车辆"""
+    db = memory_db.db
+    seed_history(db)
+    assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.charging_pile_id == 1,
+        ChargingQueue.status == QueueStatus.CHARGING
+    ), "ix_charging_queues_pile_status")
+    assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.charging_pile_id == 1,
+        ChargingQueue.status.in_([QueueStatus.QUEUING, QueueStatus.CHARGING])
+    ), "ix_charging_queues_pile_status")
+
+    # 取下一辆排队车辆不需要额外排序
+    plan = assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.charging_pile_id == 1,
+        ChargingQueue.status == QueueStatus.QUEUING
+    ).order_by(ChargingQueue.queue_time).limit(1), "ix_charging_queues_pile_status")
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_mode_queue_queries(memory_db):
+    """调度按模式查询等候区和活跃队列"""
+    db = memory_db.db
+    seed_history(db)
+    plan = assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.charging_mode == ChargingMode.FAST,
+        ChargingQueue.status == QueueStatus.WAITING
+    ).order_by(ChargingQueue.queue_time), "ix_charging_queues_mode_status")
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+    assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.charging_mode.in_([ChargingMode.FAST, ChargingMode.TRICKLE]),
+        ChargingQueue.status.in_(ACTIVE_STATUSES)
+    ).order_by(ChargingQueue.queue_time, ChargingQueue.id), "ix_charging_queues_mode_status")
+
+
+def test_vehicle_queue_queries(memory_db):
+    """车辆是否有活跃的充电请求"""
+    db = memory_db.db
+    seed_history(db)
+    assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.vehicle_id == 7,
+        ChargingQueue.status.in_(ACTIVE_STATUSES)
+    ), "ix_charging_queues_vehicle_status")
+    assert_indexed(db, db.query(ChargingQueue).filter(
+        ChargingQueue.vehicle_id == 7,
+        ChargingQueue.status == QueueStatus.CHARGING
+    ), "ix_charging_queues_vehicle_status")
+
+
+def test_last_charging_time_query(memory_db):
+    """各车辆最后一次充电时间只查索引，不扫描详单表"""
+    db = memory_db.db
+    seed_history(db)
+    assert_indexed(db, db.query(
+        ChargingRecord.vehicle_id, func.max(ChargingRecord.end_time)
+    ).filter(
+        ChargingRecord.vehicle_id.in_([1, 2, 3])
+    ).group_by(ChargingRecord.vehicle_id), "ix_charging_records_vehicle_end", table="charging_records")
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
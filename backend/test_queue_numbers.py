@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""测试排队号码分配：按数值递增、并发取号不重复不跳号、事务回滚不占号"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import ChargingQueue, ChargingMode, QueueStatus
+from app.services.charging_service import ChargingScheduleService
+
+
+def add_queue(db, queue_number, charging_mode=ChargingMode.FAST):
+    db.add(ChargingQueue(queue_number=queue_number, user_id=1, vehicle_id=1, charging_mode=charging_mode,
+                         requested_amount=10.0, status=QueueStatus.COMPLETED))
+
+
+def test_continues_after_existing_numbers(memory_db):
+    """已有 F9、F10 时从 F11 继续（不再按字符串比较把 F9 当作最大号）"""
+    db = memory_db.db
+    for number in ("F1", "F9", "F10", "T3"):
+        add_queue(db, number, ChargingMode.FAST if number[0] == "F" else ChargingMode.TRICKLE)
+    db.commit()
+
+    service = ChargingScheduleService(db)
+    assert service.generate_queue_number(ChargingMode.FAST) == "F11"
+    assert service.generate_queue_number(ChargingMode.FAST) == "F12"
+    assert service.generate_queue_number(ChargingMode.TRICKLE) == "T4"
+
+
+def test_rollback_does_not_consume_number(memory_db):
+    """提交请求失败回滚时号码随之回滚，不产生空号"""
+    db = memory_db.db
+    service = ChargingScheduleService(db)
+    assert service.generate_queue_number(ChargingMode.FAST) == "F1"
+    db.rollback()
+    assert service.generate_queue_number(ChargingMode.FAST) == "F1"
+    db.commit()
+    assert service.generate_queue_number(ChargingMode.FAST) == "F2"
+
+
+def test_concurrent_submits_get_unique_numbers():
+    """多个线程各自用独立会话同时取号并写入排队记录，号码连续且不重复"""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/queue.db",
+                               connect_args={"check_same_thread": False, "timeout": 30})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        threads_count, per_thread = 8, 25
+        numbers, errors = [], []
+
+        def worker():
+            db = Session()
+            try:
+                service = ChargingScheduleService(db)
+                for _ in range(per_thread):
+                    number = service.generate_queue_number(ChargingMode.FAST)
+                    add_queue(db, number)
+                    db.commit()
+                    numbers.append(number)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    assert not errors, errors
+    total = threads_count * per_thread
+    assert sorted(numbers, key=lambda n: int(n[1:])) == [f"F{i}" for i in range(1, total + 1)]
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""测试排队位置索引：二分查找定位、版本号变化时重建、锁外查询、/users/queue/status 查询次数固定、索引未命中时逐条统计"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.services import queue_index
+from app.services.queue_index import QueuePositionIndex, queue_position_index, query_position
+from app.api.api_v1.endpoints.users import get_user_queue_status
+
+
+def seed(db, per_pile=4, waiting=6):
+    """两个快充桩各 per_pile 辆车（第一辆充电中），快充等候区 waiting 辆车，每辆车属于不同用户"""
+    piles = [ChargingPile(pile_number=f"F{i + 1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                          status=ChargingPileStatus.CHARGING, is_active=True) for i in range(2)]
+    db.add_all(piles)
+    db.flush()
+
+    base = datetime(2024, 1, 1)
+    users, n = [], 0
+    layout = [(pile.id, QueueStatus.CHARGING if k == 0 else QueueStatus.QUEUING)
+              for pile in piles for k in range(per_pile)] + [(None, QueueStatus.WAITING)] * waiting
+    for pile_id, status in layout:
+        user = User(username=f"user{n}", email=f"user{n}@example.com", hashed_password="x")
+        vehicle = Vehicle(license_plate=f"PLATE-{n}", battery_capacity=60.0, owner=user)
+        db.add_all([user, vehicle])
+        db.flush()
+        db.add(ChargingQueue(queue_number=f"F{n + 1}", user_id=user.id, vehicle_id=vehicle.id,
+                             charging_mode=ChargingMode.FAST, requested_amount=10.0, status=status,
+                             charging_pile_id=pile_id, queue_time=base + timedelta(minutes=n)))
+        users.append(user)
+        n += 1
+    db.commit()
+    return piles, users
+
+
+def test_positions_per_pile_and_waiting_area(memory_db):
+    """按桩和按模式等候区分别排序，位置为二分查找结果"""
+    db = memory_db.db
+    seed(db)
+    index = QueuePositionIndex()
+    index.refresh(db)
+
+    queues = db.query(ChargingQueue).order_by(ChargingQueue.id).all()
+    positions = [index.position(queue.id) for queue in queues]
+    assert positions == [(1, 4), (2, 4), (3, 4), (4, 4)] * 2 + [(k, 6) for k in range(1, 7)]
+    assert index.position(999) is None
+
+
+def test_rebuild_only_when_version_changes(memory_db):
+    """版本号不变时不重新加载，状态变化后重建"""
+    db = memory_db.db
+    seed(db)
+    index = QueuePositionIndex()
+    index.refresh(db)
+
+    queries = []
+    counter = lambda *args: queries.append(1)
+    event.listen(db.bind, "before_cursor_execute", counter)
+    index.refresh(db)
+    event.remove(db.bind, "before_cursor_execute", counter)
+    assert len(queries) == 1
+
+    # 第一辆等候车辆取消后，后面的车辆前移
+    waiting = db.query(ChargingQueue).filter(ChargingQueue.status == QueueStatus.WAITING).order_by(
+        ChargingQueue.queue_time).all()
+    waiting[0].status = QueueStatus.CANCELLED
+    db.commit()
+    index.refresh(db)
+    assert index.position(waiting[0].id) is None
+    assert index.position(waiting[1].id) == (1, 5)
+
+
+def test_refresh_queries_outside_lock(memory_db):
+    """查询数据库时不持有索引锁，较旧版本的重建结果不覆盖较新的索引"""
+    db = memory_db.db
+    seed(db)
+    index = QueuePositionIndex()
+
+    held = []
+    check = lambda *args: held.append(index._lock.locked())
+    event.listen(db.bind, "before_cursor_execute", check)
+    index.refresh(db)
+    event.remove(db.bind, "before_cursor_execute", check)
+    assert held == [False, False]
+
+    version = index.version
+    queue_id = next(iter(index._entries))
+    index.rebuild([], version - 1)
+    assert index.version == version
+    assert index.position(queue_id) is not None
+
+
+def count_status_queries(db, user):
+    queries = []
+    counter = lambda *args: queries.append(1)
+    event.listen(db.bind, "before_cursor_execute", counter)
+    result = get_user_queue_status(current_user=user, db=db)
+    event.remove(db.bind, "before_cursor_execute", counter)
+    return result, len(queries)
+
+
+def test_queue_status_constant_queries(make_memory_db, monkeypatch):
+    """/users/queue/status 的查询次数与队列长度无关，结果与原逐条 COUNT 的规则一致"""
+    monkeypatch.setattr(queue_index, "VERSION_CHECK_INTERVAL", 60.0)
+
+    def run(per_pile, waiting):
+        db = make_memory_db().db
+        _, users = seed(db, per_pile, waiting)
+        queue_position_index.refresh(db, force=True)
+        for user in users:
+            db.refresh(user)
+
+        results, counts = [], []
+        for user in users:
+            result, count = count_status_queries(db, user)
+            results.append(result)
+            counts.append(count)
+        return results, max(counts)
+
+    small, small_queries = run(3, 4)
+    large, large_queries = run(40, 60)
+
+    # 检查间隔内不读版本号：用户队列、充电桩各一次
+    assert small_queries == large_queries == 2
+    last_waiting = large[-1][0]
+    assert (last_waiting.position, last_waiting.total_in_queue, last_waiting.estimated_time) == (60, 60, 59 * 30)
+    second_on_pile = large[1][0]
+    assert (second_on_pile.position, second_on_pile.total_in_queue) == (2, 40)
+    assert second_on_pile.pile_name == "fast充电桩-F01"
+
+
+def test_queue_status_checks_version_after_interval(memory_db, monkeypatch):
+    """超过检查间隔后读取一次版本号，版本变化时重建索引"""
+    db = memory_db.db
+    _, users = seed(db)
+    queue_position_index.refresh(db, force=True)
+
+    db.refresh(users[0])
+    monkeypatch.setattr(queue_index, "VERSION_CHECK_INTERVAL", 0.0)
+    _, queries = count_status_queries(db, users[0])
+    # 版本号、用户队列、充电桩各一次
+    assert queries == 3
+
+    waiting = db.query(ChargingQueue).filter(ChargingQueue.status == QueueStatus.WAITING).order_by(
+        ChargingQueue.queue_time).all()
+    waiting[0].status = QueueStatus.CANCELLED
+    db.commit()
+    result, _ = count_status_queries(db, waiting[1].user)
+    assert (result[0].position, result[0].total_in_queue) == (1, 5)
+
+
+def test_queue_status_falls_back_on_index_miss(memory_db, monkeypatch):
+    """检查间隔内新提交或已移入充电桩的队列不在索引的对应分组中，按原 COUNT 规则统计而不是返回假位置"""
+    monkeypatch.setattr(queue_index, "VERSION_CHECK_INTERVAL", 60.0)
+    db = memory_db.db
+    piles, users = seed(db)
+    queue_position_index.refresh(db, force=True)
+
+    # 新提交的车辆排在等候区末尾
+    vehicle = users[-1].vehicles[0]
+    db.add(ChargingQueue(queue_number="F99", user_id=users[-1].id, vehicle_id=vehicle.id,
+                         charging_mode=ChargingMode.FAST, requested_amount=10.0, status=QueueStatus.WAITING,
+                         queue_time=datetime(2024, 1, 2)))
+    # 等候区第一辆车移入第二个充电桩的排队区末尾
+    moved = db.query(ChargingQueue).filter(ChargingQueue.status == QueueStatus.WAITING).order_by(
+        ChargingQueue.queue_time).first()
+    moved.status, moved.charging_pile_id = QueueStatus.QUEUING, piles[1].id
+    db.commit()
+
+    new_status = {row.id: row for row in get_user_queue_status(current_user=users[-1], db=db)}
+    new_queue = db.query(ChargingQueue).filter(ChargingQueue.queue_number == "F99").one()
+    assert (new_status[new_queue.id].position, new_status[new_queue.id].total_in_queue) == (6, 6)
+    assert query_position(db, new_queue) == (6, 6)
+
+    moved_status = get_user_queue_status(current_user=moved.user, db=db)[0]
+    assert (moved_status.position, moved_status.total_in_queue) == (5, 5)
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
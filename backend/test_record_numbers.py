@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""测试详单编号生成：按日序列取号，同一秒内完成的会话编号也不重复"""
+
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.models import ChargingRecord
+from app.services.charging_service import ChargingScheduleService
+
+
+def add_record(db, record_number):
+    now = datetime.now()
+    db.add(ChargingRecord(
+        record_number=record_number, user_id=1, vehicle_id=1, charging_pile_id=1,
+        charging_amount=10.0, charging_duration=0.5, start_time=now, end_time=now,
+        electricity_fee=7.0, service_fee=8.0, total_fee=15.0, unit_price=0.7, time_period="平时",
+        created_at=now
+    ))
+
+
+def test_numbers_unique_within_same_second(memory_db):
+    """同一秒内连续生成的详单编号各不相同且按序递增"""
+    db = memory_db.db
+    service = ChargingScheduleService(db)
+    numbers = []
+    for _ in range(500):
+        number = service.generate_record_number()
+        add_record(db, number)
+        numbers.append(number)
+    db.commit()
+
+    assert len(set(numbers)) == 500
+    assert [int(n[-4:]) for n in numbers] == list(range(1, 501))
+
+
+def test_continues_after_existing_records_today(memory_db):
+    """升级当天已有详单时，序列接着当天的详单数量继续"""
+    db = memory_db.db
+    for n in range(3):
+        add_record(db, f"CR{datetime.now():%Y%m%d%H%M%S}{n + 1:04d}")
+    db.commit()
+
+    number = ChargingScheduleService(db).generate_record_number()
+    assert number.endswith("0004")
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
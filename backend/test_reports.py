@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""测试报表统计：基于充电桩日统计汇总、月末日期边界、周/月/任意范围报表"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event, inspect, text
+
+from app.core.database import create_missing_indexes
+from app.models import ChargingPile, ChargingRecord, User, Vehicle, ChargingMode, ChargingPileStatus
+from app.services.statistics_service import rebuild_pile_stats
+from app.api.api_v1.endpoints.admin import get_daily_report, get_weekly_report, get_monthly_report, get_range_report
+
+
+def seed_records(db, piles, days, per_day, first_day):
+    """在 first_day 起的 days 天内，每天为每个充电桩生成 per_day 条记录"""
+    user = User(username="report", email="report@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    vehicle = Vehicle(license_plate="REPORT-1", battery_capacity=60.0, owner_id=user.id)
+    db.add(vehicle)
+    pile_rows = [ChargingPile(pile_number=f"F{i+1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                              status=ChargingPileStatus.NORMAL, is_active=True) for i in range(piles)]
+    db.add_all(pile_rows)
+    db.flush()
+
+    mappings = []
+    for day in range(days):
+        for pile in pile_rows:
+            for n in range(per_day):
+                created = first_day + timedelta(days=day, hours=n % 24, minutes=n)
+                mappings.append({
+                    "record_number": f"CR{day:03d}{pile.id:03d}{n:04d}",
+                    "user_id": user.id, "vehicle_id": vehicle.id, "charging_pile_id": pile.id,
+                    "charging_amount": 10.0, "charging_duration": 0.5,
+                    "start_time": created - timedelta(minutes=30), "end_time": created,
+                    "electricity_fee": 7.0, "service_fee": 8.0, "total_fee": 15.0,
+                    "unit_price": 0.7, "time_period": "平时", "created_at": created,
+                })
+    db.bulk_insert_mappings(ChargingRecord, mappings)
+    db.commit()
+    rebuild_pile_stats(db)
+
+
+def test_daily_report_at_month_end(memory_db):
+    """月末日期不再因 day + 1 越界报错，且只统计当天"""
+    db = memory_db.db
+    seed_records(db, piles=2, days=2, per_day=3, first_day=datetime(2024, 1, 31))
+
+    report = get_daily_report(date="2024-01-31", admin_user=None, db=db)
+    assert [row["pile_number"] for row in report] == ["F01", "F02"]
+    assert all(row["charging_count"] == 3 for row in report)
+    assert abs(report[0]["total_fee"] - 45.0) < 1e-9
+    assert report[0]["time_period"] == "2024-01-31"
+
+
+def test_weekly_monthly_and_range_reports(memory_db):
+    """周报按周一开始的自然周，月报按自然月，范围报表含首尾两天"""
+    db = memory_db.db
+    seed_records(db, piles=1, days=40, per_day=1, first_day=datetime(2024, 1, 1))
+
+    weekly = get_weekly_report(date="2024-01-10", admin_user=None, db=db)
+    assert weekly[0]["charging_count"] == 7
+    assert weekly[0]["time_period"] == "2024-01-08~2024-01-14"
+
+    monthly = get_monthly_report(month="2024-02", admin_user=None, db=db)
+    assert monthly[0]["charging_count"] == 9
+
+    ranged = get_range_report(start_date="2024-01-30", end_date="2024-02-02", admin_user=None, db=db)
+    assert ranged[0]["charging_count"] == 4
+
+
+def test_monthly_report_reads_daily_stats_only(memory_db):
+    """一个月 100 桩 × 每桩每天 5 条记录，月报只执行一条读取日统计的查询，不扫描充电记录表
+    （耗时见 benchmark_monthly_report.py）"""
+    db = memory_db.db
+    seed_records(db, piles=100, days=30, per_day=5, first_day=datetime(2024, 6, 1))
+
+    statements = []
+    counter = lambda *args: statements.append(args[2])
+    event.listen(db.bind, "before_cursor_execute", counter)
+    report = get_monthly_report(month="2024-06", admin_user=None, db=db)
+    event.remove(db.bind, "before_cursor_execute", counter)
+
+    assert len(report) == 100
+    assert all(row["charging_count"] == 150 for row in report)
+    assert len(statements) == 1
+    assert "pile_daily_stats" in statements[0]
+    assert "charging_records" not in statements[0]
+
+
+def test_created_at_index_added_to_existing_database(memory_db):
+    """已有数据库在启动时补建 charging_records.created_at 索引（详单编号当日首次取号按创建时间计数）"""
+    engine = memory_db.engine
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_charging_records_created_at"))
+
+    create_missing_indexes(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("charging_records")}
+    assert "ix_charging_records_created_at" in names
+    assert "ix_charging_records_vehicle_end" in names
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
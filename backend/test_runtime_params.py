@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""测试运行参数快照：/config 中的排队位数和电价用于调度和计费，配置版本不变时复用同一快照"""
+
+import sys
+import os
+import json
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.core.config import settings
+from app.models import SystemConfig, ChargingPile, ChargingQueue, User, Vehicle, ChargingMode, QueueStatus, ChargingPileStatus
+from app.services.charging_service import ChargingScheduleService
+from app.services.config_service import config_service
+from app.services.runtime_params import RuntimeParams
+
+
+def set_config(db, key, value, config_type):
+    category = key.split(".")[0]
+    db.add(SystemConfig(config_key=key, config_value=value, config_type=config_type, category=category, is_active=True))
+    db.commit()
+    # 与 /config 接口一致：修改后让本进程立即重新加载
+    config_service.invalidate_cache()
+
+
+def test_defaults_follow_yaml_settings():
+    params = RuntimeParams.from_config({}, settings)
+    assert params.waiting_area_size == settings.WAITING_AREA_SIZE
+    assert params.charging_queue_len == settings.CHARGING_QUEUE_LEN
+    assert params.fast_charging_power == settings.FAST_CHARGING_POWER
+    assert list(params.billing.period_prices) == [
+        settings.PEAK_TIME_PRICE, settings.NORMAL_TIME_PRICE, settings.VALLEY_TIME_PRICE
+    ]
+
+
+def test_snapshot_reused_until_config_changes(memory_db):
+    db = memory_db.db
+    first = config_service.get_runtime_params(db)
+    assert config_service.get_runtime_params(db) is first
+
+    set_config(db, "queue_settings.charging_queue_len", "1", "integer")
+    second = config_service.get_runtime_params(db)
+    assert second is not first
+    assert second.charging_queue_len == 1
+
+
+def test_scheduling_uses_configured_queue_length(memory_db):
+    db = memory_db.db
+    set_config(db, "queue_settings.charging_queue_len", "1", "integer")
+
+    user = User(username="params", email="params@example.com", hashed_password="x")
+    pile = ChargingPile(pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                        status=ChargingPileStatus.NORMAL, is_active=True)
+    db.add_all([user, pile])
+    db.flush()
+    for i in range(3):
+        vehicle = Vehicle(license_plate=f"P-{i}", battery_capacity=60.0, owner_id=user.id)
+        db.add(vehicle)
+        db.flush()
+        db.add(ChargingQueue(queue_number=f"F{i + 1}", user_id=user.id, vehicle_id=vehicle.id,
+                             charging_mode=ChargingMode.FAST, requested_amount=10.0, status=QueueStatus.WAITING))
+    db.commit()
+
+    ChargingScheduleService(db).schedule_charging()
+
+    # 排队位只有1个：一辆进入排队区后开始充电，其余留在等候区
+    statuses = sorted(q.status.value for q in db.query(ChargingQueue).all())
+    assert statuses == sorted([QueueStatus.CHARGING.value, QueueStatus.WAITING.value, QueueStatus.WAITING.value])
+
+
+def test_billing_uses_configured_prices(memory_db):
+    db = memory_db.db
+    set_config(db, "billing.prices", json.dumps({
+        "peak_time_price": 2.0, "normal_time_price": 1.0, "valley_time_price": 0.5, "service_fee_price": 0.1
+    }), "json")
+
+    # 谷时 (1:00 - 2:00) 充电 10 度
+    electricity, service, total, unit_price, period = ChargingScheduleService(db).calculate_fees(
+        10.0, datetime(2024, 1, 1, 1), datetime(2024, 1, 1, 2)
+    )
+    assert abs(electricity - 5.0) < 1e-9
+    assert abs(service - 1.0) < 1e-9
+    assert unit_price == 0.5
+    assert period == "谷时"
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""测试调度租约：同一时刻只有一个持有者、持有者续约、过期后由其他进程接管、主动释放"""
+
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import SchedulerLease
+from app.services.lease_service import Lease
+
+
+def test_single_holder(memory_db):
+    """第一个进程获得租约，租约有效期内其他进程获取失败"""
+    db = memory_db.db
+    now = datetime(2024, 1, 1, 8, 0)
+    first = Lease("scheduler", 15, holder="worker-1")
+    second = Lease("scheduler", 15, holder="worker-2")
+
+    assert first.acquire(db, now)
+    assert not second.acquire(db, now + timedelta(seconds=5))
+    assert db.get(SchedulerLease, "scheduler").holder == "worker-1"
+
+
+def test_renew_extends_expiry(memory_db):
+    """持有者续约后有效期顺延，其他进程在原过期时间后仍无法获取"""
+    db = memory_db.db
+    now = datetime(2024, 1, 1, 8, 0)
+    first = Lease("scheduler", 15, holder="worker-1")
+    second = Lease("scheduler", 15, holder="worker-2")
+
+    assert first.acquire(db, now)
+    assert first.acquire(db, now + timedelta(seconds=10))
+    assert not second.acquire(db, now + timedelta(seconds=20))
+
+    lease = db.get(SchedulerLease, "scheduler")
+    db.refresh(lease)
+    assert lease.expires_at == now + timedelta(seconds=25)
+
+
+def test_takeover_after_expiry(memory_db):
+    """持有者停止续约，租约过期后由其他进程接管，原持有者随即失去租约"""
+    db = memory_db.db
+    now = datetime(2024, 1, 1, 8, 0)
+    first = Lease("scheduler", 15, holder="worker-1")
+    second = Lease("scheduler", 15, holder="worker-2")
+
+    assert first.acquire(db, now)
+    assert second.acquire(db, now + timedelta(seconds=16))
+    assert not first.acquire(db, now + timedelta(seconds=17))
+
+
+def test_release_allows_immediate_takeover(memory_db):
+    """主动释放后其他进程无需等待过期"""
+    db = memory_db.db
+    now = datetime(2024, 1, 1, 8, 0)
+    first = Lease("scheduler", 15, holder="worker-1")
+    second = Lease("scheduler", 15, holder="worker-2")
+
+    assert first.acquire(db, now)
+    first.release(db, now + timedelta(seconds=1))
+    assert second.acquire(db, now + timedelta(seconds=2))
+
+
+def test_concurrent_acquire_single_winner():
+    """多个进程同时争抢（各自独立连接），只有一个获得租约"""
+    path = os.path.join(tempfile.mkdtemp(), "lease.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker(index):
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            results.append(Lease("scheduler", 15, holder=f"worker-{index}").acquire(db))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
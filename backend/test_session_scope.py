@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""测试后台任务会话：正常结束提交、出错回滚、用完关闭；调度器不持有长生命周期会话"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app.core.database import session_scope
+from app.models import User
+from app.services.system_scheduler import SystemScheduler
+
+
+def test_commit_rollback_and_close(session_local):
+    with session_scope() as db:
+        db.add(User(username="kept", email="kept@example.com", hashed_password="x"))
+    assert not db.in_transaction()
+
+    try:
+        with session_scope() as db:
+            db.add(User(username="dropped", email="dropped@example.com", hashed_password="x"))
+            db.flush()
+            raise RuntimeError("失败")
+    except RuntimeError:
+        pass
+
+    with session_scope() as db:
+        assert [u.username for u in db.query(User).all()] == ["kept"]
+
+
+def test_scheduler_holds_no_session(session_local):
+    """调度器的每个步骤都使用独立会话，实例上不保留会话"""
+    scheduler = SystemScheduler()
+    scheduler.recover_system_state()
+    scheduler.periodic_tick()
+    assert not hasattr(scheduler, "db")
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""测试充电站仿真：内存引擎与完整调度服务结果一致、结果可复现、一个月 100 个充电桩的内存仿真不访问数据库、故障充电桩保持故障"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingRecord, ChargingMode, ChargingPileStatus, QueueStatus
+import pytest
+
+from app.services.charging_service import ChargingScheduleService
+from app.services.completion_timer import charge_completion_timer
+from app.services.runtime_params import RuntimeParams
+from app.services.simulation import SimulationConfig, StationSimulator, create_simulator
+
+
+def small_config(**overrides):
+    values = dict(days=0.5, fast_piles=4, trickle_piles=4, waiting_area_size=20, charging_queue_len=2,
+                  arrival_rate=30.0, fault_rate=2.0, repair_hours=1.0)
+    values.update(overrides)
+    return SimulationConfig.from_settings(settings, **values)
+
+
+def without_timing(report):
+    return report._replace(wall_seconds=0.0)
+
+
+def test_memory_engine_matches_schedule_service():
+    """相同参数和种子下，内存引擎与内存 SQLite 上的完整调度服务得到相同的报告（含故障和两种重新调度策略）"""
+    for strategy in ["priority", "time_order"]:
+        config = small_config(fault_strategy=strategy)
+        memory = create_simulator(config, settings, "memory").run()
+        database = create_simulator(config, settings, "sqlite").run()
+
+        assert memory.faults > 0 and memory.rejected > 0
+        assert without_timing(memory) == without_timing(database)
+
+
+def test_report_is_reproducible_and_consistent():
+    config = small_config(days=2.0)
+    report = create_simulator(config, settings).run()
+
+    assert without_timing(create_simulator(config, settings).run()) == without_timing(report)
+    assert without_timing(create_simulator(config._replace(seed=7), settings).run()) != without_timing(report)
+
+    assert 0 < report.completed <= report.arrivals - report.rejected + report.faults
+    assert report.throughput_per_day == report.completed / config.days
+    wait = report.wait_minutes
+    assert 0 <= wait["p50"] <= wait["p90"] <= wait["p99"] <= wait["max"]
+    assert all(0 < value <= 1 for value in report.utilisation.values())
+    assert report.energy > 0 and report.revenue > 0
+
+
+def test_month_of_100_piles_without_database():
+    """内存引擎不执行 SQL，事件数与到达、完成和故障次数成正比（耗时见 simulate_station.py 的输出）"""
+    config = SimulationConfig.from_settings(settings, days=30, fast_piles=50, trickle_piles=50,
+                                            waiting_area_size=200, arrival_rate=45.0, fault_rate=0.1)
+    statements = []
+    counter = lambda *args: statements.append(args[2])
+    event.listen(Engine, "before_cursor_execute", counter)
+    try:
+        report = create_simulator(config, settings).run()
+    finally:
+        event.remove(Engine, "before_cursor_execute", counter)
+
+    assert report.arrivals > 30000
+    assert report.faults > 0
+    assert statements == []
+    # 每个事件是一次到达、一批充电完成、一次故障或一次修复
+    assert report.events <= report.arrivals + report.completed + 2 * report.faults
+
+
+def test_sqlite_engine_leaves_global_timer_alone():
+    """数据库引擎使用独立的充电完成定时器，不登记也不清空全局定时器中的会话"""
+    with pytest.raises(TypeError):
+        StationSimulator(small_config(), settings)
+
+    charge_completion_timer.schedule(-1, datetime(2030, 1, 1))
+    before = (charge_completion_timer.next_due(), len(charge_completion_timer))
+    try:
+        simulator = create_simulator(small_config(days=0.2), settings, "sqlite")
+        simulator.run()
+        assert simulator.service.completion_timer is simulator.timer
+        assert (charge_completion_timer.next_due(), len(charge_completion_timer)) == before
+    finally:
+        charge_completion_timer.cancel(-1)
+
+
+def test_fault_keeps_pile_faulted(memory_db):
+    """充电桩故障时结束当前充电，排队车辆不在故障充电桩上开始充电"""
+    db = memory_db.db
+    now = datetime(2024, 1, 1, 12)
+    params = RuntimeParams.from_config({}, settings)
+    service = ChargingScheduleService(db, params, clock=lambda: now)
+    user = User(username="fault", email="fault@example.com", hashed_password="x")
+    pile = ChargingPile(pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                        status=ChargingPileStatus.CHARGING, is_active=True)
+    db.add_all([user, pile])
+    db.flush()
+    queues = []
+    for i, status in enumerate([QueueStatus.CHARGING, QueueStatus.QUEUING]):
+        vehicle = Vehicle(license_plate=f"FAULT-{i}", battery_capacity=60.0, owner_id=user.id)
+        db.add(vehicle)
+        db.flush()
+        queue = ChargingQueue(queue_number=f"F{i + 1}", user_id=user.id, vehicle_id=vehicle.id,
+                              charging_mode=ChargingMode.FAST, requested_amount=60.0, status=status,
+                              charging_pile_id=pile.id, queue_time=now - timedelta(hours=2 - i))
+        if status == QueueStatus.CHARGING:
+            queue.start_charging_time = now - timedelta(hours=1)
+        db.add(queue)
+        queues.append(queue)
+    db.commit()
+
+    service.handle_pile_fault(pile.id)
+
+    db.expire_all()
+    assert db.get(ChargingPile, pile.id).status == ChargingPileStatus.FAULT
+    charging, queued = [db.get(ChargingQueue, q.id) for q in queues]
+    assert charging.status == QueueStatus.COMPLETED
+    # 没有其他可用的充电桩，排队车辆退回等候区
+    assert queued.status == QueueStatus.WAITING
+    assert queued.start_charging_time is None
+    # 部分充电按虚拟时钟计费：1 小时 30 度
+    record = db.query(ChargingRecord).one()
+    assert record.end_time == now
+    assert abs(record.charging_amount - 30.0) < 1e-9
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""测试 SQLite 连接参数：每个新连接都执行配置文件中的 PRAGMA"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+
+from app.core.database import configure_sqlite, sqlite_pragmas
+
+
+def read_pragmas(connection):
+    return {
+        name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "temp_store")
+    }
+
+
+def test_pragmas_applied_to_every_connection():
+    path = os.path.join(tempfile.mkdtemp(), "pragmas.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    configure_sqlite(engine, {
+        "journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000,
+        "mmap_size": 268435456, "cache_size": -65536, "temp_store": "MEMORY",
+    })
+
+    expected = {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000,
+                "mmap_size": 268435456, "cache_size": -65536, "temp_store": 2}
+    # 同时持有两个连接，确保钩子对池中每个连接都生效
+    with engine.connect() as first, engine.connect() as second:
+        assert read_pragmas(first) == expected
+        assert read_pragmas(second) == expected
+    engine.dispose()
+
+
+def test_default_profile_uses_wal():
+    pragmas = sqlite_pragmas()
+    assert list(pragmas) == ["journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "temp_store"]
+    assert str(pragmas["journal_mode"]).upper() == "WAL"
+
+
+if __name__ == "__main__":
+    test_pragmas_applied_to_every_connection()
+    test_default_profile_uses_wal()
+    print("✅ 测试完成")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""测试充电站状态推送：差异计算、按用户过滤、慢连接降级为快照、大量连接的分发"""
+
+import sys
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.api_v1.endpoints import auth
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.services import state_stream as stream_module
+from app.services.state_stream import StationStateStream, SUBSCRIBER_BUFFER, _load_rows
+
+
+def queue_row(queue_id, user_id, status="waiting", position=1):
+    return {"id": queue_id, "user_id": user_id, "status": status, "position": position}
+
+
+def pile_row(pile_id, status="normal"):
+    return {"id": pile_id, "status": status}
+
+
+def parse(message):
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(parse(subscriber.queue.get_nowait()))
+    return messages
+
+
+def test_diff_filtered_per_user():
+    """管理员收到全部差异，用户只收到自己的队列变化（包括离开的队列）"""
+    stream = StationStateStream()
+    admin = stream.subscribe(None)
+    alice = stream.subscribe(1)
+    bob = stream.subscribe(2)
+
+    stream.apply(1, {1: pile_row(1)}, {10: queue_row(10, 1), 20: queue_row(20, 2)})
+    drain(admin), drain(alice), drain(bob)
+
+    # alice 的车开始充电，bob 的请求结束离开队列，充电桩状态变化
+    stream.apply(2, {1: pile_row(1, "charging")}, {10: queue_row(10, 1, "charging")})
+
+    [(event, data)] = drain(admin)
+    assert event == "diff" and data["version"] == 2
+    assert data["piles"]["upserted"] == [pile_row(1, "charging")]
+    assert data["queues"] == {"upserted": [queue_row(10, 1, "charging")], "removed": [20]}
+
+    [(_, data)] = drain(alice)
+    assert data["queues"] == {"upserted": [queue_row(10, 1, "charging")], "removed": []}
+    assert data["piles"]["upserted"] == []
+
+    [(_, data)] = drain(bob)
+    assert data["queues"] == {"upserted": [], "removed": [20]}
+
+    # 版本变化但可见状态不变时不推送
+    stream.apply(3, {1: pile_row(1, "charging")}, {10: queue_row(10, 1, "charging")})
+    assert not drain(admin) and not drain(alice) and not drain(bob)
+
+
+def test_slow_subscriber_gets_snapshot():
+    """积压超过缓冲区后丢弃增量，改为推送一次完整快照"""
+    stream = StationStateStream()
+    slow = stream.subscribe(1)
+    for version in range(1, SUBSCRIBER_BUFFER + 5):
+        stream.apply(version, {}, {10: queue_row(10, 1, position=version)})
+
+    messages = drain(slow)
+    assert len(messages) <= SUBSCRIBER_BUFFER
+    event, data = messages[0]
+    assert event == "snapshot"
+    assert data["queues"][0]["position"] >= SUBSCRIBER_BUFFER
+    assert messages[-1][1]["version"] == SUBSCRIBER_BUFFER + 4
+
+
+def test_events_stream_starts_with_snapshot():
+    """连接的消息流开始迭代时才注册，先推送快照，之后推送差异，关闭后注销连接"""
+    async def scenario():
+        stream = StationStateStream()
+        stream.apply(1, {}, {10: queue_row(10, 1), 20: queue_row(20, 2)})
+
+        # 客户端在第一条消息前断开：消息流从未迭代，不遗留连接
+        stream.events(1)
+        assert stream.subscriber_count == 0
+
+        events = stream.events(1)
+        event, data = parse(await events.__anext__())
+        assert stream.subscriber_count == 1
+        assert event == "snapshot"
+        assert [row["id"] for row in data["queues"]] == [10]
+
+        stream.apply(2, {}, {10: queue_row(10, 1, "queuing"), 20: queue_row(20, 2)})
+        event, data = parse(await events.__anext__())
+        assert event == "diff"
+        assert data["queues"]["upserted"][0]["status"] == "queuing"
+
+        await events.aclose()
+        assert stream.subscriber_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_fan_out_to_thousands_of_connections():
+    """5000 个用户连接在线时，一次变化只为受影响的用户编码和投递（耗时见 benchmark_state_stream.py）"""
+    stream = StationStateStream()
+    subscribers = [stream.subscribe(user_id) for user_id in range(5000)]
+    admins = [stream.subscribe(None) for _ in range(50)]
+    queues = {n: queue_row(n, n, position=n) for n in range(300)}
+    stream.apply(1, {}, queues)
+    for subscriber in subscribers[:300] + admins:
+        drain(subscriber)
+
+    moved = {n: queue_row(n, n, position=n - 1) for n in range(1, 300)}
+    with mock.patch.object(stream_module, "_message", wraps=stream_module._message) as encode:
+        stream.apply(2, {}, moved)
+
+    # 管理员共用一条消息，受影响的 300 个用户各编码一次，其余 4700 个连接不编码也不投递
+    assert encode.call_count == 1 + 300
+    assert sum(subscriber.queue.qsize() for subscriber in subscribers) == 300
+    assert all(subscriber.queue.empty() for subscriber in subscribers[300:])
+    assert all(admin.queue.qsize() == 1 for admin in admins)
+    assert parse(subscribers[0].queue.get_nowait())[1]["queues"]["removed"] == [0]
+    assert parse(subscribers[150].queue.get_nowait())[1]["queues"]["upserted"][0]["position"] == 149
+
+
+def test_load_rows_positions(memory_db):
+    """加载的队列行带排队位置：等候区按模式排序，充电区按充电桩排序"""
+    db = memory_db.db
+
+    user = User(username="stream", email="stream@example.com", hashed_password="x")
+    vehicle = Vehicle(license_plate="STREAM-1", battery_capacity=60.0, owner=user)
+    pile = ChargingPile(pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                        status=ChargingPileStatus.CHARGING, is_active=True)
+    db.add_all([user, vehicle, pile])
+    db.flush()
+    base = datetime(2024, 1, 1)
+    for n, (status, pile_id) in enumerate([(QueueStatus.CHARGING, pile.id), (QueueStatus.QUEUING, pile.id),
+                                           (QueueStatus.WAITING, None), (QueueStatus.WAITING, None),
+                                           (QueueStatus.COMPLETED, pile.id)]):
+        db.add(ChargingQueue(queue_number=f"F{n + 1}", user_id=user.id, vehicle_id=vehicle.id,
+                             charging_mode=ChargingMode.FAST, requested_amount=10.0, status=status,
+                             charging_pile_id=pile_id, queue_time=base + timedelta(minutes=n)))
+    db.commit()
+
+    piles, queues = _load_rows(db)
+    assert piles[pile.id]["status"] == "charging"
+    rows = sorted(queues.values(), key=lambda row: row["queue_number"])
+    assert [(row["status"], row["position"], row["total_in_queue"]) for row in rows] == [
+        ("charging", 1, 2), ("queuing", 2, 2), ("waiting", 1, 2), ("waiting", 2, 2)
+    ]
+    assert rows[0]["pile_number"] == "F01" and rows[0]["license_plate"] == "STREAM-1"
+    json.dumps(rows)
+
+
+def test_stream_ticket_only_opens_streams(session_local):
+    """推送票据只能用于建立推送连接，访问令牌不能用于建立推送连接"""
+    db = session_local.db
+    user = User(username="ticket", email="ticket@example.com", hashed_password="x", is_active=True)
+    db.add(user)
+    db.commit()
+
+    ticket = auth.create_stream_ticket(current_user=user)["ticket"]
+    assert auth.get_stream_user(ticket) == (user.id, False)
+    with pytest.raises(HTTPException):
+        auth.get_user_by_token(ticket, db)
+
+    access_token = auth.create_access_token({"sub": "ticket"}, timedelta(minutes=30))
+    with pytest.raises(HTTPException):
+        auth.get_stream_user(access_token)
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""测试管理端状态快照：版本号随状态变化递增，ETag 未变化时返回 304"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import User, Vehicle, ChargingPile, ChargingQueue, ChargingMode, ChargingPileStatus, QueueStatus
+from app.api.api_v1.endpoints import admin
+from app.services.station_version import current_station_version
+
+
+def seed_station(db):
+    """一个用户、一辆车、一个空闲快充桩"""
+    user = User(username="snap", email="snap@example.com", hashed_password="x")
+    vehicle = Vehicle(license_plate="SNAP-1", battery_capacity=60.0, owner=user)
+    pile = ChargingPile(pile_number="F01", charging_mode=ChargingMode.FAST, power=30.0,
+                        status=ChargingPileStatus.NORMAL, is_active=True)
+    db.add_all([user, vehicle, pile])
+    db.commit()
+
+
+@pytest.fixture
+def client(memory_db, make_client):
+    """只挂载管理端路由的测试应用"""
+    seed_station(memory_db.db)
+    return make_client(admin.router, "/admin", {admin.get_admin_user: lambda: None})
+
+
+def test_snapshot_etag_and_304(client, memory_db):
+    """相同版本返回 304 且不构建快照，只读取一次版本号"""
+    engine, _, db = memory_db
+
+    first = client.get("/admin/snapshot")
+    assert first.status_code == 200
+    body = first.json()
+    assert body["version"] == current_station_version(db)
+    assert [pile["pile_number"] for pile in body["piles"]] == ["F01"]
+    assert body["pile_queues"][0]["pile_status"] == "idle"
+    assert body["summary"]["total_queues"] == 0
+    etag = first.headers["etag"]
+
+    queries = []
+    counter = lambda *args: queries.append(1)
+    event.listen(engine, "before_cursor_execute", counter)
+    second = client.get("/admin/snapshot", headers={"If-None-Match": etag})
+    event.remove(engine, "before_cursor_execute", counter)
+
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+    assert len(queries) == 1
+
+
+def test_version_bumps_on_state_change(client, memory_db):
+    """排队记录或充电桩变化时版本号递增，其余写入不影响版本号"""
+    db = memory_db.db
+    etag = client.get("/admin/snapshot").headers["etag"]
+    version = current_station_version(db)
+
+    user = db.query(User).first()
+    user.phone = "13800000000"
+    db.commit()
+    assert current_station_version(db) == version
+    assert client.get("/admin/snapshot", headers={"If-None-Match": etag}).status_code == 304
+
+    vehicle = db.query(Vehicle).first()
+    db.add(ChargingQueue(queue_number="F1", user_id=user.id, vehicle_id=vehicle.id,
+                         charging_mode=ChargingMode.FAST, requested_amount=10.0, status=QueueStatus.WAITING))
+    db.commit()
+    assert current_station_version(db) == version + 1
+
+    changed = client.get("/admin/snapshot", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["summary"]["waiting_count"] == 1
+    assert changed.json()["queues"][0]["vehicle"]["owner"]["username"] == "snap"
+    assert changed.json()["queues"][0]["start_charging_time"] is None
+
+    pile = db.query(ChargingPile).first()
+    pile.status = ChargingPileStatus.FAULT
+    db.commit()
+    assert current_station_version(db) == version + 2
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
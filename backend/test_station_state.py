@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""测试内存调度引擎：一次加载、两阶段调度、单事务提交"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.services.charging_service import ChargingScheduleService
+from app.services.config_service import config_service
+from app.models import ChargingQueue, ChargingPile, User, Vehicle, ChargingMode, QueueStatus, ChargingPileStatus
+
+
+def seed_station(db, fast_piles, trickle_piles, waiting_fast, waiting_trickle=0):
+    """创建充电桩和等候区车辆"""
+    user = User(username="sim", email="sim@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+
+    for i in range(fast_piles):
+        db.add(ChargingPile(pile_number=f"F{i+1:02d}", charging_mode=ChargingMode.FAST, power=30.0,
+                            status=ChargingPileStatus.NORMAL, is_active=True))
+    for i in range(trickle_piles):
+        db.add(ChargingPile(pile_number=f"T{i+1:02d}", charging_mode=ChargingMode.TRICKLE, power=10.0,
+                            status=ChargingPileStatus.NORMAL, is_active=True))
+
+    for mode, count, prefix in [(ChargingMode.FAST, waiting_fast, "F"), (ChargingMode.TRICKLE, waiting_trickle, "T")]:
+        for i in range(count):
+            vehicle = Vehicle(license_plate=f"{prefix}-{i}", battery_capacity=60.0, owner_id=user.id)
+            db.add(vehicle)
+            db.flush()
+            db.add(ChargingQueue(queue_number=f"{prefix}{i+1}", user_id=user.id, vehicle_id=vehicle.id,
+                                 charging_mode=mode, requested_amount=30.0, status=QueueStatus.WAITING))
+    db.commit()
+
+
+def test_schedule_fills_piles_in_fcfs_order(memory_db):
+    """等候区车辆按FCFS依次填满各桩排队区，空闲充电位立即开始充电"""
+    engine, _, db = memory_db
+    queue_len = settings.CHARGING_QUEUE_LEN
+    seed_station(db, fast_piles=2, trickle_piles=1, waiting_fast=2 * queue_len + 2, waiting_trickle=1)
+
+    ChargingScheduleService(db).schedule_charging()
+
+    piles = db.query(ChargingPile).order_by(ChargingPile.id).all()
+    for pile in piles:
+        charging = db.query(ChargingQueue).filter(
+            ChargingQueue.charging_pile_id == pile.id,
+            ChargingQueue.status == QueueStatus.CHARGING
+        ).count()
+        assert charging == 1
+        assert pile.status == ChargingPileStatus.CHARGING
+
+    # 每桩先接收queue_len辆进入排队区，其中一辆开始充电后空出的排队位留给下次调度
+    waiting = db.query(ChargingQueue).filter(
+        ChargingQueue.charging_mode == ChargingMode.FAST,
+        ChargingQueue.status == QueueStatus.WAITING
+    ).order_by(ChargingQueue.id).all()
+    assert [q.queue_number for q in waiting] == [f"F{2 * queue_len + 1}", f"F{2 * queue_len + 2}"]
+
+    first_pile_queue = db.query(ChargingQueue).filter(
+        ChargingQueue.charging_pile_id == piles[0].id
+    ).order_by(ChargingQueue.id).all()
+    assert [q.queue_number for q in first_pile_queue] == [f"F{i+1}" for i in range(queue_len)]
+
+    # 第二次调度把剩余车辆补入空出的排队位
+    ChargingScheduleService(db).schedule_charging()
+    assert db.query(ChargingQueue).filter(ChargingQueue.status == QueueStatus.WAITING).count() == 0
+
+
+def test_schedule_skips_faulted_piles(memory_db):
+    """故障充电桩不再接收新车辆"""
+    engine, _, db = memory_db
+    seed_station(db, fast_piles=2, trickle_piles=0, waiting_fast=1)
+    faulted = db.query(ChargingPile).filter(ChargingPile.pile_number == "F01").first()
+    faulted.status = ChargingPileStatus.FAULT
+    db.commit()
+
+    ChargingScheduleService(db).schedule_charging()
+
+    queue = db.query(ChargingQueue).first()
+    assert queue.status == QueueStatus.CHARGING
+    assert queue.charging_pile_id != faulted.id
+
+
+def test_schedule_uses_single_transaction(memory_db):
+    """大规模充电站一次调度只做常数次查询和一次提交"""
+    engine, _, db = memory_db
+    seed_station(db, fast_piles=200, trickle_piles=200, waiting_fast=300, waiting_trickle=300)
+    # 运行参数快照在调度开始前获取，调度本身不读取配置
+    params = config_service.get_runtime_params(db)
+
+    statements = []
+    commits = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    event.listen(db, "after_commit", lambda session: commits.append(session))
+
+    started = time.perf_counter()
+    ChargingScheduleService(db, params).schedule_charging()
+    elapsed = time.perf_counter() - started
+
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 2
+    assert len(commits) == 1
+    assert db.query(ChargingQueue).filter(ChargingQueue.status == QueueStatus.WAITING).count() == 0
+    busy_piles = -(-300 // params.charging_queue_len)
+    assert db.query(ChargingQueue).filter(ChargingQueue.status == QueueStatus.CHARGING).count() == 2 * busy_piles
+    print(f"调度 400 桩 / 600 车耗时: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""测试用户车辆监控：只查询当前用户车辆的队列，最后充电时间一次分组查询"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+
+from app.models import User, Vehicle, ChargingQueue, ChargingRecord, ChargingMode, QueueStatus
+from app.api.api_v1.endpoints.users import get_vehicles_monitoring
+
+
+def seed(db, vehicle_count, records_per_vehicle=3):
+    """当前用户 vehicle_count 辆车，另一个用户同样多的车都在排队"""
+    owner = User(username="owner", email="owner@example.com", hashed_password="x")
+    other = User(username="other", email="other@example.com", hashed_password="x")
+    db.add_all([owner, other])
+    db.flush()
+
+    base = datetime(2024, 1, 1)
+    n = 0
+    for user in (owner, other):
+        for i in range(vehicle_count):
+            vehicle = Vehicle(license_plate=f"{user.username}-{i}", battery_capacity=60.0, owner_id=user.id)
+            db.add(vehicle)
+            db.flush()
+            if i % 2 == 0:
+                db.add(ChargingQueue(queue_number=f"F{n}", user_id=user.id, vehicle_id=vehicle.id,
+                                     charging_mode=ChargingMode.FAST, requested_amount=10.0,
+                                     status=QueueStatus.WAITING))
+            for k in range(records_per_vehicle):
+                end = base + timedelta(days=i, hours=k)
+                db.add(ChargingRecord(
+                    record_number=f"CR{n:06d}", user_id=user.id, vehicle_id=vehicle.id, charging_pile_id=1,
+                    charging_amount=10.0, charging_duration=1.0, start_time=end - timedelta(hours=1), end_time=end,
+                    electricity_fee=7.0, service_fee=8.0, total_fee=15.0, unit_price=0.7, time_period="平时"
+                ))
+                n += 1
+    db.commit()
+    db.refresh(owner)
+    return owner
+
+
+def run(db, vehicle_count):
+    owner = seed(db, vehicle_count)
+
+    queries = []
+    counter = lambda *args: queries.append(1)
+    event.listen(db.bind, "before_cursor_execute", counter)
+    response = get_vehicles_monitoring(current_user=owner, db=db)
+    event.remove(db.bind, "before_cursor_execute", counter)
+    return response, len(queries)
+
+
+def test_monitoring_constant_queries(make_memory_db):
+    """查询次数与车辆数无关，只返回当前用户车辆及其队列"""
+    small, small_queries = run(make_memory_db().db, 2)
+    large, large_queries = run(make_memory_db().db, 30)
+
+    assert small_queries == large_queries == 3
+    assert large["status"] == "success"
+    vehicles = large["data"]
+    assert len(vehicles) == 30
+    assert all(v["license_plate"].startswith("owner-") for v in vehicles)
+
+    first, second = vehicles[0], vehicles[1]
+    assert first["status_code"] == "waiting" and first["queue_info"]["queue_number"] == "F0"
+    assert second["status_code"] == "registered" and second["queue_info"] is None
+    assert second["last_charging_time"] == datetime(2024, 1, 2, 2)
+
+
+if __name__ == "__main__":
+    # 内存数据库由 conftest.py 中的夹具提供，通过 pytest 运行
+    if pytest.main([__file__, "-q"]) == 0:
+        print("✅ 测试完成")
@@ -15,6 +15,7 @@ export const userApi = {
 
   // 队列状态
   getUserQueue: () => api.get('/users/queue/status'),
+  getStreamTicket: () => api.post('/auth/stream-ticket'),
   
   // 充电配置
   getChargingConfig: () => api.get('/users/charging/config')